@@ -0,0 +1,281 @@
+"""
+API asyncio de FileFlow, para integrarlo en servicios que ya tienen un bucle de eventos.
+
+    pool = IOPool(max_workers=8)          # compartido por todos los trabajos
+    async with organize_async(src, dest, pool=pool) as job:
+        async for event in job:           # events.MoveEvent, según se completan
+            ...
+    job.moves                             # MoveList para undo_moves
+
+Las operaciones de disco corren en los hilos de un IOPool; el bucle nunca se bloquea.
+Cada trabajo limita con un semáforo cuántos movimientos tiene en curso o sin leer, así
+que un consumidor lento frena al productor en vez de acumular eventos en memoria.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import AsyncIterator, Iterator, List, Optional, Set
+
+import events
+import fileops
+import stats as run_stats
+from events import MoveEvent
+from journal import Journal
+from organizer import DestinationIndex, MoveList, OrganizeError, PlannedMove, WalkOptions, execute_move, iter_plan
+from rules import RuleEngine
+from stats import RunStats
+
+# Movimientos que se planifican de una vez en un hilo del pool
+PLAN_CHUNK = 256
+
+
+class IOPool:
+    """
+    Hilos acotados para las operaciones de disco de cualquier número de trabajos.
+    Crear uno por servicio y pasarlo a organize_async; sin él se usa uno compartido.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fileflow-io")
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def close(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    async def __aenter__(self) -> "IOPool":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+_shared_pool: Optional[IOPool] = None
+_shared_lock = threading.Lock()
+
+
+def shared_pool() -> IOPool:
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = IOPool()
+        return _shared_pool
+
+
+def _take(plan: Iterator[PlannedMove], n: int) -> List[PlannedMove]:
+    return list(islice(plan, n))
+
+
+class AsyncOrganize:
+    """
+    Un trabajo de organización asíncrono: iterarlo ejecuta los movimientos y entrega un
+    MoveEvent por cada uno, en el orden en que terminan. Al acabar, `moves` tiene la
+    MoveList para deshacer.
+    Cancelar la tarea que lo itera (o salir del `async with`) deja de programar
+    movimientos; los que ya están en un hilo terminan y quedan en `moves` y en el diario,
+    que se cierra como interrumpido para poder reanudarlo o deshacerlo. Sin `async with`
+    ese cierre se hace en segundo plano cuando acaba la tarea; `await job.aclose()`
+    espera a que termine.
+    Si un movimiento falla se lanza OrganizeError con los movimientos hechos.
+    """
+
+    def __init__(
+        self,
+        source_folder: str,
+        dest_folder: Optional[str] = None,
+        rules: Optional[RuleEngine] = None,
+        pool: Optional[IOPool] = None,
+        concurrency: int = 4,
+        journal: Optional[Journal] = None,
+        walk: Optional[WalkOptions] = None,
+        stats: Optional[RunStats] = None,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.source_folder = source_folder
+        self.dest_folder = dest_folder
+        self.rules = rules
+        self.pool = pool or shared_pool()
+        self.concurrency = concurrency
+        self.journal = journal
+        self.walk = walk
+        self.stats = stats
+        self.moves = MoveList()
+        self._index = DestinationIndex()
+        self._devices = fileops.DeviceCache()
+        self._created: Set[str] = set()
+        # El diario no es seguro entre hilos y lo escriben los hilos del pool
+        self._journal_lock = threading.Lock()
+        self._failures: List[BaseException] = []
+        self._bytes = 0
+        self._scheduled = 0  # movimientos lanzados; cada uno deja exactamente un elemento en la cola
+        self._producer_io: Optional[asyncio.Future] = None  # lectura del plan o escritura del diario en curso
+        self._iterator: Optional[AsyncIterator[MoveEvent]] = None
+        self._closing: Optional[asyncio.Future] = None
+
+    # --------- En los hilos del pool ---------
+    def _record_plans(self, batch: List[PlannedMove]) -> int:
+        with self._journal_lock:
+            base = self.journal.next_index
+            for _ in self.journal.wrap_plan(batch, batch=len(batch)):
+                pass
+            return base
+
+    def _execute(self, move: PlannedMove, position: int):
+        if move.folder not in self._created:
+            os.makedirs(move.folder, exist_ok=True)
+            self._created.add(move.folder)
+        start = time.perf_counter() if self.stats is not None else 0.0
+        try:
+            new_path, identity = execute_move(move, self._index, self._devices, stats=self.stats)
+        finally:
+            if self.stats is not None:
+                self.stats.add(run_stats.MOVE, time.perf_counter() - start)
+        if self.journal is not None:
+            with self._journal_lock:
+                self.journal.done(position, move.source, str(new_path), identity)
+        return new_path, identity
+
+    # --------- En el bucle ---------
+    async def _producer_run(self, fn, *args):
+        # Protegido de la cancelación: un hilo no se puede interrumpir, así que al cancelar
+        # sigue hasta terminar y _events lo espera antes de cerrar el diario
+        self._producer_io = asyncio.ensure_future(self.pool.run(fn, *args))
+        return await asyncio.shield(self._producer_io)
+
+    async def _move(self, move: PlannedMove, position: int, queue: asyncio.Queue) -> None:
+        try:
+            new_path, identity = await self.pool.run(self._execute, move, position)
+        except Exception as e:
+            self._failures.append(e)
+            queue.put_nowait(None)  # despierta al consumidor para que vea el fallo
+            return
+        self.moves.add(str(new_path), move.source, identity)
+        self._bytes += move.size
+        queue.put_nowait(MoveEvent(events.MOVED, move.source, str(new_path), move.category, move.size, time.time()))
+
+    async def _produce(self, queue: asyncio.Queue, slots: asyncio.Semaphore, tasks: Set[asyncio.Task]) -> None:
+        plan = iter_plan(self.source_folder, self.dest_folder, self.rules, self._index, self.walk, self.stats)
+        position = self.journal.next_index if self.journal is not None else 0
+        while not self._failures:
+            batch = await self._producer_run(_take, plan, PLAN_CHUNK)
+            if not batch:
+                break
+            if self.journal is not None:
+                position = await self._producer_run(self._record_plans, batch)
+            for move in batch:
+                await slots.acquire()
+                if self._failures:
+                    slots.release()
+                    return
+                task = asyncio.ensure_future(self._move(move, position, queue))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                self._scheduled += 1
+                position += 1
+
+    async def _events(self) -> AsyncIterator[MoveEvent]:
+        queue: asyncio.Queue = asyncio.Queue()
+        # Cada hueco es un movimiento en curso o un evento aún sin leer
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks: Set[asyncio.Task] = set()
+        producer = asyncio.ensure_future(self._produce(queue, slots, tasks))
+        started = time.perf_counter()
+        received = 0
+        finished = False
+        try:
+            while True:
+                if producer.done():
+                    producer.result()  # propaga los errores al planificar
+                    if received == self._scheduled:
+                        break
+                    event = await queue.get()
+                else:
+                    getter = asyncio.ensure_future(queue.get())
+                    await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+                    if not getter.done():
+                        getter.cancel()
+                        continue
+                    event = getter.result()
+                received += 1
+                slots.release()
+                if event is None:
+                    raise OrganizeError(self._failures[0], self.moves) from self._failures[0]
+                yield event
+            finished = True
+        finally:
+            producer.cancel()
+            # Un movimiento que ya está en un hilo no se puede interrumpir: se espera
+            # a que termine para que `moves` y el diario digan exactamente lo que se hizo
+            await asyncio.gather(producer, *tasks, return_exceptions=True)
+            if self._producer_io is not None:
+                await asyncio.gather(self._producer_io, return_exceptions=True)
+            if self.stats is not None:
+                self.stats.count(run_stats.FILES, len(self.moves))
+                self.stats.count(run_stats.BYTES, self._bytes)
+                self.stats.count(run_stats.COLLISIONS, self._index.collisions)
+                self.stats.add(run_stats.TOTAL, time.perf_counter() - started)
+            if self.journal is not None:
+                if finished or not (self.moves or self._failures):
+                    self.journal.finish()
+                else:
+                    # Sin marca de fin: queda como interrumpido (reanudable)
+                    self.journal.close()
+        if not self.moves:
+            yield MoveEvent(events.NO_FILES, self.source_folder, "", "", 0, time.time())
+
+    def __aiter__(self) -> AsyncIterator[MoveEvent]:
+        if self._iterator is None:
+            self._iterator = self._events()
+            task = asyncio.current_task()
+            if task is not None:
+                task.add_done_callback(self._iterating_task_done)
+        return self._iterator
+
+    def _iterating_task_done(self, task: asyncio.Task) -> None:
+        # Si la tarea se canceló entre dos eventos nadie volverá a reanudar el generador
+        # y su finally (esperar lo que está en vuelo, cerrar el diario) no se ejecutaría
+        if self._closing is None and self._iterator.ag_frame is not None:
+            self._closing = asyncio.ensure_future(self._iterator.aclose())
+
+    async def aclose(self) -> None:
+        """Deja de programar movimientos, espera a los que están en curso y cierra el diario."""
+        if self._closing is None:
+            if self._iterator is None:
+                return
+            self._closing = asyncio.ensure_future(self._iterator.aclose())
+        await asyncio.shield(self._closing)
+
+    async def __aenter__(self) -> "AsyncOrganize":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def run(self) -> MoveList:
+        """Ejecuta el trabajo entero sin mirar los eventos."""
+        async with self:
+            async for _ in self:
+                pass
+        return self.moves
+
+
+def organize_async(
+    source_folder: str,
+    dest_folder: Optional[str] = None,
+    rules: Optional[RuleEngine] = None,
+    pool: Optional[IOPool] = None,
+    concurrency: int = 4,
+    journal: Optional[Journal] = None,
+    walk: Optional[WalkOptions] = None,
+    stats: Optional[RunStats] = None,
+) -> AsyncOrganize:
+    """Contraparte asíncrona de organize_files (ver AsyncOrganize)."""
+    return AsyncOrganize(source_folder, dest_folder, rules, pool, concurrency, journal, walk, stats)
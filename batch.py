@@ -0,0 +1,324 @@
+"""
+Organización por lotes: muchas carpetas de origen (cada una con su destino) a la vez.
+
+Los trabajos se reparten con un límite de concurrencia por dispositivo: un disco
+mecánico atiende un trabajo cada vez (dos a la vez solo lo harían buscar), mientras que
+los SSD y los volúmenes de red admiten varios en paralelo. Cada origen tiene su propio
+diario, así que se puede deshacer por separado con undo_run.
+"""
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import journal
+from events import EventCallback, make_emitter
+from organizer import CancelToken, MoveList, OrganizeError, WalkOptions, organize_files
+from rules import RuleEngine
+from stats import TOTAL, RunStats
+
+if TYPE_CHECKING:
+    from dedupe import Deduplicator
+    from layout import Layout
+    from sharding import Sharding
+
+# Tipos de dispositivo
+HDD = "hdd"
+SSD = "ssd"
+NETWORK = "network"
+UNKNOWN = "unknown"
+
+# Trabajos simultáneos que tocan un mismo dispositivo, según su tipo
+DEFAULT_LIMITS: Dict[str, int] = {HDD: 1, SSD: 4, NETWORK: 4, UNKNOWN: 2}
+
+_NETWORK_FS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "afs", "9p", "ceph", "glusterfs",
+    "fuse.sshfs", "fuse.rclone", "davfs", "fuse.davfs2",
+}
+_MEMORY_FS = {"tmpfs", "ramfs"}
+
+
+def _existing(path: str) -> str:
+    """La propia ruta o su antecesor más cercano que exista (el destino puede no existir aún)."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def _mount_fstype(path: str) -> Optional[str]:
+    """Tipo de sistema de archivos del montaje que contiene `path` (Linux, /proc/self/mountinfo)."""
+    try:
+        with open("/proc/self/mountinfo", encoding="utf-8", errors="replace") as fh:
+            lines = fh.readlines()
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, fstype = -1, None
+    for line in lines:
+        left, _, right = line.partition(" - ")
+        fields = left.split()
+        if len(fields) < 5 or not right:
+            continue
+        mount_point = fields[4].replace("\\040", " ")
+        if path == mount_point or path.startswith(mount_point.rstrip("/") + "/"):
+            if len(mount_point) > best:
+                best, fstype = len(mount_point), right.split()[0]
+    return fstype
+
+
+def _rotational(dev: int) -> Optional[bool]:
+    base = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+    # Una partición no tiene queue/: el dato está en el disco que la contiene
+    for queue in (os.path.join(base, "queue", "rotational"), os.path.join(base, "..", "queue", "rotational")):
+        try:
+            with open(queue) as fh:
+                return fh.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+def device_kind(path: str) -> str:
+    """HDD, SSD, NETWORK o UNKNOWN para la unidad donde está `path`."""
+    if not sys.platform.startswith("linux"):
+        return UNKNOWN
+    path = _existing(path)
+    fstype = _mount_fstype(path)
+    if fstype in _NETWORK_FS:
+        return NETWORK
+    if fstype in _MEMORY_FS:
+        return SSD
+    try:
+        rotational = _rotational(os.stat(path).st_dev)
+    except OSError:
+        return UNKNOWN
+    if rotational is None:
+        return UNKNOWN
+    return HDD if rotational else SSD
+
+
+@dataclass
+class BatchJob:
+    source: str
+    dest: Optional[str] = None  # None = organizar en la propia carpeta
+
+
+@dataclass
+class JobResult:
+    source: str
+    dest: str
+    moves: MoveList = field(default_factory=MoveList)
+    run: Optional[Path] = None  # diario de este origen: undo_run(run) lo deshace
+    error: Optional[BaseException] = None
+    stats: RunStats = field(default_factory=RunStats)
+    devices: Tuple[str, ...] = ()  # tipo de cada dispositivo que tocó
+
+
+@dataclass
+class BatchResult:
+    jobs: List[JobResult]
+    stats: RunStats  # suma de todos los trabajos
+
+    @property
+    def failed(self) -> List[JobResult]:
+        return [job for job in self.jobs if job.error is not None]
+
+
+class _Device:
+    __slots__ = ("kind", "limit", "active")
+
+    def __init__(self, kind: str, limit: int):
+        self.kind = kind
+        self.limit = max(1, limit)
+        self.active = 0
+
+
+def _as_job(job: Union[BatchJob, Tuple[str, Optional[str]], str]) -> BatchJob:
+    if isinstance(job, BatchJob):
+        return job
+    if isinstance(job, str):
+        return BatchJob(job)
+    return BatchJob(*job)
+
+
+def run_batch(
+    jobs: Iterable[Union[BatchJob, Tuple[str, Optional[str]], str]],
+    rules: Optional[RuleEngine] = None,
+    workers: int = 8,
+    limits: Optional[Dict[str, int]] = None,
+    progress_callback: Optional[Callable[[float], None]] = None,
+    log_callback: Optional[Callable[[str], None]] = None,
+    messages: Optional[Dict[str, str]] = None,
+    event_callback: Optional[EventCallback] = None,
+    job_callback: Optional[Callable[[JobResult], None]] = None,
+    use_journal: bool = True,
+    journal_dir: Optional[Union[str, Path]] = None,
+    walk: Optional[WalkOptions] = None,
+    dedupe: Optional["Deduplicator"] = None,
+    cancel: Optional[CancelToken] = None,
+    kind_of: Callable[[str], str] = device_kind,
+    incremental: bool = False,
+    link: Optional[str] = None,
+    layout: Optional["Layout"] = None,
+    sharding: Optional["Sharding"] = None,
+) -> BatchResult:
+    """
+    Organiza cada (origen, destino) de `jobs` con como mucho `workers` trabajos a la vez
+    y, por dispositivo, los que indique `limits` para su tipo (ver DEFAULT_LIMITS). Un
+    trabajo ocupa un hueco en el dispositivo del origen y en el del destino; si alguno
+    está lleno se adelanta el siguiente trabajo que sí pueda empezar.
+    progress_callback recibe el avance conjunto (0..1); los callbacks se llaman de uno
+    en uno aunque los trabajos corran en hilos distintos. job_callback recibe cada
+    JobResult al terminar su trabajo. El fallo de un trabajo no detiene a los demás:
+    queda en JobResult.error con los movimientos que sí hizo.
+    Con `cancel` no se empieza ningún trabajo más y los que están en marcha se cancelan.
+    Con `incremental` cada origen guarda su propio estado, con `link` se crean enlaces
+    en vez de mover, con `layout` las carpetas siguen su plantilla y con `sharding` se
+    reparten en subcarpetas (ver organize_files).
+    """
+    jobs = [_as_job(job) for job in jobs]
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    results = [JobResult(job.source, job.dest or job.source) for job in jobs]
+    total_stats = RunStats("batch")
+
+    # Dispositivos de cada trabajo, por st_dev; el tipo se averigua una vez por dispositivo
+    devices: Dict[int, _Device] = {}
+    job_devices: List[Tuple[int, ...]] = []
+    for job, result in zip(jobs, results):
+        keys = []
+        for path in (job.source, result.dest):
+            existing = _existing(path)
+            try:
+                dev = os.stat(existing).st_dev
+            except OSError:
+                dev = -1
+            if dev not in devices:
+                kind = kind_of(existing)
+                devices[dev] = _Device(kind, limits.get(kind, limits[UNKNOWN]))
+            if dev not in keys:
+                keys.append(dev)
+        job_devices.append(tuple(keys))
+        result.devices = tuple(devices[dev].kind for dev in keys)
+
+    callback_lock = threading.Lock()
+    emit = make_emitter(event_callback, log_callback, messages)
+    progress = [0.0] * len(jobs)
+
+    def on_event(event) -> None:
+        with callback_lock:
+            emit(event)
+
+    def progress_for(i: int) -> Optional[Callable[[float], None]]:
+        if progress_callback is None:
+            return None
+
+        def on_progress(value: float) -> None:
+            with callback_lock:
+                progress[i] = value
+                progress_callback(sum(progress) / len(progress))
+
+        return on_progress
+
+    state = threading.Condition()
+    pending = deque(range(len(jobs)))
+    active = 0
+
+    def run_job(i: int) -> None:
+        nonlocal active
+        job, result = jobs[i], results[i]
+        run_journal = None
+        try:
+            if not os.path.isdir(job.source):
+                raise NotADirectoryError(f"Not a folder: {job.source}")
+            if use_journal:
+                run_journal = journal.Journal.start(job.source, result.dest, directory=journal_dir, link=link)
+                result.run = run_journal.path
+            result.moves = organize_files(
+                job.source,
+                job.dest,
+                progress_callback=progress_for(i),
+                rules=rules,
+                journal=run_journal,
+                event_callback=on_event if emit else None,
+                walk=walk,
+                dedupe=dedupe,
+                stats=result.stats,
+                cancel=cancel,
+                incremental=incremental,
+                link=link,
+                layout=layout,
+                sharding=sharding,
+            )
+        except OrganizeError as e:
+            result.moves = e.moves
+            result.error = e.error
+        except Exception as e:
+            result.error = e
+        finally:
+            if result.error is not None and run_journal is not None and not result.moves:
+                # Falló sin mover nada: el diario no debe ofrecerse para reanudar
+                run_journal.close()
+                journal.mark_status(run_journal.path, journal.STATUS_ROLLED_BACK)
+            if result.run is not None and not result.moves:
+                result.run = None  # nada que deshacer
+            total_stats.merge(result.stats)
+            if job_callback is not None:
+                with callback_lock:
+                    job_callback(result)
+            with state:
+                for dev in job_devices[i]:
+                    devices[dev].active -= 1
+                active -= 1
+                state.notify()
+
+    def next_ready() -> Optional[int]:
+        if active >= workers:
+            return None
+        for pos, i in enumerate(pending):
+            if all(devices[dev].active < devices[dev].limit for dev in job_devices[i]):
+                del pending[pos]
+                return i
+        return None
+
+    with total_stats.phase(TOTAL), ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fileflow-batch") as pool:
+        with state:
+            while pending or active:
+                if pending and cancel is not None and cancel.cancelled:
+                    pending.clear()
+                    continue
+                i = next_ready() if pending else None
+                if i is None:
+                    state.wait()
+                    continue
+                for dev in job_devices[i]:
+                    devices[dev].active += 1
+                active += 1
+                pool.submit(run_job, i)
+
+    if progress_callback:
+        progress_callback(1.0)
+    return BatchResult(results, total_stats)
+
+
+def read_batch_file(path: Union[str, Path], default_dest: Optional[str] = None) -> List[BatchJob]:
+    """
+    Un trabajo por línea: `origen` o `origen<TAB>destino`. Las líneas vacías y las que
+    empiezan por # se ignoran; sin destino se usa `default_dest` (o la propia carpeta).
+    """
+    jobs = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.rstrip("\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            source, _, dest = line.partition("\t")
+            jobs.append(BatchJob(os.path.expanduser(source.strip()), os.path.expanduser(dest.strip()) or default_dest))
+    return jobs
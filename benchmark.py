@@ -0,0 +1,338 @@
+"""
+Banco de pruebas de rendimiento de FileFlow.
+
+    python benchmark.py                              # corpus de 1k y 10k en /dev/shm o /tmp
+    python benchmark.py --files 1000 100000 1000000 --big 2G 4G --root /mnt/disco
+    python benchmark.py --out antes.json  (…cambios…)  python benchmark.py --out despues.json
+    python benchmark.py --compare antes.json despues.json
+
+Cada corpus se genera de forma reproducible (misma semilla → mismos nombres y tamaños) y se
+mide en un proceso hijo para que el pico de memoria de un caso no contamine el siguiente.
+Fases: planificación (dry run), organización, deshacer y resolución de colisiones en memoria.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+SEED = 1234
+RESULTS_VERSION = 1
+
+# Mezcla de extensiones: las de FILE_TYPES, desconocidas y de varias partes
+_EXTENSIONS = [
+    (".jpg", 20), (".png", 8), (".gif", 2), (".pdf", 10), (".docx", 5), (".txt", 10),
+    (".xlsx", 3), (".mp4", 4), (".mov", 2), (".mp3", 6), (".wav", 1), (".zip", 4),
+    (".7z", 1), (".tar.gz", 2), (".log", 5), (".json", 5), ("", 2), (".JPG", 3),
+]
+
+# Funciones de os que se cuentan como llamadas al sistema de archivos. DirEntry.stat y las
+# llamadas internas de C (scandir, copy_file_range dentro de fileops) no pasan por aquí.
+_COUNTED = ("stat", "lstat", "scandir", "open", "close", "rename", "link", "unlink", "makedirs", "mkdir", "fsync")
+
+
+def _parse_size(text: str) -> int:
+    from rules import _parse_size as parse
+
+    return parse(text)
+
+
+def default_root() -> str:
+    # tmpfs aísla el coste del código del de la unidad; con --root se mide un disco real
+    return "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+
+
+# --------- Corpus ---------
+
+def _pick_extension(rng: random.Random) -> str:
+    exts, weights = zip(*_EXTENSIONS)
+    return rng.choices(exts, weights)[0]
+
+
+def generate_corpus(
+    folder: str,
+    files: int,
+    seed: int = SEED,
+    collisions: bool = False,
+    big_files: List[int] = (),
+    max_small: int = 64 * 1024,
+) -> Dict:
+    """
+    Crea `files` archivos en folder/source. Los pequeños son dispersos (truncate), así que
+    generar un millón no escribe datos; los grandes también, salvo que se midan copias.
+    Con collisions=True se repite un conjunto pequeño de nombres y las carpetas de
+    categoría del destino ya contienen esos nombres y varias de sus variantes "(n)".
+    """
+    rng = random.Random(seed)
+    source = os.path.join(folder, "source")
+    os.makedirs(source)
+    total_bytes = 0
+
+    def create(path: str, size: int = 0) -> None:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            if size:
+                os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+
+    names = []
+    for i in range(files):
+        ext = _pick_extension(rng)
+        if collisions:
+            # Pocos nombres base muy repetidos, como las fotos de varias cámaras
+            name = f"IMG_{i % 50:04d}_{i // 50}{ext}"
+        else:
+            name = f"file_{i:07d}_{rng.randrange(1 << 20):05x}{ext}"
+        size = rng.randrange(max_small)
+        create(os.path.join(source, name), size)
+        names.append(name)
+        total_bytes += size
+
+    for i, size in enumerate(big_files):
+        create(os.path.join(source, f"big_{i}.mkv"), size)
+        total_bytes += size
+
+    if collisions:
+        from organizer import DEFAULT_RULES
+
+        # Destino ya ocupado: una décima parte de los nombres encuentra el original y 5 variantes
+        for name in names[: max(1, files // 10)]:
+            target = os.path.join(source, DEFAULT_RULES.classify(name))
+            os.makedirs(target, exist_ok=True)
+            stem, ext = os.path.splitext(name)
+            for variant in [name] + [f"{stem} ({n}){ext}" for n in range(1, 6)]:
+                create(os.path.join(target, variant))
+    return {"files": files + len(big_files), "bytes": total_bytes, "source": source}
+
+
+# --------- Medición (proceso hijo) ---------
+
+class _SyscallCounter:
+    """Cuenta las llamadas a funciones de os (y a fileops.rename_noreplace) mientras está activo."""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self._saved = []
+
+    def _wrap(self, module, name: str, label: str) -> None:
+        original = getattr(module, name, None)
+        if original is None:
+            return
+        counts = self.counts
+
+        def counted(*args, **kwargs):
+            counts[label] = counts.get(label, 0) + 1
+            return original(*args, **kwargs)
+
+        self._saved.append((module, name, original))
+        setattr(module, name, counted)
+
+    def __enter__(self) -> "_SyscallCounter":
+        import fileops
+
+        for name in _COUNTED:
+            self._wrap(os, name, name)
+        self._wrap(fileops, "rename_noreplace", "rename_noreplace")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for module, name, original in reversed(self._saved):
+            setattr(module, name, original)
+        self._saved = []
+
+
+def _proc_io() -> Dict[str, int]:
+    """Contadores de E/S del kernel para este proceso (solo Linux)."""
+    try:
+        with open("/proc/self/io") as fh:
+            return {k: int(v) for k, v in (line.split(": ") for line in fh)}
+    except OSError:
+        return {}
+
+
+def _peak_rss_kb() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS da bytes
+
+
+def _measure(phase: str, files: int, total_bytes: int, fn) -> Dict:
+    io_before = _proc_io()
+    with _SyscallCounter() as counter:
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+    io_after = _proc_io()
+    syscalls = dict(sorted(counter.counts.items()))
+    for key in ("syscr", "syscw"):
+        if key in io_after:
+            syscalls[f"kernel_{key}"] = io_after[key] - io_before.get(key, 0)
+    return {
+        "phase": phase,
+        "files": files,
+        "bytes": total_bytes,
+        "seconds": round(seconds, 6),
+        "files_per_s": round(files / seconds, 1) if seconds else None,
+        "bytes_per_s": round(total_bytes / seconds, 1) if seconds else None,
+        "syscalls": syscalls,
+        "peak_rss_kb": _peak_rss_kb(),
+        "_result": result,
+    }
+
+
+def _run_case(case: Dict) -> List[Dict]:
+    """Se ejecuta en el hijo: planifica, organiza, deshace y prueba colisiones sobre un corpus."""
+    from organizer import DestinationIndex, organize_files, plan_organization, undo_moves
+    from pathlib import Path
+
+    source, files, total_bytes, workers = case["source"], case["files"], case["bytes"], case["workers"]
+    phases = []
+
+    plan = _measure("plan", files, total_bytes, lambda: len(plan_organization(source)))
+    phases.append(plan)
+    organize = _measure("organize", files, total_bytes, lambda: organize_files(source, workers=workers))
+    phases.append(organize)
+    moves = organize.pop("_result")
+    phases.append(_measure("undo", len(moves), total_bytes, lambda: undo_moves(moves, workers=workers)))
+
+    # Resolución de colisiones pura: el mismo nombre N veces en una carpeta ya poblada
+    probe_folder = Path(source) / "Others"
+    os.makedirs(probe_folder, exist_ok=True)
+    probes = min(files, 100000)
+
+    def reserve_all() -> int:
+        index = DestinationIndex()
+        for _ in range(probes):
+            index.reserve(probe_folder, "IMG_0000_0.jpg")
+        return probes
+
+    phases.append(_measure("collisions", probes, 0, reserve_all))
+    for phase in phases:
+        phase.pop("_result", None)
+    return phases
+
+
+# --------- Orquestación ---------
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_benchmarks(
+    sizes: List[int],
+    root: str,
+    collisions: bool = True,
+    big_files: List[int] = (),
+    workers: int = 1,
+    seed: int = SEED,
+) -> Dict:
+    cases = []
+    for files in sizes:
+        cases.append({"name": f"mixed-{files}", "files": files, "collisions": False, "big": list(big_files)})
+        if collisions:
+            cases.append({"name": f"collisions-{files}", "files": files, "collisions": True, "big": []})
+
+    results = []
+    for case in cases:
+        folder = tempfile.mkdtemp(prefix="fileflow-bench-", dir=root)
+        try:
+            t0 = time.perf_counter()
+            corpus = generate_corpus(folder, case["files"], seed, case["collisions"], case["big"])
+            generated = time.perf_counter() - t0
+            payload = json.dumps({**corpus, "workers": workers})
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--_case", payload],
+                capture_output=True, text=True, check=True,
+            )
+            phases = json.loads(out.stdout)
+            results.append({"case": case["name"], "corpus_seconds": round(generated, 3), "phases": phases})
+            for phase in phases:
+                rate = phase["files_per_s"] or 0
+                print(f"{case['name']:>20} {phase['phase']:>10} {phase['seconds']:10.3f}s {rate:12.0f} files/s", file=sys.stderr)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    return {
+        "version": RESULTS_VERSION,
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "root": root,
+        "seed": seed,
+        "workers": workers,
+        "results": results,
+    }
+
+
+def compare(old: Dict, new: Dict) -> List[str]:
+    """Tabla de tiempos por caso y fase; ratio > 1 significa que la versión nueva es más lenta."""
+    def index(data: Dict) -> Dict:
+        return {(r["case"], p["phase"]): p for r in data["results"] for p in r["phases"]}
+
+    before, after = index(old), index(new)
+    lines = [f"{'case':>20} {'phase':>10} {old.get('commit') or 'old':>10} {new.get('commit') or 'new':>10} {'ratio':>7}"]
+    for key in sorted(before.keys() & after.keys()):
+        a, b = before[key]["seconds"], after[key]["seconds"]
+        ratio = b / a if a else float("nan")
+        lines.append(f"{key[0]:>20} {key[1]:>10} {a:10.3f} {b:10.3f} {ratio:7.2f}")
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="FileFlow benchmarks")
+    parser.add_argument("--files", type=int, nargs="+", default=[1000, 10000], help="corpus sizes (files)")
+    parser.add_argument("--big", nargs="*", default=[], metavar="SIZE", help="extra large files, e.g. 2G 4G")
+    parser.add_argument("--root", default=default_root(), help="where to create the corpora (default: tmpfs)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--no-collisions", action="store_true", help="skip the many-collision corpora")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--_case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._case:
+        json.dump(_run_case(json.loads(args._case)), sys.stdout)
+        return 0
+    if args.compare:
+        with open(args.compare[0]) as a, open(args.compare[1]) as b:
+            print("\n".join(compare(json.load(a), json.load(b))))
+        return 0
+
+    results = run_benchmarks(
+        args.files,
+        args.root,
+        collisions=not args.no_collisions,
+        big_files=[_parse_size(s) for s in args.big],
+        workers=args.workers,
+        seed=args.seed,
+    )
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+try:
+    import sqlite3
+except ImportError:  # Python compilado sin SQLite: la caché queda solo en memoria
+    sqlite3 = None
+
+CACHE_DIR_ENV = "FILEFLOW_CACHE_DIR"
+
+# (dispositivo, inodo, tamaño, mtime_ns): si no cambia, el contenido tampoco
+FileKey = Tuple[int, int, int, int]
+
+
+def default_cache_path() -> Path:
+    env = os.environ.get(CACHE_DIR_ENV)
+    directory = Path(env) if env else Path.home() / ".fileflow"
+    return directory / "cache.sqlite3"
+
+
+def file_key(st: os.stat_result) -> FileKey:
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class MetadataCache:
+    """
+    Caché persistente de datos que se sacan del contenido (tipo detectado, hashes...).
+    Cada valor se guarda por (tipo, dispositivo, inodo) junto al tamaño y mtime con que
+    se calculó; si el archivo cambia, la entrada deja de valer y se reemplaza. Así la
+    base crece con el número de archivos distintos, no con las ejecuciones.
+    Las escrituras se acumulan y se vuelcan en una sola transacción.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, flush_every: int = 1000):
+        self.flush_every = flush_every
+        self._memory: Dict[Tuple[str, int, int], Tuple[int, int, str]] = {}
+        self._pending: List[Tuple] = []
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None and sqlite3 is not None:
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(str(path), check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    " kind TEXT, dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, value TEXT,"
+                    " PRIMARY KEY (kind, dev, ino)) WITHOUT ROWID"
+                )
+            except (OSError, sqlite3.Error):
+                # Sin disco para la caché se sigue funcionando, solo que sin persistir
+                self._db = None
+
+    @classmethod
+    def open_default(cls) -> "MetadataCache":
+        return cls(default_cache_path())
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def get(self, kind: str, key: FileKey) -> Optional[str]:
+        dev, ino, size, mtime_ns = key
+        with self._lock:
+            hit = self._memory.get((kind, dev, ino))
+            if hit is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT size, mtime_ns, value FROM entries WHERE kind=? AND dev=? AND ino=?",
+                    (kind, dev, ino),
+                ).fetchone()
+                if row is not None:
+                    hit = row
+                    self._memory[(kind, dev, ino)] = hit
+        if hit is None or hit[0] != size or hit[1] != mtime_ns:
+            return None
+        return hit[2]
+
+    def put(self, kind: str, key: FileKey, value: str) -> None:
+        dev, ino, size, mtime_ns = key
+        with self._lock:
+            self._memory[(kind, dev, ino)] = (size, mtime_ns, value)
+            if self._db is None:
+                return
+            self._pending.append((kind, dev, ino, size, mtime_ns, value))
+            if len(self._pending) >= self.flush_every:
+                self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        try:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", self._pending)
+        except sqlite3.Error:
+            pass  # una caché que no se guarda solo cuesta recalcular
+        self._pending = []
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+                self._db.close()
+                self._db = None
+
+    def __enter__(self) -> "MetadataCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,226 @@
+"""
+Fecha de captura de fotos y vídeos leyendo solo su cabecera.
+
+  - JPEG: el segmento APP1 "Exif", que las cámaras escriben al principio del archivo.
+  - TIFF y RAW basados en TIFF (DNG, NEF, ARW, CR2, ORF, RW2): la cabecera TIFF.
+  - HEIC/HEIF: el bloque Exif, si está en los primeros KB (donde lo dejan los móviles).
+  - MP4/MOV: la caja mvhd dentro de moov; se salta de caja en caja sin leer mdat.
+De EXIF se usa DateTimeOriginal, después DateTimeDigitized y por último DateTime.
+Nunca se leen más de EXIF_READ bytes de un archivo, sea cual sea su tamaño.
+"""
+import os
+import struct
+from datetime import date, datetime
+from typing import Dict, Optional
+
+from cache import MetadataCache, file_key
+
+# Lo más que se lee de los datos EXIF/TIFF de un archivo; los IFD y sus fechas están al principio
+EXIF_READ = 64 * 1024
+
+_CACHE_KIND = "capture-date"
+
+# Extensiones que pueden llevar fecha de captura; las demás no se abren
+CAPTURE_SUFFIXES = (
+    ".jpg", ".jpeg", ".tif", ".tiff", ".dng", ".nef", ".arw", ".cr2", ".orf", ".rw2",
+    ".heic", ".heif", ".mp4", ".mov", ".m4v", ".3gp",
+)
+
+# Etiquetas TIFF/EXIF
+_EXIF_IFD = 0x8769
+_DATETIME = 0x0132
+_DATETIME_ORIGINAL = 0x9003
+_DATETIME_DIGITIZED = 0x9004
+_DATE_TAGS = (_DATETIME_ORIGINAL, _DATETIME_DIGITIZED, _DATETIME)
+_ASCII = 2
+
+# Segundos entre 1904-01-01 (época de MP4/QuickTime) y 1970-01-01
+_MP4_EPOCH = 2082844800
+
+# Límites para archivos dañados: nunca se recorren más segmentos, entradas o cajas
+_MAX_SEGMENTS = 32
+_MAX_ENTRIES = 1024
+_MAX_BOXES = 64
+
+
+def _exif_date(raw: bytes) -> Optional[date]:
+    """'AAAA:MM:DD HH:MM:SS' → fecha; None si está vacía o es imposible (0000:00:00...)."""
+    try:
+        value = date(int(raw[0:4]), int(raw[5:7]), int(raw[8:10]))
+    except ValueError:
+        return None
+    return value if value.year >= 1900 else None
+
+
+def _read_ifd(data: bytes, order: str, offset: int, found: Dict[int, bytes]) -> Optional[int]:
+    """Apunta en `found` las fechas del IFD en `offset`; devuelve el puntero al IFD Exif, si lo hay."""
+    if offset <= 0 or offset + 2 > len(data):
+        return None
+    (count,) = struct.unpack_from(order + "H", data, offset)
+    pointer = None
+    for i in range(min(count, _MAX_ENTRIES)):
+        pos = offset + 2 + 12 * i
+        if pos + 12 > len(data):
+            break
+        tag, kind, n, value = struct.unpack_from(order + "HHII", data, pos)
+        if tag == _EXIF_IFD:
+            pointer = value
+        elif tag in _DATE_TAGS and kind == _ASCII and n >= 19 and value + 19 <= len(data):
+            found[tag] = data[value:value + 19]
+    return pointer
+
+
+def tiff_date(data: bytes) -> Optional[date]:
+    """Fecha de captura de unos datos TIFF (los de un bloque EXIF o el principio de un RAW)."""
+    if data[:2] == b"II":
+        order = "<"
+    elif data[:2] == b"MM":
+        order = ">"
+    else:
+        return None
+    if len(data) < 8:
+        return None
+    found: Dict[int, bytes] = {}
+    (offset,) = struct.unpack_from(order + "I", data, 4)
+    pointer = _read_ifd(data, order, offset, found)
+    if pointer is not None:
+        _read_ifd(data, order, pointer, found)
+    for tag in _DATE_TAGS:
+        if tag in found:
+            value = _exif_date(found[tag])
+            if value is not None:
+                return value
+    return None
+
+
+def _jpeg_date(fh) -> Optional[date]:
+    # Segmentos [FF marca longitud datos] hasta APP1 Exif; con SOS empieza la imagen
+    fh.seek(2)
+    for _ in range(_MAX_SEGMENTS):
+        header = fh.read(4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return None
+        marker = header[1]
+        length = int.from_bytes(header[2:4], "big") - 2
+        if marker in (0xDA, 0xD9) or length < 0:
+            return None
+        if marker == 0xE1:
+            data = fh.read(min(length, EXIF_READ))
+            if data.startswith(b"Exif\x00\x00"):
+                return tiff_date(data[6:])
+            length -= len(data)
+        fh.seek(length, os.SEEK_CUR)
+    return None
+
+
+def _box_header(fh, pos: int, end: int):
+    """(tipo, posición de los datos, fin) de la caja ISO-BMFF en `pos`, o None."""
+    fh.seek(pos)
+    header = fh.read(8)
+    if len(header) < 8:
+        return None
+    size, kind = struct.unpack(">I4s", header)
+    data = pos + 8
+    if size == 1:
+        large = fh.read(8)
+        if len(large) < 8:
+            return None
+        (size,) = struct.unpack(">Q", large)
+        data += 8
+    elif size == 0:
+        size = end - pos  # la caja llega hasta el final
+    if size < data - pos:
+        return None
+    return kind, data, pos + size
+
+
+def _mp4_date(fh, size: int) -> Optional[date]:
+    # moov puede ir antes o después de mdat: se salta cada caja por su tamaño, sin leerla
+    pos = 0
+    for _ in range(_MAX_BOXES):
+        box = _box_header(fh, pos, size)
+        if box is None:
+            return None
+        kind, data, end = box
+        if kind == b"moov":
+            child = data
+            for _ in range(_MAX_BOXES):
+                inner = _box_header(fh, child, end)
+                if inner is None:
+                    return None
+                if inner[0] == b"mvhd":
+                    return _mvhd_date(fh.read(12))
+                child = inner[2]
+                if child >= end:
+                    return None
+            return None
+        pos = end
+        if pos >= size:
+            return None
+    return None
+
+
+def _mvhd_date(data: bytes) -> Optional[date]:
+    # versión (1 byte) + flags (3) + creation_time: 32 bits en la versión 0, 64 en la 1
+    if len(data) < 8:
+        return None
+    if data[0] == 1:
+        if len(data) < 12:
+            return None
+        (seconds,) = struct.unpack_from(">Q", data, 4)
+    else:
+        (seconds,) = struct.unpack_from(">I", data, 4)
+    # Muchas cámaras dejan 0 (1904) cuando no tienen hora: eso no es una fecha
+    if seconds <= _MP4_EPOCH:
+        return None
+    try:
+        return datetime.fromtimestamp(seconds - _MP4_EPOCH).date()
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def read_capture_date(path: str) -> Optional[date]:
+    """Fecha de captura según la cabecera del archivo, o None si no la tiene o no se entiende."""
+    with open(path, "rb") as fh:
+        head = fh.read(16)
+        if head[:2] == b"\xff\xd8":
+            return _jpeg_date(fh)
+        if head[:2] in (b"II", b"MM"):
+            fh.seek(0)
+            return tiff_date(fh.read(EXIF_READ))
+        if head[4:8] == b"ftyp":
+            brand = head[8:12]
+            if brand in (b"heic", b"heix", b"mif1", b"msf1"):
+                fh.seek(0)
+                data = fh.read(EXIF_READ)
+                start = data.find(b"Exif\x00\x00")
+                return tiff_date(data[start + 6:]) if start >= 0 else None
+            return _mp4_date(fh, os.fstat(fh.fileno()).st_size)
+    return None
+
+
+class CaptureDates:
+    """
+    Fechas de captura con caché: el resultado se guarda en `cache` por (dispositivo,
+    inodo, tamaño, mtime), así que cada archivo sin cambios solo se abre una vez.
+    Seguro entre hilos (layout.Layout lo usa desde su pool).
+    """
+
+    def __init__(self, cache: Optional[MetadataCache] = None):
+        self.cache = cache if cache is not None else MetadataCache()
+        self.reads = 0
+
+    def get(self, path: str, st: os.stat_result) -> Optional[date]:
+        if not path.lower().endswith(CAPTURE_SUFFIXES):
+            return None
+        key = file_key(st)
+        cached = self.cache.get(_CACHE_KIND, key)
+        if cached is not None:
+            return date.fromisoformat(cached) if cached else None
+        try:
+            value = read_capture_date(path)
+        except (OSError, struct.error):
+            return None
+        self.reads += 1
+        self.cache.put(_CACHE_KIND, key, value.isoformat() if value is not None else "")
+        return value
@@ -0,0 +1,489 @@
+"""
+Interfaz de línea de comandos de FileFlow (sin tkinter).
+
+    python cli.py ~/Descargas                  # organiza en la misma carpeta
+    python cli.py ~/Descargas -d ~/Ordenado    # organiza en otra carpeta
+    python cli.py ~/Descargas --dry-run --json # plan en JSON lines, sin mover nada
+    python cli.py --undo                       # deshace la última ejecución
+    python cli.py ~/Descargas --watch          # sigue organizando lo que vaya llegando
+
+Pensado para lanzarse miles de veces al día desde cron: solo se importa lo imprescindible
+y las traducciones se cargan únicamente si se pide un idioma distinto del inglés.
+"""
+import argparse
+import os
+import sys
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_CANCELLED = 130  # como un proceso terminado con Ctrl+C
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="fileflow", description="Organize files into folders by type.")
+    parser.add_argument("source", nargs="?", help="folder to organize")
+    parser.add_argument("-d", "--dest", help="destination folder (default: the source folder)")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="only show the planned moves")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="parallel move workers (default: 1)")
+    parser.add_argument("-r", "--rules", metavar="FILE", help="JSON file with custom rules")
+    parser.add_argument("-R", "--recursive", action="store_true", help="organize subfolders too")
+    parser.add_argument("--max-depth", type=int, metavar="N", help="with --recursive, how many levels to descend")
+    parser.add_argument("--follow-symlinks", action="store_true", help="with --recursive, enter linked folders")
+    parser.add_argument(
+        "--exclude", action="append", default=[], metavar="GLOB",
+        help="with --recursive, skip matching folders and files (repeatable)",
+    )
+    parser.add_argument(
+        "--preserve-subpath", action="store_true",
+        help="with --recursive, keep the relative folder under each category",
+    )
+    parser.add_argument(
+        "--sniff", action="store_true",
+        help="detect the type of files with unknown extensions from their content",
+    )
+    parser.add_argument(
+        "--dedupe", choices=("skip", "hardlink", "duplicates"),
+        help="handle files identical to one already organized: leave them, hardlink them or move them to Duplicates",
+    )
+    parser.add_argument(
+        "--link", nargs="?", const="auto", choices=("auto", "reflink", "hardlink", "symlink", "copy"),
+        help="leave the originals in place and fill the category folders with links (default: auto, "
+        "which tries reflink, hardlink, symlink, then copy)",
+    )
+    parser.add_argument(
+        "--layout", metavar="TEMPLATE",
+        help="folder layout under the destination, e.g. '{category}/{year}/{month}' "
+        "(fields: category, year, month, day)",
+    )
+    parser.add_argument(
+        "--date-source", choices=("capture", "mtime"), default="capture",
+        help="with --layout, date the files by their EXIF/video capture date falling back to mtime "
+        "(default), or by mtime only",
+    )
+    shard = parser.add_mutually_exclusive_group()
+    shard.add_argument(
+        "--shard", type=int, metavar="N",
+        help="cap destination folders at N files, splitting them into numbered subfolders (0001, 0002...)",
+    )
+    shard.add_argument(
+        "--shard-hash", type=int, nargs="?", const=2, metavar="DIGITS",
+        help="split destination folders by the first hex digits of a hash of the file name (default: 2, 256 subfolders)",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="remember what was already seen (in a .fileflow-state file in the source) and skip unchanged folders next time",
+    )
+    parser.add_argument("--json", action="store_true", help="print one JSON event per line")
+    parser.add_argument("-q", "--quiet", action="store_true", help="print nothing but errors")
+    parser.add_argument("--lang", default="en", help="language of the text output (en, es, fr, de, it, pt)")
+    parser.add_argument("--watch", action="store_true", help="keep running and organize new files as they arrive")
+    parser.add_argument("--no-journal", action="store_true", help="do not record the run in the journal")
+    parser.add_argument(
+        "--undo", nargs="?", const="last", metavar="RUN",
+        help="undo a recorded run (default: the most recent one)",
+    )
+    parser.add_argument("--list-runs", action="store_true", help="list the recorded runs and exit")
+    parser.add_argument(
+        "--batch", metavar="FILE",
+        help="organize every folder listed in FILE (one per line, optionally 'source<TAB>dest'); "
+        "--workers sets how many run at once",
+    )
+    parser.add_argument(
+        "--device-limit", action="append", default=[], metavar="KIND=N",
+        help="with --batch, folders processed at once per hdd, ssd, network or unknown device",
+    )
+    parser.add_argument("--stats", action="store_true", help="print time per phase and counters to stderr")
+    parser.add_argument("--stats-json", metavar="FILE", help="write the run metrics as JSON")
+    parser.add_argument(
+        "--prometheus", metavar="FILE",
+        help="write the run metrics in Prometheus text format (node_exporter textfile collector)",
+    )
+    return parser
+
+
+def _messages(lang: str):
+    if lang == "en":
+        # Los textos por defecto de events ya están en inglés
+        return None
+    from translations import TRANSLATIONS
+
+    if lang not in TRANSLATIONS:
+        return None
+    return {**TRANSLATIONS[lang]["organizer"], **TRANSLATIONS[lang]["msg"]}
+
+
+def _make_output(args):
+    """Devuelve (event_callback, log_callback, messages) según el modo de salida."""
+    if args.quiet:
+        return None, None, None
+    if args.json:
+        import json
+
+        write = sys.stdout.write
+
+        def on_event(event) -> None:
+            write(json.dumps(event.to_dict(), ensure_ascii=False) + "\n")
+
+        return on_event, None, None
+    return None, print, _messages(args.lang)
+
+
+def _make_stats(args, operation: str):
+    if not (args.stats or args.stats_json or args.prometheus):
+        return None
+    from stats import RunStats
+
+    return RunStats(operation)
+
+
+def _report_stats(args, stats) -> None:
+    if stats is None:
+        return
+    if args.stats_json:
+        stats.write_json(args.stats_json)
+    if args.prometheus:
+        stats.write_prometheus(args.prometheus)
+    if args.stats:
+        from translations import TRANSLATIONS
+
+        text = TRANSLATIONS.get(args.lang, TRANSLATIONS["en"])["msg"]["stats_summary"]
+        print(text.format(**stats.summary_values()), file=sys.stderr)
+
+
+def _find_run(journal, run_id: str):
+    runs = journal.list_runs()
+    if run_id == "last":
+        # Una ejecución que no movió nada no es la "última" que deshacer
+        for run in runs:
+            if run.status in (journal.STATUS_COMPLETE, journal.STATUS_INTERRUPTED) and journal.has_moves(run.path):
+                return run
+        return None
+    for run in runs:
+        if run.run_id == run_id or str(run.path) == run_id:
+            return run
+    return None
+
+
+def _list_runs() -> int:
+    import time
+    import journal
+
+    for run in journal.list_runs():
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run.started))
+        print(f"{run.run_id}\t{started}\t{run.status}\t{run.source} -> {run.dest}")
+    return EXIT_OK
+
+
+def _undo(args) -> int:
+    import journal
+    from organizer import undo_run
+
+    run = _find_run(journal, args.undo)
+    if run is None:
+        print(f"fileflow: no run to undo: {args.undo}", file=sys.stderr)
+        return EXIT_ERROR
+    event_callback, log_callback, messages = _make_output(args)
+    stats = _make_stats(args, "undo")
+    restored = undo_run(
+        run,
+        log_callback=log_callback,
+        messages=messages,
+        workers=args.workers,
+        event_callback=event_callback,
+        stats=stats,
+    )
+    _report_stats(args, stats)
+    if run.status in (journal.STATUS_UNDONE, journal.STATUS_ROLLED_BACK):
+        return EXIT_OK
+    # Lo que se omitió (borrado, modificado, ocupado en el origen) sigue sin deshacer
+    total = journal.count_done(run.path)
+    if restored < total:
+        print(f"fileflow: {total - restored} of {total} files were not restored", file=sys.stderr)
+        return EXIT_ERROR
+    return EXIT_OK
+
+
+def _organize(args) -> int:
+    from organizer import DEFAULT_RULES, FILE_TYPES
+
+    rules = None
+    if args.rules:
+        from rules import load_rules
+
+        rules = load_rules(args.rules, FILE_TYPES)
+
+    cache = None
+    dedupe = None
+    layout = None
+    if args.sniff or args.dedupe or args.layout:
+        from cache import MetadataCache
+
+        cache = MetadataCache.open_default()
+    if args.layout:
+        from layout import Layout
+
+        layout = Layout(args.layout, args.date_source, cache)
+    if args.sniff:
+        from sniff import Sniffer
+
+        rules = (rules or DEFAULT_RULES).with_sniffer(Sniffer(cache))
+    if args.dedupe:
+        from dedupe import Deduplicator
+
+        dedupe = Deduplicator(args.dedupe, cache)
+    try:
+        if args.batch:
+            return _batch_with(args, rules, dedupe, layout)
+        return _organize_with(args, rules, dedupe, layout)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def _walk_options(args):
+    if not args.recursive:
+        return None
+    from organizer import WalkOptions
+
+    return WalkOptions(
+        max_depth=args.max_depth,
+        follow_symlinks=args.follow_symlinks,
+        exclude=tuple(args.exclude),
+        preserve_subpath=args.preserve_subpath,
+    )
+
+
+def _sharding(args):
+    if args.shard is None and args.shard_hash is None:
+        return None
+    from sharding import HASH, Sharding
+
+    if args.shard_hash is not None:
+        return Sharding(mode=HASH, width=args.shard_hash)
+    return Sharding(args.shard)
+
+
+def _device_limits(values) -> dict:
+    limits = {}
+    for value in values:
+        kind, _, n = value.partition("=")
+        if not n.isdigit() or int(n) < 1:
+            raise ValueError(f"invalid --device-limit: {value} (expected KIND=N, N >= 1)")
+        limits[kind.strip().lower()] = int(n)
+    return limits
+
+
+def _batch_with(args, rules, dedupe, layout) -> int:
+    from batch import read_batch_file, run_batch
+    from organizer import CancelToken
+
+    jobs = read_batch_file(args.batch, default_dest=args.dest)
+    event_callback, log_callback, messages = _make_output(args)
+    show_jobs = not (args.quiet or args.json)
+
+    def on_job(result) -> None:
+        if not show_jobs:
+            return
+        status = f"error: {result.error}" if result.error is not None else "ok"
+        run = result.run.stem if result.run is not None else "-"
+        print(f"{result.source}\t{len(result.moves)}\t{run}\t{status}", file=sys.stderr)
+
+    cancel = CancelToken()
+    _cancel_on_interrupt(cancel)
+    result = run_batch(
+        jobs,
+        rules=rules,
+        workers=args.workers,
+        limits=_device_limits(args.device_limit),
+        log_callback=log_callback,
+        messages=messages,
+        event_callback=event_callback,
+        job_callback=on_job,
+        use_journal=not args.no_journal,
+        walk=_walk_options(args),
+        dedupe=dedupe,
+        cancel=cancel,
+        incremental=args.incremental,
+        link=args.link,
+        layout=layout,
+        sharding=_sharding(args),
+    )
+    _report_stats(args, result.stats)
+    if cancel.cancelled:
+        return EXIT_CANCELLED
+    return EXIT_ERROR if result.failed else EXIT_OK
+
+
+def _cancel_on_interrupt(cancel) -> None:
+    """El primer Ctrl+C termina lo que está en marcha y para; el segundo interrumpe sin más."""
+    import signal
+
+    def on_interrupt(signum, frame) -> None:
+        cancel.cancel()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    signal.signal(signal.SIGINT, on_interrupt)
+    signal.signal(signal.SIGTERM, lambda signum, frame: cancel.cancel())
+
+
+def _organize_with(args, rules, dedupe, layout) -> int:
+    import journal
+    from events import make_emitter
+    from organizer import CancelToken, OrganizeError, organize_files
+
+    walk = _walk_options(args)
+    run_journal = None
+    if not args.dry_run and not args.no_journal:
+        try:
+            run_journal = journal.Journal.start(args.source, args.dest or args.source, link=args.link)
+        except OSError:
+            # Sin diario se organiza igual; solo se pierde el deshacer entre sesiones
+            run_journal = None
+
+    event_callback, log_callback, messages = _make_output(args)
+    if args.watch:
+        return _watch(args, rules, layout, run_journal, make_emitter(event_callback, log_callback, messages))
+    stats = _make_stats(args, "plan" if args.dry_run else "organize")
+    cancel = CancelToken()
+    _cancel_on_interrupt(cancel)
+    try:
+        moves = organize_files(
+            args.source,
+            args.dest,
+            log_callback=log_callback,
+            messages=messages,
+            rules=rules,
+            # Sin interfaz no hace falta conocer el total: se empieza a mover mientras se lista
+            streaming=not args.dry_run,
+            dry_run=args.dry_run,
+            workers=args.workers,
+            journal=run_journal,
+            event_callback=event_callback,
+            walk=walk,
+            dedupe=dedupe,
+            stats=stats,
+            cancel=cancel,
+            incremental=args.incremental,
+            link=args.link,
+            layout=layout,
+            sharding=_sharding(args),
+        )
+    except OrganizeError as e:
+        # Las cifras de una ejecución fallida son justo las que interesan
+        _report_stats(args, stats)
+        print(f"fileflow: {e} ({_partial_note(e.moves, run_journal)})", file=sys.stderr)
+        return EXIT_ERROR
+    _report_stats(args, stats)
+    if cancel.cancelled:
+        note = "" if args.dry_run else f" ({_partial_note(moves, run_journal)})"
+        print(f"fileflow: cancelled{note}", file=sys.stderr)
+        return EXIT_CANCELLED
+    return EXIT_OK
+
+
+def _partial_note(moves, run_journal) -> str:
+    note = f"{len(moves)} files were moved"
+    if moves and run_journal is not None:
+        note += f"; --undo {run_journal.run_id} reverts them"
+    return note
+
+
+def _watch(args, rules, layout, run_journal, emit) -> int:
+    import signal
+    from watch import Watcher
+
+    def on_error(error: Exception) -> None:
+        print(f"fileflow: {error}", file=sys.stderr)
+
+    def on_event(event) -> None:
+        emit(event)
+        # Quien lee la salida por una tubería debe ver cada movimiento al momento
+        sys.stdout.flush()
+
+    watcher = Watcher(
+        args.source,
+        args.dest,
+        rules=rules,
+        workers=args.workers,
+        journal=run_journal,
+        event_callback=on_event if emit else None,
+        error_callback=on_error,
+        layout=layout,
+        sharding=_sharding(args),
+    )
+    # Ctrl+C y SIGTERM (systemd, kill) paran entre lote y lote, con el diario completo.
+    # Un KeyboardInterrupt podría caer entre un rename y su registro "done".
+    def on_interrupt(signum, frame) -> None:
+        watcher.stop()
+        # Un segundo Ctrl+C interrumpe sin más
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    signal.signal(signal.SIGINT, on_interrupt)
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    interrupted = False
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        interrupted = True
+    finally:
+        if run_journal is not None:
+            if interrupted:
+                # Sin marca de fin: queda como interrumpido y se reconcilia con el disco
+                run_journal.close()
+            else:
+                run_journal.finish()
+    return EXIT_CANCELLED if interrupted else EXIT_OK
+
+
+def main(argv=None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.watch and (args.dry_run or args.undo is not None or args.recursive or args.dedupe or args.incremental):
+        parser.error("--watch cannot be combined with --dry-run, --undo, --recursive, --dedupe or --incremental")
+    if args.watch and args.link:
+        parser.error("--watch cannot be combined with --link")
+    if args.link and args.dedupe == "hardlink":
+        parser.error("--link cannot be combined with --dedupe hardlink")
+    if args.watch and (args.stats or args.stats_json or args.prometheus):
+        parser.error("--watch cannot be combined with --stats, --stats-json or --prometheus")
+    if args.max_depth is not None and args.max_depth < 0:
+        parser.error("--max-depth cannot be negative")
+    if args.layout:
+        from layout import Layout
+
+        try:
+            Layout(args.layout, args.date_source)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.shard is not None and args.shard < 1:
+        parser.error("--shard must be at least 1")
+    if args.shard_hash is not None and not 1 <= args.shard_hash <= 8:
+        parser.error("--shard-hash must be between 1 and 8")
+    if args.batch and (args.source or args.watch or args.dry_run or args.undo is not None):
+        parser.error("--batch cannot be combined with a source folder, --watch, --dry-run or --undo")
+    if args.list_runs:
+        return _list_runs()
+    if args.undo is None and not args.batch:
+        if not args.source:
+            parser.error("the source folder is required")
+        if not os.path.isdir(args.source):
+            parser.error(f"not a folder: {args.source}")
+    # El diario guarda rutas absolutas: --undo tiene que funcionar desde cualquier directorio
+    if args.source:
+        args.source = os.path.abspath(args.source)
+    if args.dest:
+        args.dest = os.path.abspath(args.dest)
+
+    try:
+        return _undo(args) if args.undo is not None else _organize(args)
+    except (OSError, ValueError) as e:
+        print(f"fileflow: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import hashlib
+import os
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cache import MetadataCache, file_key
+from organizer import DUPLICATES, DestinationIndex, PlannedMove
+
+# Qué hacer con un duplicado confirmado
+SKIP = "skip"  # dejarlo donde está
+HARDLINK = "hardlink"  # en el destino queda un enlace duro al archivo ya existente
+MOVE_TO_DUPLICATES = "duplicates"  # moverlo a la carpeta Duplicates del destino
+ACTIONS = (SKIP, HARDLINK, MOVE_TO_DUPLICATES)
+
+# Bloque inicial y final que forman el hash parcial
+BLOCK_SIZE = 64 * 1024
+_READ_SIZE = 1024 * 1024
+
+# Por debajo de esto, arrancar procesos cuesta más que hashear en el propio hilo
+POOL_MIN_BYTES = 64 * 1024 * 1024
+
+_PARTIAL = "hash-partial"
+_FULL = "hash-full"
+
+
+def _digest():
+    return hashlib.blake2b(digest_size=32)
+
+
+def hash_partial(path: str) -> Optional[str]:
+    """Hash del primer y el último bloque. Si el archivo cabe en ellos, es el hash completo."""
+    try:
+        with open(path, "rb") as fh:
+            h = _digest()
+            h.update(fh.read(BLOCK_SIZE))
+            size = os.fstat(fh.fileno()).st_size
+            if size > 2 * BLOCK_SIZE:
+                fh.seek(size - BLOCK_SIZE)
+            h.update(fh.read(BLOCK_SIZE))
+            return h.hexdigest()
+    except OSError:
+        return None
+
+
+def hash_full(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as fh:
+            h = _digest()
+            for chunk in iter(lambda: fh.read(_READ_SIZE), b""):
+                h.update(chunk)
+            return h.hexdigest()
+    except OSError:
+        return None
+
+
+class _Candidate:
+    __slots__ = ("path", "key", "move", "order")
+
+    def __init__(self, path: str, st: os.stat_result, move: Optional[PlannedMove], order: int):
+        self.path = path
+        self.key = file_key(st)
+        self.move = move  # None = archivo que ya estaba en el destino
+        self.order = order
+
+    @property
+    def size(self) -> int:
+        return self.key[2]
+
+
+class Deduplicator:
+    """
+    Detecta, antes de ejecutar un plan, los archivos entrantes idénticos a otro entrante
+    o a uno que ya está en alguna de las carpetas destino del plan. Se confirma por etapas y cada una solo
+    mira lo que sobrevivió a la anterior:
+      1. mismo tamaño (del stat del plan; los vacíos se ignoran),
+      2. mismo hash del primer y último bloque,
+      3. mismo hash completo.
+    Los hashes se calculan en un pool de procesos cuando el volumen lo merece y se
+    guardan en `cache` por (dispositivo, inodo, tamaño, mtime), así que volver a
+    ejecutar sobre archivos sin cambios no relee nada.
+    """
+
+    def __init__(
+        self,
+        action: str = SKIP,
+        cache: Optional[MetadataCache] = None,
+        processes: Optional[int] = None,
+    ):
+        if action not in ACTIONS:
+            raise ValueError(f"Invalid dedupe action: {action!r}")
+        self.action = action
+        self.cache = cache if cache is not None else MetadataCache()
+        self.processes = processes
+        self.hashed_bytes = 0
+
+    # --------- Hashes ---------
+    def _hashes(self, kind: str, fn, candidates: List[_Candidate], read_bytes) -> Dict[str, Optional[str]]:
+        result: Dict[str, Optional[str]] = {}
+        missing = []
+        for c in candidates:
+            cached = self.cache.get(kind, c.key)
+            if cached is not None:
+                result[c.path] = cached
+            else:
+                missing.append(c)
+        if not missing:
+            return result
+
+        total = sum(read_bytes(c) for c in missing)
+        self.hashed_bytes += total
+        paths = [c.path for c in missing]
+        if total >= POOL_MIN_BYTES and len(paths) > 1 and self.processes != 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                digests = list(pool.map(fn, paths, chunksize=max(1, len(paths) // 64)))
+        else:
+            digests = [fn(p) for p in paths]
+        for c, digest in zip(missing, digests):
+            result[c.path] = digest
+            if digest is not None:
+                self.cache.put(kind, c.key, digest)
+        return result
+
+    def _refine(self, groups: Iterable[List[_Candidate]], kind: str, fn, read_bytes) -> List[List[_Candidate]]:
+        """Parte cada grupo por hash y se queda con los subgrupos que aún pueden tener duplicados."""
+        groups = list(groups)
+        flat = [c for group in groups for c in group]
+        hashes = self._hashes(kind, fn, flat, read_bytes)
+        refined = []
+        for group in groups:
+            by_hash: Dict[str, List[_Candidate]] = {}
+            for c in group:
+                digest = hashes.get(c.path)
+                if digest is not None:
+                    by_hash.setdefault(digest, []).append(c)
+            refined.extend(g for g in by_hash.values() if _worth_checking(g))
+        return refined
+
+    # --------- Plan ---------
+    def _candidates(self, moves: List[PlannedMove]) -> List[List[_Candidate]]:
+        by_size: Dict[int, List[PlannedMove]] = {}
+        for move in moves:
+            if move.size > 0:
+                by_size.setdefault(move.size, []).append(move)
+
+        buckets: Dict[int, List[_Candidate]] = {}
+        for i, move in enumerate(moves):
+            if move.size in by_size:
+                try:
+                    st = os.stat(move.source)
+                except OSError:
+                    continue
+                buckets.setdefault(st.st_size, []).append(_Candidate(move.source, st, move, i))
+        order = len(moves)
+
+        # Lo que ya hay en las carpetas destino solo cuenta si coincide en tamaño con algo entrante
+        for folder in sorted({m.folder for m in moves}):
+            try:
+                it = os.scandir(folder)
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if st.st_size in buckets:
+                        # Los existentes van delante: son los que se conservan
+                        buckets[st.st_size].append(_Candidate(entry.path, st, None, -1 - order))
+                        order += 1
+        return [g for g in buckets.values() if _worth_checking(g)]
+
+    def find_duplicates(self, moves: List[PlannedMove]) -> List[Tuple[PlannedMove, str]]:
+        """
+        (movimiento duplicado, ruta del original que se conserva) en orden del plan.
+        Si el original también es entrante, la ruta es la de su destino previsto.
+        """
+        groups = self._candidates(moves)
+        groups = self._refine(groups, _PARTIAL, hash_partial, lambda c: min(c.size, 2 * BLOCK_SIZE))
+        # Si el archivo cabe en los dos bloques, el hash parcial ya era el completo
+        small = [g for g in groups if g[0].size <= 2 * BLOCK_SIZE]
+        large = [g for g in groups if g[0].size > 2 * BLOCK_SIZE]
+        groups = small + self._refine(large, _FULL, hash_full, lambda c: c.size)
+        self.cache.flush()
+
+        duplicates = []
+        for group in groups:
+            group.sort(key=lambda c: c.order)
+            original = group[0]
+            kept = original.path if original.move is None else original.move.dest
+            for c in group[1:]:
+                if c.move is not None:
+                    duplicates.append((c.move, kept, c.order))
+        duplicates.sort(key=lambda d: d[2])
+        return [(move, original) for move, original, _ in duplicates]
+
+    def apply(
+        self, moves: List[PlannedMove], index: DestinationIndex, dest_folder: str
+    ) -> Tuple[List[PlannedMove], List[Tuple[PlannedMove, str]]]:
+        """
+        Devuelve (plan a ejecutar, duplicados omitidos). Según la acción, los duplicados salen del
+        plan (SKIP), pasan a ser enlaces al original (HARDLINK, al final del plan para que
+        el original ya esté en su sitio) o van a dest_folder/Duplicates con un nombre libre
+        reservado en `index` (MOVE_TO_DUPLICATES).
+        """
+        duplicates = self.find_duplicates(moves)
+        if not duplicates:
+            return moves, []
+        originals = {id(move): original for move, original in duplicates}
+        plan = []
+        skipped = []
+        for move in moves:
+            original = originals.get(id(move))
+            if original is None:
+                plan.append(move)
+            elif self.action == HARDLINK:
+                plan.append(replace(move, link_to=original))
+            elif self.action == MOVE_TO_DUPLICATES:
+                index.release(Path(move.dest))
+                folder = Path(dest_folder) / DUPLICATES
+                target = index.reserve(folder, os.path.basename(move.source))
+                plan.append(replace(move, folder=str(folder), name=target.name, category=DUPLICATES))
+            else:
+                index.release(Path(move.dest))
+                skipped.append((move, original))
+        plan.sort(key=lambda m: (bool(m.link_to), m.folder))
+        return plan, skipped
+
+
+def _worth_checking(group: List[_Candidate]) -> bool:
+    """Un grupo solo interesa si hay al menos dos archivos y alguno es entrante."""
+    return len(group) > 1 and any(c.move is not None for c in group)
@@ -0,0 +1,93 @@
+import os
+from typing import Callable, Dict, NamedTuple, Optional
+
+from rules import OTHERS
+
+# Tipos de evento
+MOVED = "moved"
+PLANNED = "planned"
+NO_FILES = "no_files"
+RESTORED = "restored"
+SKIPPED_MISSING = "skipped_missing"
+SKIPPED_CHANGED = "skipped_changed"
+ERROR_RESTORING = "error_restoring"
+DUPLICATE = "duplicate"  # omitido por ser idéntico a dest
+LINKED = "linked"  # modo enlace: el original se queda en su sitio
+UNLINKED = "unlinked"  # deshacer en modo enlace: se borró el enlace
+
+DEFAULT_MESSAGES: Dict[str, str] = {
+    "no_files": "No files to organize.",
+    "moved": "✅ Moved {name} → {folder}",
+    "moved_others": "📁 Moved {name} → Others",
+    "planned": "🔎 {name} → {folder}",
+    "restored": "↩️ Restored {name} → {folder}",
+    "skipped_missing": "⚠️ Skipped missing file: {name}",
+    "error_restoring": "❌ Error restoring {name}: {error}",
+    "skipped_changed": "⚠️ Skipped {name}: it changed after organizing",
+    "duplicate": "♻️ Skipped {name}: duplicate of {folder}",
+    "linked": "🔗 Linked {name} → {folder}",
+    "unlinked": "🧹 Removed link {name}",
+}
+
+
+class MoveEvent(NamedTuple):
+    """
+    Evento compacto emitido por el organizador. El texto localizado no se genera aquí:
+    solo render_event lo formatea cuando de verdad se va a mostrar o exportar.
+    En los eventos de deshacer, source es la ruta organizada y dest la restaurada.
+    """
+    kind: str
+    source: str
+    dest: str
+    category: str
+    bytes: int
+    timestamp: float
+    detail: str = ""
+
+    def to_dict(self) -> Dict:
+        return self._asdict()
+
+
+EventCallback = Callable[[MoveEvent], None]
+
+
+def render_event(event: MoveEvent, messages: Optional[Dict[str, str]] = None) -> str:
+    """Convierte un evento en la línea de log del idioma de `messages` (p. ej. TRANSLATIONS[lang])."""
+    key = event.kind
+    if key == MOVED and event.category == OTHERS:
+        key = "moved_others"
+    template = (messages or {}).get(key) or DEFAULT_MESSAGES[key]
+
+    name = os.path.basename(event.dest or event.source)
+    if event.kind in (SKIPPED_MISSING, SKIPPED_CHANGED, ERROR_RESTORING, UNLINKED):
+        name = os.path.basename(event.source)
+    if event.kind == RESTORED:
+        folder = os.path.basename(os.path.dirname(event.dest))
+    elif event.kind == DUPLICATE:
+        name = os.path.basename(event.source)
+        folder = os.path.relpath(event.dest, os.path.dirname(os.path.dirname(event.dest)))
+    else:
+        folder = event.category
+    return template.format(name=name, folder=folder, error=event.detail)
+
+
+def make_emitter(
+    event_callback: Optional[EventCallback],
+    log_callback: Optional[Callable[[str], None]],
+    messages: Optional[Dict[str, str]],
+) -> Optional[EventCallback]:
+    """
+    Une los dos tipos de consumidor: eventos estructurados y/o líneas de texto.
+    Devuelve None si nadie escucha, para que el bucle ni siquiera cree eventos.
+    """
+    if event_callback is None and log_callback is None:
+        return None
+    if log_callback is None:
+        return event_callback
+
+    def emit(event: MoveEvent) -> None:
+        if event_callback is not None:
+            event_callback(event)
+        log_callback(render_event(event, messages))
+
+    return emit
@@ -0,0 +1,391 @@
+import errno
+import os
+import shutil
+import stat
+import sys
+from typing import Callable, Dict, Optional, Sequence, Set, Tuple
+
+ByteCallback = Callable[[int], None]
+
+_COPY_CHUNK = 8 * 1024 * 1024
+
+_NOT_SUPPORTED = {errno.ENOSYS, errno.EINVAL}
+for _name in ("EOPNOTSUPP", "ENOTSUP"):
+    if hasattr(errno, _name):
+        _NOT_SUPPORTED.add(getattr(errno, _name))
+
+# Errores que indican "esta vía no está disponible aquí", no un fallo real de E/S
+_UNSUPPORTED = _NOT_SUPPORTED | {errno.EXDEV, errno.EPERM, errno.EBADF}
+
+
+# --------- Rename sin reemplazo ---------
+
+_RENAME_NOREPLACE = 1  # linux/fs.h
+_RENAME_EXCL = 0x4  # macOS stdio.h
+_AT_FDCWD = -100
+
+
+def _load_native_rename():
+    if os.name == "nt":
+        return None
+    # ctypes se importa aquí y no al cargar el módulo: el CLI no lo paga si nunca mueve nada.
+    # CDLL(None) da los símbolos ya cargados (libc) sin find_library, que lanza ldconfig
+    import ctypes
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        return None
+    if sys.platform.startswith("linux") and hasattr(libc, "renameat2"):
+        fn = libc.renameat2
+        fn.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+        fn.restype = ctypes.c_int
+        call = lambda src, dst: fn(_AT_FDCWD, src, _AT_FDCWD, dst, _RENAME_NOREPLACE)
+    elif sys.platform == "darwin" and hasattr(libc, "renamex_np"):
+        fn = libc.renamex_np
+        fn.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint]
+        fn.restype = ctypes.c_int
+        call = lambda src, dst: fn(src, dst, _RENAME_EXCL)
+    else:
+        return None
+    # Devuelve 0 o el errno de la llamada
+    return lambda src, dst: 0 if call(src, dst) == 0 else ctypes.get_errno()
+
+
+_native_rename = None
+_native_loaded = False
+
+
+def _get_native_rename():
+    global _native_rename, _native_loaded
+    if not _native_loaded:
+        _native_rename = _load_native_rename()
+        _native_loaded = True
+    return _native_rename
+
+
+def rename_noreplace(src: str, dst: str) -> None:
+    """
+    Renombra de forma atómica sin pisar nunca un destino existente (FileExistsError).
+    Linux: renameat2(RENAME_NOREPLACE); macOS: renamex_np(RENAME_EXCL);
+    Windows: os.rename ya falla si el destino existe.
+    Si el sistema de archivos no lo soporta se recurre a link()+unlink().
+    """
+    if os.name == "nt":
+        os.rename(src, dst)
+        return
+
+    native = _get_native_rename()
+    if native is not None:
+        err = native(os.fsencode(src), os.fsencode(dst))
+        if err == 0:
+            return
+        # EINVAL/ENOSYS/ENOTSUP: el sistema de archivos no conoce el flag
+        if err not in _NOT_SUPPORTED:
+            raise OSError(err, os.strerror(err), src, None, dst)
+
+    try:
+        # link() también falla con EEXIST, así que sigue sin reemplazar
+        os.link(src, dst, follow_symlinks=False)
+    except OSError as e:
+        if e.errno not in _NOT_SUPPORTED and e.errno != errno.EPERM:
+            raise
+        # FAT/exFAT y algunos montajes de red sin enlaces duros: mejor esfuerzo
+        if os.path.lexists(dst):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), dst)
+        os.rename(src, dst)
+        return
+    os.unlink(src)
+
+
+# --------- Copia entre unidades ---------
+
+def _copy_range(src_fd: int, dst_fd: int, on_bytes: Optional[ByteCallback]) -> int:
+    copied = 0
+    while True:
+        n = os.copy_file_range(src_fd, dst_fd, _COPY_CHUNK)
+        if n == 0:
+            return copied
+        copied += n
+        if on_bytes:
+            on_bytes(n)
+
+
+def _copy_sendfile(src_fd: int, dst_fd: int, on_bytes: Optional[ByteCallback]) -> int:
+    copied = 0
+    while True:
+        n = os.sendfile(dst_fd, src_fd, copied, _COPY_CHUNK)
+        if n == 0:
+            return copied
+        copied += n
+        if on_bytes:
+            on_bytes(n)
+
+
+def _copy_buffered(src_fd: int, dst_fd: int, on_bytes: Optional[ByteCallback]) -> int:
+    copied = 0
+    while True:
+        data = os.read(src_fd, 1024 * 1024)
+        if not data:
+            return copied
+        view = memoryview(data)
+        while view:
+            view = view[os.write(dst_fd, view):]
+        copied += len(data)
+        if on_bytes:
+            on_bytes(len(data))
+
+
+def _zero_copy_strategies():
+    strategies = []
+    if hasattr(os, "copy_file_range"):
+        strategies.append(_copy_range)
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        strategies.append(_copy_sendfile)
+    strategies.append(_copy_buffered)
+    return strategies
+
+
+_STRATEGIES = _zero_copy_strategies()
+
+
+def copy_then_unlink(src: str, dst: str, on_bytes: Optional[ByteCallback] = None) -> os.stat_result:
+    """
+    Mueve entre unidades: crea dst en exclusiva (FileExistsError si ya existe), copia con
+    copy_file_range/sendfile cuando el kernel lo permite, conserva metadatos, hace fsync,
+    comprueba el tamaño copiado y solo entonces borra el origen. Devuelve el stat de dst.
+    Un enlace simbólico se recrea como enlace (apuntando a lo mismo), no se copia su destino.
+    """
+    if stat.S_ISLNK(os.lstat(src).st_mode):
+        dst_stat = _copy_symlink(src, dst)
+    else:
+        dst_stat = copy_exclusive(src, dst, on_bytes)
+    os.unlink(src)
+    return dst_stat
+
+
+def _copy_symlink(src: str, dst: str) -> os.stat_result:
+    # os.symlink nunca reemplaza: FileExistsError si dst ya existe, como la copia exclusiva
+    os.symlink(os.readlink(src), dst)
+    try:
+        shutil.copystat(src, dst, follow_symlinks=False)
+    except (OSError, NotImplementedError):
+        pass  # sin lutimes se pierde la fecha del enlace, no su destino
+    return os.lstat(dst)
+
+
+def copy_exclusive(src: str, dst: str, on_bytes: Optional[ByteCallback] = None) -> os.stat_result:
+    """La copia de copy_then_unlink, sin borrar el origen."""
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        src_size = os.fstat(src_fd).st_size
+        dst_fd = os.open(dst, flags, 0o666)
+        try:
+            try:
+                for strategy in _STRATEGIES:
+                    try:
+                        strategy(src_fd, dst_fd, on_bytes)
+                        break
+                    except OSError as e:
+                        # Solo se cambia de estrategia si aún no se escribió nada
+                        if e.errno not in _UNSUPPORTED or os.lseek(dst_fd, 0, os.SEEK_CUR) != 0:
+                            raise
+                        os.lseek(src_fd, 0, os.SEEK_SET)
+                shutil.copystat(src, dst)
+                os.fsync(dst_fd)
+                dst_stat = os.fstat(dst_fd)
+            finally:
+                os.close(dst_fd)
+            if dst_stat.st_size != src_size:
+                raise OSError(errno.EIO, f"Incomplete copy ({dst_stat.st_size} of {src_size} bytes)", dst)
+        except BaseException:
+            try:
+                os.unlink(dst)
+            except OSError:
+                pass
+            raise
+    finally:
+        os.close(src_fd)
+    return dst_stat
+
+
+# --------- Enlaces (organizar sin mover) ---------
+
+REFLINK = "reflink"
+HARDLINK = "hardlink"
+SYMLINK = "symlink"
+COPY = "copy"
+AUTO = "auto"
+
+# Métodos que se prueban, en orden, para cada modo de enlace. Un reflink es una copia
+# independiente que comparte bloques (Btrfs, XFS, APFS); un enlace duro es el mismo
+# archivo con otro nombre (mismo inodo); un enlace simbólico sirve entre unidades.
+LINK_METHODS: Dict[str, Tuple[str, ...]] = {
+    AUTO: (REFLINK, HARDLINK, SYMLINK, COPY),
+    REFLINK: (REFLINK, COPY),
+    HARDLINK: (HARDLINK, SYMLINK, COPY),
+    SYMLINK: (SYMLINK, COPY),
+    COPY: (COPY,),
+}
+
+_FICLONE = 0x40049409  # linux/fs.h
+
+# Además de "no soportado": demasiados enlaces a un mismo inodo
+_LINK_UNSUPPORTED = _UNSUPPORTED | {errno.EMLINK}
+
+_native_clone = None
+_clone_loaded = False
+
+
+def _get_native_clone():
+    # clonefile(2) de macOS; como con renamex_np, ctypes solo se carga si hace falta
+    global _native_clone, _clone_loaded
+    if not _clone_loaded:
+        _clone_loaded = True
+        if sys.platform == "darwin":
+            import ctypes
+            try:
+                libc = ctypes.CDLL(None, use_errno=True)
+            except OSError:
+                libc = None
+            if libc is not None and hasattr(libc, "clonefile"):
+                fn = libc.clonefile
+                fn.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32]
+                fn.restype = ctypes.c_int
+                _native_clone = lambda src, dst: 0 if fn(src, dst, 0) == 0 else ctypes.get_errno()
+    return _native_clone
+
+
+def reflink(src: str, dst: str) -> None:
+    """
+    Crea dst como clon de src (copia que comparte bloques hasta que se modifique una de
+    las dos): instantáneo y sin escribir datos. Linux: ioctl FICLONE; macOS: clonefile.
+    Nunca reemplaza dst (FileExistsError). Lanza OSError EOPNOTSUPP/EXDEV si el sistema
+    de archivos no lo permite.
+    """
+    if sys.platform == "darwin":
+        clone = _get_native_clone()
+        if clone is None:
+            raise OSError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP), dst)
+        err = clone(os.fsencode(src), os.fsencode(dst))
+        if err:
+            raise OSError(err, os.strerror(err), src, None, dst)
+        return
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP), dst)
+    import fcntl
+
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            try:
+                fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+            finally:
+                os.close(dst_fd)
+            shutil.copystat(src, dst)
+        except BaseException:
+            try:
+                os.unlink(dst)
+            except OSError:
+                pass
+            raise
+    finally:
+        os.close(src_fd)
+
+
+def make_link(
+    src: str,
+    dst: str,
+    methods: Sequence[str] = LINK_METHODS[AUTO],
+    on_bytes: Optional[ByteCallback] = None,
+    unavailable: Optional[Set[str]] = None,
+) -> str:
+    """
+    Crea dst como otra vista de src sin tocar src, probando `methods` en orden (ver
+    LINK_METHODS) y pasando al siguiente solo si el actual no está disponible aquí.
+    Nunca reemplaza dst (FileExistsError). Devuelve el método usado.
+    `unavailable` recuerda los métodos que ya fallaron (p. ej. entre dos unidades) para
+    no volver a intentarlos con cada archivo.
+    """
+    error: Optional[OSError] = None
+    for method in methods:
+        if unavailable is not None and method in unavailable:
+            continue
+        try:
+            if method == REFLINK:
+                reflink(src, dst)
+            elif method == HARDLINK:
+                os.link(src, dst, follow_symlinks=False)
+            elif method == SYMLINK:
+                os.symlink(os.path.abspath(src), dst)
+            else:
+                copy_exclusive(src, dst, on_bytes)
+            return method
+        except FileExistsError:
+            raise
+        except OSError as e:
+            if e.errno not in _LINK_UNSUPPORTED:
+                raise
+            error = e
+            if unavailable is not None and e.errno != errno.EMLINK:
+                unavailable.add(method)
+    raise error or OSError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP), dst)
+
+
+# --------- Punto de entrada ---------
+
+class DeviceCache:
+    """Recuerda st_dev por carpeta para decidir rename vs copia sin un stat por archivo."""
+
+    def __init__(self):
+        self._devices: Dict[str, int] = {}
+        self._link_unavailable: Dict[Tuple[Optional[int], Optional[int]], Set[str]] = {}
+
+    def device(self, folder: str) -> Optional[int]:
+        dev = self._devices.get(folder)
+        if dev is None:
+            try:
+                dev = os.stat(folder).st_dev
+            except OSError:
+                return None
+            self._devices[folder] = dev
+        return dev
+
+    def same_device(self, src_folder: str, dst_folder: str) -> Optional[bool]:
+        a, b = self.device(src_folder), self.device(dst_folder)
+        if a is None or b is None:
+            return None
+        return a == b
+
+    def link_unavailable(self, src_folder: str, dst_folder: str) -> Set[str]:
+        """Métodos de enlace que ya fallaron entre las unidades de estas dos carpetas (ver make_link)."""
+        key = (self.device(src_folder), self.device(dst_folder))
+        return self._link_unavailable.setdefault(key, set())
+
+
+def transfer(
+    src: str,
+    dst: str,
+    same_device: Optional[bool] = None,
+    on_bytes: Optional[ByteCallback] = None,
+    size: int = 0,
+) -> Optional[os.stat_result]:
+    """
+    Mueve src a dst sin reemplazar nunca un archivo existente.
+    Devuelve None si fue un rename instantáneo (el archivo conserva inodo y mtime)
+    o el stat del nuevo archivo si hubo copia.
+    `size` (si se conoce) se notifica entero a on_bytes cuando basta con renombrar.
+    """
+    if same_device is not False:
+        try:
+            rename_noreplace(src, dst)
+        except OSError as e:
+            # Montajes bind u overlay pueden compartir st_dev y aun así dar EXDEV
+            if e.errno != errno.EXDEV:
+                raise
+        else:
+            if on_bytes and size:
+                on_bytes(size)
+            return None
+    return copy_then_unlink(src, dst, on_bytes)
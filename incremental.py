@@ -0,0 +1,195 @@
+"""
+Estado de una carpeta de origen entre pasadas, para organizarla de forma incremental.
+
+Se guarda en la propia carpeta (STATE_FILE) y recoge, por cada carpeta recorrida, su
+mtime y los archivos que se quedaron en su sitio (reglas con category=None), junto con
+la huella de las reglas y las opciones del recorrido. En la pasada siguiente:
+  - una carpeta con el mismo mtime no se vuelve a leer: no puede tener entradas nuevas,
+    así que se usa lo guardado (más un stat por subcarpeta, que puede haber cambiado);
+  - de una carpeta que cambió solo se clasifican los archivos que no estaban;
+  - si cambian las reglas, los archivos guardados se reclasifican en memoria y solo se
+    mueven los que ahora tienen categoría;
+  - si las reglas miran tamaño, antigüedad o contenido, cada archivo guardado se
+    comprueba con un stat y se reclasifica si cambió o si su regla depende de la fecha.
+Las carpetas de las que se movió algo (o cuyo mtime es demasiado reciente para fiarse
+de él) se vuelven a leer en la pasada siguiente.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from rules import RuleEngine
+
+STATE_FILE = ".fileflow-state"
+STATE_VERSION = 1
+
+# Un cambio dentro de este margen puede no mover el mtime (resolución de 1-2 s en FAT,
+# SMB...): una carpeta modificada hace menos no se da por estable
+RACY_NS = 2_000_000_000
+
+_MISSING = object()
+
+# Estado de una carpeta: {"m": mtime_ns o None, "f": {nombre: [tamaño, mtime_ns] o None}, "d": [subcarpetas]}
+DirRecord = Dict
+
+
+class _StoredEntry:
+    """Lo que el recorrido usa de os.DirEntry, para una entrada guardada que no se vuelve a leer."""
+    __slots__ = ("path", "name", "_is_dir", "_stat")
+
+    def __init__(self, folder: str, name: str, is_dir: bool):
+        self.path = os.path.join(folder, name)
+        self.name = name
+        self._is_dir = is_dir
+        self._stat: Optional[os.stat_result] = None
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._is_dir
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        return not self._is_dir
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        if not follow_symlinks:
+            return os.lstat(self.path)
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+class SourceState:
+    """
+    Estado de una pasada: lee el de la anterior (load), el recorrido lo consulta con
+    scandir y wants, el plan apunta con keep y planned, y save lo deja para la próxima.
+    Solo debe guardarse si la pasada terminó entera; si no, el anterior sigue valiendo.
+    """
+
+    def __init__(self, source_folder: Union[str, Path], engine: RuleEngine, scope: str = ""):
+        self.path = Path(source_folder) / STATE_FILE
+        self.scope = scope
+        self.fingerprint = engine.fingerprint
+        self.unchanged = 0  # carpetas que no se volvieron a leer
+        self.reused = 0  # archivos ya vistos que no se volvieron a clasificar
+        self._engine = engine
+        self._uses_stat = engine.uses_stat
+        self._root = os.path.abspath(source_folder)
+        self._old: Dict[str, DirRecord] = {}
+        self._rules_changed = False
+        self._new: Dict[str, DirRecord] = {}
+        # Carpeta tal como la recorre el organizador → (registro nuevo, registro anterior)
+        self._open: Dict[str, Tuple[DirRecord, Optional[DirRecord]]] = {}
+        self._started_ns = time.time_ns()
+
+    @classmethod
+    def load(cls, source_folder: Union[str, Path], engine: RuleEngine, scope: str = "") -> "SourceState":
+        """
+        Estado de la pasada anterior. Si no hay, está dañado o se hizo hacia otro destino
+        o con otras opciones de recorrido (`scope`), se empieza de cero.
+        """
+        state = cls(source_folder, engine, scope)
+        try:
+            with open(state.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return state
+        if not isinstance(data, dict) or data.get("version") != STATE_VERSION or data.get("scope") != scope:
+            return state
+        dirs = data.get("dirs")
+        if isinstance(dirs, dict):
+            state._old = dirs
+            state._rules_changed = data.get("rules") != state.fingerprint
+        return state
+
+    # --------- Recorrido ---------
+    def scandir(self, folder: str, st: os.stat_result) -> Iterator:
+        """
+        Entradas de `folder` (con `st`, su stat tomado antes de leerla): las de os.scandir
+        o, si no ha cambiado desde la pasada anterior, las guardadas sin leer el directorio.
+        """
+        rel = os.path.relpath(folder, self._root)
+        old = self._old.get(rel)
+        mtime = st.st_mtime_ns
+        record: DirRecord = {"m": mtime if mtime < self._started_ns - RACY_NS else None, "f": {}, "d": []}
+        self._new[rel] = record
+        self._open[folder] = (record, old)
+        parent = self._open.get(os.path.dirname(folder))
+        if parent is not None:
+            parent[0]["d"].append(os.path.basename(folder))
+        if old is not None and old.get("m") is not None and old["m"] == mtime:
+            self.unchanged += 1
+            return self._replay(folder, old)
+        return os.scandir(folder)
+
+    def _replay(self, folder: str, old: DirRecord) -> Iterator[_StoredEntry]:
+        for name in old.get("f", ()):
+            yield _StoredEntry(folder, name, False)
+        for name in old.get("d", ()):
+            yield _StoredEntry(folder, name, True)
+
+    def wants(self, entry) -> bool:
+        """
+        False si `entry` ya se dejó en su sitio en la pasada anterior y nada de lo que
+        decide su categoría ha cambiado; entonces queda apuntado sin reclasificarlo.
+        """
+        opened = self._open.get(os.path.dirname(entry.path))
+        if opened is None or opened[1] is None or self._rules_changed:
+            return True
+        record, old = opened
+        known = old.get("f", {}).get(entry.name, _MISSING)
+        if known is _MISSING:
+            return True
+        if self._uses_stat:
+            try:
+                st = entry.stat()
+            except OSError:
+                return True
+            if known != [st.st_size, st.st_mtime_ns] or self._engine.depends_on_time(entry.name):
+                return True
+        record["f"][entry.name] = known
+        self.reused += 1
+        return False
+
+    # --------- Plan ---------
+    def keep(self, entry) -> None:
+        """El archivo se queda en su sitio (category=None)."""
+        opened = self._open.get(os.path.dirname(entry.path))
+        if opened is None:
+            return
+        record = opened[0]
+        value: Optional[List[int]] = None
+        if self._uses_stat:
+            try:
+                st = entry.stat()
+            except OSError:
+                # Sin stat no se podrá saber si cambia: la carpeta se vuelve a leer
+                record["m"] = None
+                return
+            value = [st.st_size, st.st_mtime_ns]
+        record["f"][entry.name] = value
+
+    def planned(self, entry) -> None:
+        """
+        El archivo se va a mover. Su carpeta se vuelve a leer la próxima vez: si el
+        movimiento no llega a hacerse (duplicado omitido, fallo) su mtime no cambia.
+        """
+        opened = self._open.get(os.path.dirname(entry.path))
+        if opened is not None:
+            opened[0]["m"] = None
+
+    # --------- Persistencia ---------
+    def save(self) -> None:
+        """
+        Guarda el estado de esta pasada. Se reescribe el archivo en su sitio en vez de
+        crear uno temporal y renombrarlo: un rename cambiaría el mtime de la carpeta de
+        origen y la siguiente pasada tendría que volver a leerla. Si se corta a medias,
+        el archivo no se puede leer y la próxima pasada empieza de cero.
+        """
+        data = {"version": STATE_VERSION, "rules": self.fingerprint, "scope": self.scope, "dirs": self._new}
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        mode = "r+" if self.path.exists() else "w"
+        with open(self.path, mode, encoding="utf-8") as fh:
+            fh.write(text)
+            fh.truncate()
+
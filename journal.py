@@ -0,0 +1,349 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+JOURNAL_DIR_ENV = "FILEFLOW_JOURNAL_DIR"
+
+STATUS_COMPLETE = "complete"
+STATUS_INTERRUPTED = "interrupted"
+STATUS_ROLLED_BACK = "rolled_back"
+STATUS_UNDONE = "undone"
+
+# Retención: se borran los diarios más allá de los KEEP_RUNS más recientes o con más de
+# KEEP_DAYS días. Los interrumpidos (reanudables) solo caducan por antigüedad.
+KEEP_RUNS = 500
+KEEP_DAYS = 90
+
+_ENCODING = "utf-8"
+_ERRORS = "surrogateescape"  # rutas con bytes no decodificables en Linux
+
+
+def default_journal_dir() -> Path:
+    env = os.environ.get(JOURNAL_DIR_ENV)
+    if env:
+        return Path(env)
+    return Path.home() / ".fileflow" / "journal"
+
+
+def _dumps(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+class Journal:
+    """
+    Diario de solo-añadir de una ejecución (JSON lines):
+        begin → plan* / done* → end
+    Los registros "plan" se escriben y sincronizan por lotes ANTES de ejecutar esos
+    movimientos (write-ahead); los "done" se sincronizan cada `sync_every` registros o
+    `sync_interval` segundos. Si el proceso muere, lo que falte se deduce del disco.
+    """
+
+    def __init__(self, path: Path, sync_every: int = 1024, sync_interval: float = 1.0):
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._fh = open(self.path, "a", encoding=_ENCODING, errors=_ERRORS, buffering=1024 * 1024)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._next_index = 0
+
+    @property
+    def run_id(self) -> str:
+        return self.path.stem
+
+    @property
+    def next_index(self) -> int:
+        return self._next_index
+
+    @classmethod
+    def start(
+        cls,
+        source_folder: str,
+        dest_folder: str,
+        directory: Optional[Union[str, Path]] = None,
+        link: Optional[str] = None,
+        **kwargs,
+    ) -> "Journal":
+        """
+        Abre el diario de una ejecución nueva. `link` es el modo de enlace de
+        organize_files, si lo hay: deshacer borrará los enlaces en vez de mover.
+        Todas las rutas se guardan absolutas: el diario vale desde cualquier directorio.
+        """
+        directory = Path(directory) if directory else default_journal_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        try:
+            prune_runs(directory)
+        except OSError:
+            pass  # sin poder borrar los viejos se sigue registrando igual
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = directory / f"run-{stamp}-{os.getpid()}-{time.monotonic_ns() % 1000000:06d}.jsonl"
+        journal = cls(path, **kwargs)
+        header = {
+            "t": "begin",
+            "source": os.path.abspath(source_folder),
+            "dest": os.path.abspath(dest_folder),
+            "ts": time.time(),
+        }
+        if link:
+            header["link"] = link
+        journal._write(header)
+        journal.sync()
+        return journal
+
+    @classmethod
+    def reopen(cls, path: Union[str, Path], **kwargs) -> "Journal":
+        """Reabre un diario existente para completarlo; continúa la numeración de sus planes."""
+        journal = cls(Path(path), **kwargs)
+        journal._next_index = _count_plans(journal.path)
+        return journal
+
+    # --------- Escritura ---------
+    def _write(self, record: Dict) -> None:
+        self._fh.write(_dumps(record))
+        self._unsynced += 1
+
+    def sync(self) -> None:
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _maybe_sync(self) -> None:
+        if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def wrap_plan(self, plan: Iterable, batch: int = 512) -> Iterator:
+        """
+        Registra cada movimiento planificado y lo deja pasar solo cuando su lote ya
+        está en disco. El i-ésimo elemento entregado tiene el índice de plan i.
+        """
+        pending: List = []
+        for move in plan:
+            pending.append(move)
+            if len(pending) >= batch:
+                yield from self._flush_plans(pending)
+                pending = []
+        if pending:
+            yield from self._flush_plans(pending)
+
+    def _flush_plans(self, moves: List) -> Iterator:
+        for move in moves:
+            self._write({
+                "t": "plan",
+                "i": self._next_index,
+                "src": os.path.abspath(move.source),
+                "dst": os.path.abspath(move.dest),
+                "cat": move.category,
+            })
+            self._next_index += 1
+        self.sync()
+        yield from moves
+
+    def done(self, index: int, src: str, dst: str, identity: Optional[Tuple[int, int, int]] = None) -> None:
+        record = {"t": "done", "i": index, "src": os.path.abspath(src), "dst": os.path.abspath(dst)}
+        if identity is not None:
+            record["id"] = list(identity)
+        self._write(record)
+        self._maybe_sync()
+
+    def void(self, index: int) -> None:
+        """Anula un plan que no llegó a ejecutarse (se volverá a planificar)."""
+        self._write({"t": "void", "i": index})
+        self._maybe_sync()
+
+    def finish(self, status: str = STATUS_COMPLETE) -> None:
+        self._write({"t": "end", "status": status, "ts": time.time()})
+        self.close()
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self.sync()
+            self._fh.close()
+
+
+# --------- Lectura ---------
+
+@dataclass
+class RunInfo:
+    run_id: str
+    path: Path
+    source: str
+    dest: str
+    started: float
+    status: str
+    link: str = ""  # modo de enlace; vacío si se movieron los archivos
+
+
+def _iter_records(path: Path) -> Iterator[Dict]:
+    with open(path, "r", encoding=_ENCODING, errors=_ERRORS) as fh:
+        for line in fh:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Última línea a medio escribir tras un corte
+                continue
+
+
+def _read_lines_reversed(path: Path, block_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Lee un archivo de atrás hacia delante por bloques, sin cargarlo entero."""
+    with open(path, "rb") as fh:
+        fh.seek(0, os.SEEK_END)
+        pos = fh.tell()
+        tail = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            fh.seek(pos)
+            chunk = fh.read(step) + tail
+            lines = chunk.split(b"\n")
+            tail = lines[0]
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line
+        if tail:
+            yield tail
+
+
+def _iter_records_reversed(path: Path) -> Iterator[Dict]:
+    for line in _read_lines_reversed(path):
+        try:
+            yield json.loads(line.decode(_ENCODING, _ERRORS))
+        except ValueError:
+            continue
+
+
+def _count_plans(path: Path) -> int:
+    count = 0
+    for record in _iter_records(path):
+        if record.get("t") == "plan":
+            count = max(count, record["i"] + 1)
+    return count
+
+
+def read_run(path: Union[str, Path]) -> Optional[RunInfo]:
+    """Lee solo la cabecera y el último registro: coste constante por ejecución."""
+    path = Path(path)
+    header = next(_iter_records(path), None)
+    if not header or header.get("t") != "begin":
+        return None
+    last = next(_iter_records_reversed(path), header)
+    status = last.get("status", STATUS_COMPLETE) if last.get("t") == "end" else STATUS_INTERRUPTED
+    return RunInfo(
+        path.stem, path, header["source"], header["dest"], header.get("ts", 0.0), status, header.get("link", "")
+    )
+
+
+def list_runs(directory: Optional[Union[str, Path]] = None) -> List[RunInfo]:
+    """Ejecuciones registradas, de la más reciente a la más antigua."""
+    directory = Path(directory) if directory else default_journal_dir()
+    if not directory.is_dir():
+        return []
+    runs = []
+    for path in directory.glob("run-*.jsonl"):
+        info = read_run(path)
+        if info is not None:
+            runs.append(info)
+    runs.sort(key=lambda r: (r.started, r.run_id), reverse=True)
+    return runs
+
+
+def find_interrupted(directory: Optional[Union[str, Path]] = None) -> List[RunInfo]:
+    return [r for r in list_runs(directory) if r.status == STATUS_INTERRUPTED]
+
+
+def has_moves(path: Union[str, Path]) -> bool:
+    """True si la ejecución completó algún movimiento; se lee desde el final, donde están."""
+    return any(r.get("t") == "done" for r in _iter_records_reversed(Path(path)))
+
+
+def last_run(directory: Optional[Union[str, Path]] = None) -> Optional[RunInfo]:
+    """
+    La ejecución más reciente que movió algo. Las que no hicieron nada (una pasada
+    periódica sin archivos nuevos) no tapan a la anterior a la hora de deshacer.
+    """
+    for run in list_runs(directory):
+        if has_moves(run.path):
+            return run
+    return None
+
+
+def prune_runs(
+    directory: Optional[Union[str, Path]] = None, keep: int = KEEP_RUNS, max_days: float = KEEP_DAYS
+) -> int:
+    """
+    Borra los diarios viejos (ver KEEP_RUNS y KEEP_DAYS) y devuelve cuántos. El orden
+    sale del mtime de cada archivo (su última escritura), así que solo se leen los que
+    sobran.
+    """
+    directory = Path(directory) if directory else default_journal_dir()
+    if not directory.is_dir():
+        return 0
+    dated = []
+    for path in directory.glob("run-*.jsonl"):
+        try:
+            dated.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    dated.sort(reverse=True)
+    cutoff = time.time() - max_days * 86400
+    removed = 0
+    for n, (mtime, path) in enumerate(dated):
+        try:
+            expired = mtime < cutoff
+            if n < keep and not expired:
+                continue
+            if not expired:
+                info = read_run(path)
+                if info is not None and info.status == STATUS_INTERRUPTED:
+                    continue
+            path.unlink()
+            removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def count_done(path: Union[str, Path]) -> int:
+    return sum(1 for r in _iter_records(Path(path)) if r.get("t") == "done")
+
+
+def iter_done_reversed(path: Union[str, Path]) -> Iterator[Tuple[str, str, Optional[Tuple[int, int, int]]]]:
+    """Movimientos completados (dest_final, origen_inicial, identidad) del último al primero."""
+    for record in _iter_records_reversed(Path(path)):
+        if record.get("t") == "done":
+            identity = record.get("id")
+            yield record["dst"], record["src"], tuple(identity) if identity else None
+
+
+def iter_pending(path: Union[str, Path]) -> Iterator[Tuple[int, str, str, str]]:
+    """
+    Movimientos planificados sin registro "done" ni "void":
+    (índice, origen, destino_previsto, categoría).
+    Usa un mapa de bits de índices cerrados, así que la memoria es ~1 bit por movimiento.
+    """
+    path = Path(path)
+    done = bytearray()
+    for record in _iter_records(path):
+        if record.get("t") in ("done", "void"):
+            i = record["i"]
+            if i // 8 >= len(done):
+                done.extend(bytes(i // 8 - len(done) + 1))
+            done[i // 8] |= 1 << (i % 8)
+    for record in _iter_records(path):
+        if record.get("t") != "plan":
+            continue
+        i = record["i"]
+        if i // 8 < len(done) and done[i // 8] & (1 << (i % 8)):
+            continue
+        yield i, record["src"], record["dst"], record.get("cat", "")
+
+
+def mark_status(path: Union[str, Path], status: str) -> None:
+    """Añade un registro de cierre (p. ej. tras deshacer) a un diario ya terminado."""
+    with open(path, "a", encoding=_ENCODING, errors=_ERRORS) as fh:
+        fh.write(_dumps({"t": "end", "status": status, "ts": time.time()}))
+        fh.flush()
+        os.fsync(fh.fileno())
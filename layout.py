@@ -0,0 +1,127 @@
+"""
+Carpetas de destino por plantilla, p. ej. "{category}/{year}/{month}" → Images/2026/10.
+
+La fecha es la de captura (capture.CaptureDates: EXIF o cabecera MP4/MOV) o, si el
+archivo no la tiene, su mtime, que sale del stat que ya dio el recorrido. Leer
+cabeceras de miles de fotos en serie dejaría al plan esperando al disco, así que
+prefetch las lee por adelantado en un pool de hilos mientras se clasifica.
+"""
+import os
+import string
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date
+from typing import Iterable, Iterator, List, Optional
+
+from cache import MetadataCache
+from capture import CAPTURE_SUFFIXES, CaptureDates
+from organizer import _chunks
+from stats import METADATA, RunStats
+
+# Origen de la fecha
+CAPTURE = "capture"  # la de captura y, si no hay, mtime
+MTIME = "mtime"
+DATE_SOURCES = (CAPTURE, MTIME)
+
+FIELDS = ("category", "year", "month", "day")
+_DATE_FIELDS = {"year", "month", "day"}
+
+# Archivos cuya cabecera se pide de una vez al pool; se leen mientras se clasifica el bloque anterior
+PREFETCH_CHUNK = 256
+
+
+def _fields(segment: str) -> List[str]:
+    names = []
+    for _, name, spec, conversion in string.Formatter().parse(segment):
+        if name is None:
+            continue
+        if name not in FIELDS or spec or conversion:
+            raise ValueError(f"Unsupported layout field: {{{name}}} (fields: {', '.join(FIELDS)})")
+        names.append(name)
+    return names
+
+
+class Layout:
+    """
+    Plantilla de la carpeta de cada archivo, relativa al destino. Los campos son
+    {category}, {year}, {month} (01-12) y {day} (01-31); las barras separan carpetas.
+    El primer nivel solo puede usar {category} y texto fijo: es lo que el recorrido
+    recursivo reconoce como carpeta del destino y no vuelve a organizar.
+    """
+
+    def __init__(
+        self,
+        template: str = "{category}/{year}/{month}",
+        date_source: str = CAPTURE,
+        cache: Optional[MetadataCache] = None,
+        workers: int = 8,
+    ):
+        if date_source not in DATE_SOURCES:
+            raise ValueError(f"Unknown date source: {date_source!r}")
+        segments = [s for s in template.replace("\\", "/").split("/") if s]
+        if not segments or any(s in (".", "..") for s in segments):
+            raise ValueError(f"Invalid layout: {template!r}")
+        fields = [_fields(s) for s in segments]
+        if any(name != "category" for name in fields[0]):
+            raise ValueError(f"Only {{category}} may be used in the first folder of a layout: {template!r}")
+        self.template = "/".join(segments)
+        self.date_source = date_source
+        self.workers = max(1, workers)
+        self.dates = CaptureDates(cache) if date_source == CAPTURE else None
+        self._segments = segments
+        self._top = segments[0]
+        self._uses_date = any(name in _DATE_FIELDS for names in fields for name in names)
+
+    def top_folders(self, categories: Iterable[str]) -> List[str]:
+        """Carpetas de primer nivel que puede crear en el destino (no hay que recorrerlas)."""
+        return sorted({self._top.format(category=c) for c in categories})
+
+    def date_of(self, entry) -> date:
+        st = entry.stat()
+        if self.dates is not None:
+            value = self.dates.get(entry.path, st)
+            if value is not None:
+                return value
+        return date.fromtimestamp(st.st_mtime)
+
+    def folder(self, category: str, entry) -> str:
+        """Carpeta de `entry` relativa al destino. Puede lanzar OSError (stat)."""
+        values = {"category": category}
+        if self._uses_date:
+            day = self.date_of(entry)
+            values.update(year=f"{day.year:04d}", month=f"{day.month:02d}", day=f"{day.day:02d}")
+        return os.path.join(*(s.format(**values) for s in self._segments))
+
+    def prefetch(self, entries: Iterable, stats: Optional[RunStats] = None) -> Iterator:
+        """
+        Entrega `entries` tal cual, pero con la fecha de captura de cada bloque ya leída
+        (y en la caché) por el pool mientras se procesa el bloque anterior.
+        """
+        if self.dates is None or not self._uses_date:
+            yield from entries
+            return
+        pending = None
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fileflow-meta") as pool:
+            for chunk in _chunks(entries, PREFETCH_CHUNK):
+                futures = [
+                    pool.submit(self._warm, entry) for entry in chunk if entry.name.lower().endswith(CAPTURE_SUFFIXES)
+                ]
+                if pending is not None:
+                    yield from self._ready(pending, stats)
+                pending = (chunk, futures)
+            if pending is not None:
+                yield from self._ready(pending, stats)
+
+    def _ready(self, pending, stats: Optional[RunStats]) -> Iterator:
+        chunk, futures = pending
+        if stats is None:
+            wait(futures)
+        else:
+            with stats.phase(METADATA):
+                wait(futures)
+        yield from chunk
+
+    def _warm(self, entry) -> None:
+        try:
+            self.dates.get(entry.path, entry.stat())
+        except OSError:
+            pass  # el plan volverá a pedirlo y decidirá qué hacer con el error
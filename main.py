@@ -1,13 +1,20 @@
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-from organizer import organize_files
+from organizer import CancelToken, OrganizeError, organize_files, undo_moves, undo_run, resume_run
+from events import render_event
+from stats import RunStats
+import journal
 import threading
-from pathlib import Path
-import shutil
+import queue
+from collections import deque
 # Importamos THEME_PALETTES para gestionar ambos temas
 from palette import THEME_PALETTES, LIGHT_PALETTE
 from translations import TRANSLATIONS
 
+# Refresco de la interfaz (~30 fps) y tamaño máximo del área de log
+UI_FRAME_MS = 33
+LOG_MAX_LINES = 2000
+
 
 class FileOrganizerApp:
     def __init__(self, root):
@@ -16,6 +23,10 @@ class FileOrganizerApp:
         self.root.title(TRANSLATIONS[self.lang]["ui"]["title"])
         self.root.geometry("650x580") 
         self.last_moves = []  # [(dest_final, origen_inicial), ...]
+        self.last_run = None  # diario de la última ejecución (permite deshacer entre sesiones)
+        self._byte_progress = False
+        self._events = queue.SimpleQueue()
+        self._cancel = None  # CancelToken de la ejecución en curso
 
         # State variables
         self.source_folder = tk.StringVar()
@@ -29,6 +40,11 @@ class FileOrganizerApp:
         self._setup_style(self.palette)
         self._apply_language_texts()
 
+        # Diario: deshacer la última ejecución aunque venga de otra sesión y recuperar cortes
+        self._load_last_run()
+        self.root.after(300, self._check_interrupted_runs)
+        self.root.after(UI_FRAME_MS, self._drain_events)
+
     # --------- Styling (MEJORADO para Modo Oscuro) ---------
     def _setup_style(self, PALETTE):
         # Configura el color de fondo de la ventana
@@ -269,6 +285,32 @@ class FileOrganizerApp:
         )
         self.undo_button.grid(row=0, column=1, padx=10)
 
+        self.preview_button = ttk.Button(
+            btn_frame,
+            text="",
+            command=self.start_preview,
+            width=14
+        )
+        self.preview_button.grid(row=0, column=2, padx=10)
+
+        self.pause_button = ttk.Button(
+            btn_frame,
+            text="",
+            command=self.toggle_pause,
+            state=tk.DISABLED,
+            width=22
+        )
+        self.pause_button.grid(row=1, column=0, padx=10, pady=(10, 0))
+
+        self.cancel_button = ttk.Button(
+            btn_frame,
+            text="",
+            command=self.cancel_run,
+            state=tk.DISABLED,
+            width=22
+        )
+        self.cancel_button.grid(row=1, column=1, padx=10, pady=(10, 0))
+
         # Progress
         self.progress = ttk.Progressbar(self.root, length=500, mode="determinate", style="Accent.Horizontal.TProgressbar")
         self.progress.pack(pady=15)
@@ -308,6 +350,9 @@ class FileOrganizerApp:
         self.dest_browse.config(text=self._t("ui", "browse"))
         self.organize_button.config(text=self._t("ui", "organize"))
         self.undo_button.config(text=self._t("ui", "undo"))
+        self.preview_button.config(text=self._t("ui", "preview"))
+        self._update_pause_text()
+        self.cancel_button.config(text=self._t("ui", "cancel"))
 
     def _on_language_changed(self, _evt=None):
         human = self.lang_var.get()
@@ -325,102 +370,316 @@ class FileOrganizerApp:
         if folder:
             self.dest_folder.set(folder)
 
+    # --------- Canal hilo de trabajo → interfaz ---------
+    # Tk no es seguro entre hilos: los hilos de trabajo solo encolan eventos y el bucle
+    # principal los vacía con after() a ritmo fijo, agrupando líneas y progreso.
+    def _post(self, fn, *args, **kwargs):
+        """Ejecuta fn(*args, **kwargs) en el hilo de la interfaz."""
+        self._events.put(("call", (fn, args, kwargs)))
+
     def log(self, message):
+        self._events.put(("log", message))
+
+    def log_event(self, event):
+        # Se encola el evento tal cual; el texto solo se genera si llega a mostrarse
+        self._events.put(("log", event))
+
+    def update_progress(self, value):
+        self._events.put(("progress", value))
+
+    def _clear_log(self):
+        self._events.put(("clear", None))
+
+    def _drain_events(self):
+        self.root.after(UI_FRAME_MS, self._drain_events)
+
+        # Solo importan las últimas LOG_MAX_LINES líneas y el último valor de progreso
+        lines = deque(maxlen=LOG_MAX_LINES)
+        progress = None
+        clear = False
+        calls = []
+        try:
+            while True:
+                kind, payload = self._events.get_nowait()
+                if kind == "log":
+                    lines.append(payload)
+                elif kind == "progress":
+                    progress = payload
+                elif kind == "clear":
+                    lines.clear()
+                    clear = True
+                    progress = 0.0
+                else:
+                    calls.append(payload)
+        except queue.Empty:
+            pass
+
+        if clear or lines:
+            self._append_log(lines, clear)
+        if progress is not None:
+            self.progress["value"] = progress * 100
+        for fn, args, kwargs in calls:
+            fn(*args, **kwargs)
+
+    def _append_log(self, lines, clear=False):
         self.log_text.config(state="normal")
-        self.log_text.insert(tk.END, message + "\n")
+        if clear:
+            self.log_text.delete(1.0, tk.END)
+        if lines:
+            messages = self._log_messages()
+            text = "\n".join(line if isinstance(line, str) else render_event(line, messages) for line in lines)
+            self.log_text.insert(tk.END, text + "\n")
+            # Búfer circular: el widget nunca guarda más de LOG_MAX_LINES líneas
+            line_count = int(self.log_text.index("end-1c").split(".")[0]) - 1
+            if line_count > LOG_MAX_LINES:
+                self.log_text.delete(1.0, f"{line_count - LOG_MAX_LINES + 1}.0")
         self.log_text.config(state="disabled")
         self.log_text.yview(tk.END)
 
-    def update_progress(self, value):
-        self.progress["value"] = value * 100
-        self.root.update_idletasks()
+    def _log_messages(self):
+        return {**TRANSLATIONS[self.lang]["organizer"], **TRANSLATIONS[self.lang]["msg"]}
+
+    def _set_state(self, button, state):
+        self._post(button.config, state=state)
+
+    def _show_info(self, title_key, body_key):
+        self._post(messagebox.showinfo, self._t("msg", title_key), self._t("msg", body_key))
+
+    def _show_error(self, error):
+        self._post(messagebox.showerror, self._t("msg", "error_title"), str(error))
+
+    def update_file_progress(self, value):
+        # Si hay avance por bytes, el avance por archivo solo cierra la barra
+        if not self._byte_progress or value >= 1.0:
+            self.update_progress(value)
+
+    def update_bytes(self, done, total):
+        if total:
+            self._byte_progress = True
+            self.update_progress(done / total)
 
     def start_organizing(self):
         if not self.source_folder.get():
             messagebox.showerror(self._t("msg", "error_title"), self._t("msg", "please_select_source"))
             return
         self.organize_button.config(state=tk.DISABLED)
-        threading.Thread(target=self.run_organizer, daemon=True).start()
-
-    def run_organizer(self):
-        self.progress["value"] = 0
-        self.log_text.config(state="normal")
-        self.log_text.delete(1.0, tk.END)
-        self.log_text.config(state="disabled")
+        self.preview_button.config(state=tk.DISABLED)
         self.undo_button.config(state=tk.DISABLED)
+        threading.Thread(target=self.run_organizer, args=self._folders(), daemon=True).start()
 
+    def start_preview(self):
+        if not self.source_folder.get():
+            messagebox.showerror(self._t("msg", "error_title"), self._t("msg", "please_select_source"))
+            return
+        self.organize_button.config(state=tk.DISABLED)
+        self.preview_button.config(state=tk.DISABLED)
+        threading.Thread(target=self.run_organizer, args=self._folders(), kwargs={"dry_run": True}, daemon=True).start()
+
+    def _folders(self):
+        # Las StringVar se leen aquí, en el hilo de la interfaz
+        source = self.source_folder.get()
+        return source, self.dest_folder.get() or None
+
+    def run_organizer(self, source, dest, dry_run=False):
+        self._byte_progress = False
+        self._clear_log()
+
+        run_journal = None
+        stats = RunStats("plan" if dry_run else "organize")
+        cancel = CancelToken()
+        self._cancel = cancel
+        self._set_state(self.pause_button, tk.NORMAL)
+        self._set_state(self.cancel_button, tk.NORMAL)
         try:
+            if not dry_run:
+                run_journal = self._start_journal(source, dest or source)
             moves = organize_files(
-                self.source_folder.get(),
-                self.dest_folder.get() if self.dest_folder.get() else None,
+                source,
+                dest,
+                progress_callback=self.update_file_progress,
+                event_callback=self.log_event,
+                dry_run=dry_run,
+                bytes_callback=self.update_bytes,
+                journal=run_journal,
+                stats=stats,
+                cancel=cancel,
+            )
+            self._log_stats(stats)
+            if cancel.cancelled:
+                if not dry_run:
+                    self._keep_moves(moves, run_journal)
+                self._post(
+                    messagebox.showinfo,
+                    self._t("msg", "cancelled_title"),
+                    self._t("msg", "cancelled_body", count=0 if dry_run else len(moves)),
+                )
+                return
+            if dry_run:
+                self._show_info("done_title", "preview_done_body")
+                return
+            self._keep_moves(moves, run_journal)
+            self._show_info("done_title", "done_body")
+        except OrganizeError as e:
+            # Lo que llegó a moverse se puede deshacer igual
+            self._keep_moves(e.moves, run_journal)
+            self._show_error(e)
+        except Exception as e:
+            self._show_error(e)
+        finally:
+            self._cancel = None
+            self._post(self._update_pause_text)
+            self._set_state(self.pause_button, tk.DISABLED)
+            self._set_state(self.cancel_button, tk.DISABLED)
+            self._set_state(self.organize_button, tk.NORMAL)
+            self._set_state(self.preview_button, tk.NORMAL)
+
+    def _keep_moves(self, moves, run_journal):
+        self.last_moves = moves or []
+        self.last_run = run_journal.path if run_journal and self.last_moves else None
+        if self.last_moves:
+            self._set_state(self.undo_button, tk.NORMAL)
+
+    # -------- Pause / cancel --------
+    def toggle_pause(self):
+        cancel = self._cancel
+        if cancel is None:
+            return
+        if cancel.paused:
+            cancel.resume()
+        else:
+            cancel.pause()
+        self._update_pause_text()
+
+    def cancel_run(self):
+        cancel = self._cancel
+        if cancel is None:
+            return
+        cancel.cancel()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.pause_button.config(state=tk.DISABLED)
+        self._update_pause_text()
+
+    def _update_pause_text(self):
+        paused = self._cancel is not None and self._cancel.paused
+        self.pause_button.config(text=self._t("ui", "resume" if paused else "pause"))
+
+    def _log_stats(self, stats):
+        self.log(self._t("msg", "stats_summary", **stats.summary_values()))
+
+    # -------- Journal --------
+    def _start_journal(self, source, dest):
+        try:
+            return journal.Journal.start(source, dest)
+        except OSError:
+            # Sin diario se sigue pudiendo organizar y deshacer en memoria
+            return None
+
+    def _load_last_run(self):
+        try:
+            run = journal.last_run()
+        except OSError:
+            return
+        if run is not None and run.status == journal.STATUS_COMPLETE:
+            self.last_run = run.path
+            self.undo_button.config(state=tk.NORMAL)
+
+    def _check_interrupted_runs(self):
+        try:
+            interrupted = journal.find_interrupted()
+        except OSError:
+            return
+        if not interrupted:
+            return
+        run = interrupted[0]
+        answer = messagebox.askyesnocancel(
+            self._t("msg", "interrupted_title"),
+            self._t("msg", "interrupted_body", source=run.source, dest=run.dest),
+        )
+        if answer is None:
+            return
+        self.organize_button.config(state=tk.DISABLED)
+        self.preview_button.config(state=tk.DISABLED)
+        self.undo_button.config(state=tk.DISABLED)
+        target = self.run_resume if answer else self.run_rollback
+        threading.Thread(target=target, args=(run,), daemon=True).start()
+
+    def run_resume(self, run):
+        self._clear_log()
+        try:
+            self.last_moves = resume_run(
+                run,
                 progress_callback=self.update_progress,
-                log_callback=self.log,
-                messages=TRANSLATIONS[self.lang]["organizer"],
+                event_callback=self.log_event,
             )
-            self.last_moves = moves or []
-            if self.last_moves:
-                self.undo_button.config(state=tk.NORMAL)
-            messagebox.showinfo(self._t("msg", "done_title"), self._t("msg", "done_body"))
+            self.last_run = run.path
+            self._set_state(self.undo_button, tk.NORMAL)
+            self._show_info("done_title", "resume_complete_body")
         except Exception as e:
-            messagebox.showerror(self._t("msg", "error_title"), str(e))
+            self._show_error(e)
         finally:
-            self.organize_button.config(state=tk.NORMAL)
+            self._set_state(self.organize_button, tk.NORMAL)
+            self._set_state(self.preview_button, tk.NORMAL)
 
-    # -------- Undo logic --------
-    def _unique_destination(self, path: Path) -> Path:
-        if not path.exists():
-            return path
-        i = 1
-        while True:
-            candidate = path.with_name(f"{path.stem} ({i}){path.suffix}")
-            if not candidate.exists():
-                return candidate
-            i += 1
+    def run_rollback(self, run):
+        self._clear_log()
+        try:
+            self.log(self._t("msg", "undo_start"))
+            undo_run(
+                run,
+                progress_callback=self.update_progress,
+                event_callback=self.log_event,
+            )
+            self._show_info("undo_complete_title", "rollback_complete_body")
+        except Exception as e:
+            self._show_error(e)
+        finally:
+            self._post(self._load_last_run)
+            self._set_state(self.organize_button, tk.NORMAL)
+            self._set_state(self.preview_button, tk.NORMAL)
 
+    # -------- Undo logic --------
     def start_undo(self):
-        if not self.last_moves:
+        if not self.last_moves and not self.last_run:
             messagebox.showinfo(self._t("msg", "nothing_to_undo_title"), self._t("msg", "nothing_to_undo_body"))
             return
         
         self.undo_button.config(state=tk.DISABLED)
         self.organize_button.config(state=tk.DISABLED)
+        self.preview_button.config(state=tk.DISABLED)
         threading.Thread(target=self.run_undo, daemon=True).start()
 
     def run_undo(self):
+        stats = RunStats("undo")
         try:
-            total = len(self.last_moves)
-            if total == 0:
-                return
-
-            self.progress["value"] = 0
-            self.log_text.config(state="normal")
-            self.log_text.delete(1.0, tk.END)
-            self.log_text.config(state="disabled")
+            self._clear_log()
             self.log(self._t("msg", "undo_start"))
 
-            for i, (dest_final, origen_inicial) in enumerate(reversed(self.last_moves), start=1):
-                dest_path = Path(dest_final)
-                orig_path = Path(origen_inicial)
-                try:
-                    if dest_path.exists():
-                        orig_path.parent.mkdir(parents=True, exist_ok=True)
-                        move_target = self._unique_destination(orig_path)
-                        shutil.move(str(dest_path), str(move_target))
-                        self.log(self._t("msg", "restored", name=move_target.name, folder=orig_path.parent.name))
-                    else:
-                        self.log(self._t("msg", "skipped_missing", name=dest_path.name))
-                except Exception as ex:
-                    self.log(self._t("msg", "error_restoring", name=dest_path.name, error=str(ex)))
-
-                self.update_progress(i / total)
+            if self.last_run:
+                # El diario está en disco: sirve aunque la ejecución sea de otra sesión
+                undo_run(
+                    self.last_run,
+                    progress_callback=self.update_progress,
+                    event_callback=self.log_event,
+                    stats=stats,
+                )
+            else:
+                undo_moves(
+                    self.last_moves,
+                    progress_callback=self.update_progress,
+                    event_callback=self.log_event,
+                    stats=stats,
+                )
+            self._log_stats(stats)
 
             self.last_moves = []
-            messagebox.showinfo(self._t("msg", "undo_complete_title"), self._t("msg", "undo_complete_body"))
+            self.last_run = None
+            self._show_info("undo_complete_title", "undo_complete_body")
         except Exception as e:
-            messagebox.showerror(self._t("msg", "error_title"), str(e))
+            self._show_error(e)
         finally:
-            self.undo_button.config(state=tk.DISABLED)
-            self.organize_button.config(state=tk.NORMAL)
+            self._set_state(self.undo_button, tk.DISABLED)
+            self._set_state(self.organize_button, tk.NORMAL)
+            self._set_state(self.preview_button, tk.NORMAL)
 
 
 if __name__ == "__main__":
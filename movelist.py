@@ -0,0 +1,221 @@
+"""
+Registro compacto de movimientos, para ejecuciones de millones de archivos.
+
+Una lista de tuplas (dest, origen) con rutas absolutas repite los mismos prefijos en
+cada elemento y ocupa cientos de bytes por movimiento. MoveList guarda cada carpeta una
+sola vez (se internan y se referencian por número en arrays), solo el nombre de cada
+archivo, el nombre de destino solo si cambió por una colisión, y la identidad en arrays
+de enteros. Pasado `spill_after` movimientos, el bloque en memoria se vuelca a un
+archivo temporal y se relee por bloques al iterar, así que la memoria queda acotada.
+Por fuera sigue pareciendo la lista [(dest_final, origen_inicial), ...] de siempre.
+"""
+import os
+import pickle
+import tempfile
+from array import array
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Identidad barata de un archivo movido: (inodo, tamaño, mtime_ns). Inodo 0 = desconocido.
+Identity = Tuple[int, int, int]
+
+# Movimientos que se guardan en memoria antes de volcar el bloque a disco
+SPILL_AFTER = 250_000
+
+
+class _Block:
+    """Un bloque de movimientos en columnas; las carpetas son índices en MoveList._dirs."""
+    __slots__ = ("dest_dirs", "src_dirs", "names", "renamed", "identity", "ino", "size", "mtime_ns")
+
+    def __init__(self):
+        self.dest_dirs = array("I")
+        self.src_dirs = array("I")
+        self.names: List[str] = []  # nombre en el origen
+        self.renamed: Dict[int, str] = {}  # posición → nombre en destino, si no es el mismo
+        self.identity = bytearray()  # 1 si el movimiento tiene identidad
+        self.ino = array("q")
+        self.size = array("q")
+        self.mtime_ns = array("q")
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state) -> None:
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+class MoveList:
+    """
+    Lista de movimientos [(dest_final, origen_inicial), ...] que además guarda la
+    identidad de cada archivo en su destino, para que deshacer pueda comprobar que
+    sigue siendo el mismo archivo sin leer su contenido.
+    Admite len, iteración (también reversed), índices, append/extend/+= y add con
+    identidad; records() y reversed_records() dan (dest, origen, identidad).
+    `link` es el modo de enlace con que se crearon (organize_files(link=...)), o None
+    si se movieron: deshacer unos enlaces es borrarlos, no devolverlos al origen.
+    """
+
+    def __init__(self, iterable: Iterable[Tuple[str, str]] = (), spill_after: Optional[int] = None):
+        self.spill_after = max(1, spill_after if spill_after is not None else SPILL_AFTER)
+        self.link: Optional[str] = None
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._block = _Block()
+        # Bloques ya volcados: (posición en el archivo, número de movimientos)
+        self._spilled: List[Tuple[int, int]] = []
+        self._spilled_len = 0
+        self._file = None
+        # Último bloque volcado que se releyó por índice: (posición en el archivo, bloque)
+        self._cached: Optional[Tuple[int, _Block]] = None
+        self.extend(iterable)
+
+    # --------- Escritura ---------
+    def _dir_id(self, folder: str) -> int:
+        dir_id = self._dir_ids.get(folder)
+        if dir_id is None:
+            dir_id = self._dir_ids[folder] = len(self._dirs)
+            self._dirs.append(folder)
+        return dir_id
+
+    def add(self, dest: str, src: str, identity: Optional[Identity] = None) -> None:
+        dest_dir, dest_name = os.path.split(dest)
+        src_dir, name = os.path.split(src)
+        block = self._block
+        if dest_name != name:
+            block.renamed[len(block)] = dest_name
+        block.dest_dirs.append(self._dir_id(dest_dir))
+        block.src_dirs.append(self._dir_id(src_dir))
+        block.names.append(name)
+        ino, size, mtime_ns = identity if identity is not None else (0, 0, 0)
+        block.identity.append(identity is not None)
+        block.ino.append(ino)
+        block.size.append(size)
+        block.mtime_ns.append(mtime_ns)
+        if len(block) >= self.spill_after:
+            self._spill()
+
+    def append(self, move: Tuple[str, str]) -> None:
+        self.add(move[0], move[1])
+
+    def extend(self, moves: Iterable[Tuple[str, str]]) -> None:
+        if isinstance(moves, MoveList):
+            if moves.link:
+                self.link = moves.link
+            for dest, src, identity in moves.records():
+                self.add(dest, src, identity)
+        else:
+            for move in moves:
+                self.append(move)
+
+    def __iadd__(self, moves: Iterable[Tuple[str, str]]) -> "MoveList":
+        self.extend(moves)
+        return self
+
+    def _spill(self) -> None:
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix="fileflow-moves-")
+        self._file.seek(0, os.SEEK_END)
+        self._spilled.append((self._file.tell(), len(self._block)))
+        pickle.dump(self._block, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._spilled_len += len(self._block)
+        self._block = _Block()
+
+    def close(self) -> None:
+        """Borra el archivo temporal; la lista queda solo con el bloque en memoria."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._spilled = []
+            self._spilled_len = 0
+            self._cached = None
+
+    # --------- Lectura ---------
+    def _load(self, offset: int) -> _Block:
+        self._file.seek(offset)
+        return pickle.load(self._file)
+
+    def _load_cached(self, offset: int) -> _Block:
+        # Accesos por índice seguidos caen casi siempre en el mismo bloque
+        if self._cached is None or self._cached[0] != offset:
+            self._cached = (offset, self._load(offset))
+        return self._cached[1]
+
+    def _blocks(self, reverse: bool = False) -> Iterator[_Block]:
+        offsets = [offset for offset, _ in self._spilled]
+        if reverse:
+            yield self._block
+            for offset in reversed(offsets):
+                yield self._load(offset)
+        else:
+            for offset in offsets:
+                yield self._load(offset)
+            yield self._block
+
+    def _record(self, block: _Block, i: int) -> Tuple[str, str, Optional[Identity]]:
+        dirs = self._dirs
+        name = block.names[i]
+        dest = os.path.join(dirs[block.dest_dirs[i]], block.renamed.get(i, name))
+        src = os.path.join(dirs[block.src_dirs[i]], name)
+        identity = (block.ino[i], block.size[i], block.mtime_ns[i]) if block.identity[i] else None
+        return dest, src, identity
+
+    def records(self) -> Iterator[Tuple[str, str, Optional[Identity]]]:
+        for block in self._blocks():
+            for i in range(len(block)):
+                yield self._record(block, i)
+
+    def reversed_records(self) -> Iterator[Tuple[str, str, Optional[Identity]]]:
+        """Del último movimiento al primero, como hay que deshacerlos."""
+        for block in self._blocks(reverse=True):
+            for i in range(len(block) - 1, -1, -1):
+                yield self._record(block, i)
+
+    def __len__(self) -> int:
+        return self._spilled_len + len(self._block)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for dest, src, _ in self.records():
+            yield dest, src
+
+    def __reversed__(self) -> Iterator[Tuple[str, str]]:
+        for dest, src, _ in self.reversed_records():
+            yield dest, src
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step < 0:
+                return [self[i] for i in range(start, stop, step)]
+            # Una pasada por los bloques en vez de releer uno por elemento
+            return list(islice(self, start, max(start, stop), step))
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("MoveList index out of range")
+        if index >= self._spilled_len:
+            dest, src, _ = self._record(self._block, index - self._spilled_len)
+            return dest, src
+        for offset, count in self._spilled:
+            if index < count:
+                dest, src, _ = self._record(self._load_cached(offset), index)
+                return dest, src
+            index -= count
+        raise IndexError("MoveList index out of range")
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (MoveList, list, tuple)):
+            return len(self) == len(other) and all(a == tuple(b) for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"MoveList({len(self)} moves)"
+
+    def __del__(self):
+        self.close()
@@ -1,6 +1,41 @@
-import shutil
+import fnmatch
+import os
+import re
+import stat
+import sys
+import time
+import json
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, field, replace
 from pathlib import Path
-from typing import List, Tuple, Callable, Optional, Dict
+from typing import TYPE_CHECKING, List, Tuple, Callable, Optional, Dict, Iterator, Iterable, Sequence, Union
+
+import events
+import fileops
+import stats as run_stats
+from events import EventCallback, MoveEvent, make_emitter
+from incremental import STATE_FILE, SourceState
+from journal import (
+    STATUS_INTERRUPTED,
+    STATUS_ROLLED_BACK,
+    STATUS_UNDONE,
+    Journal,
+    RunInfo,
+    count_done,
+    iter_done_reversed,
+    iter_pending,
+    mark_status,
+    read_run,
+)
+from movelist import Identity, MoveList
+from rules import RuleEngine
+from stats import RunStats, maybe_phase
+
+if TYPE_CHECKING:
+    from dedupe import Deduplicator
+    from layout import Layout
+    from sharding import Sharding
 
 FILE_TYPES = {
     "Images": [".jpg", ".jpeg", ".png", ".gif", ".bmp"],
@@ -10,34 +45,909 @@ FILE_TYPES = {
     "Archives": [".zip", ".rar", ".7z"],
 }
 
+# Índice de sufijos compilado una vez; las reglas de usuario crean su propio RuleEngine
+DEFAULT_RULES = RuleEngine(FILE_TYPES)
+
+# Carpeta del destino donde dedupe.Deduplicator puede apartar los duplicados
+DUPLICATES = "Duplicates"
+
+
+_CASE_INSENSITIVE_FS = os.name == "nt" or sys.platform == "darwin"
+
+
+def _split_name(name: str) -> Tuple[str, str]:
+    """Separa stem y sufijo con la misma semántica que Path.stem / Path.suffix."""
+    pos = name.rfind(".")
+    if 0 < pos < len(name) - 1:
+        return name[:pos], name[pos:]
+    return name, ""
+
+
+class DestinationIndex:
+    """
+    Índice en memoria de los nombres ocupados en cada carpeta destino.
+    Cada carpeta se lista una sola vez con os.scandir; a partir de ahí las colisiones
+    se resuelven sin stat, guardando el siguiente sufijo libre "name (n).ext" por nombre.
+    """
+
+    def __init__(self, case_insensitive: bool = _CASE_INSENSITIVE_FS):
+        self._fold = str.casefold if case_insensitive else None
+        self._taken: Dict[str, set] = {}
+        self._next_suffix: Dict[Tuple[str, str], int] = {}
+        # Los movimientos en paralelo pueden resolver colisiones a la vez
+        self._lock = threading.Lock()
+        self.collisions = 0
+
+    def _key(self, name: str) -> str:
+        return self._fold(name) if self._fold else name
+
+    def _names(self, folder: Path) -> set:
+        folder_key = str(folder)
+        names = self._taken.get(folder_key)
+        if names is None:
+            names = set()
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        names.add(self._key(entry.name))
+            except FileNotFoundError:
+                pass
+            self._taken[folder_key] = names
+        return names
+
+    def reserve(self, folder: Path, name: str) -> Path:
+        """Devuelve folder/name o "name (n).ext" con el primer n libre y lo marca como ocupado."""
+        with self._lock:
+            return self._reserve(folder, name)
+
+    def _reserve(self, folder: Path, name: str) -> Path:
+        names = self._names(folder)
+        key = self._key(name)
+        if key not in names:
+            names.add(key)
+            return folder / name
+
+        self.collisions += 1
+        stem, suffix = _split_name(name)
+        counter_key = (str(folder), key)
+        i = self._next_suffix.get(counter_key, 1)
+        while True:
+            candidate = f"{stem} ({i}){suffix}"
+            candidate_key = self._key(candidate)
+            if candidate_key not in names:
+                break
+            i += 1
+        self._next_suffix[counter_key] = i + 1
+        names.add(candidate_key)
+        return folder / candidate
+
+    def taken(self, folder: Path, name: str) -> bool:
+        with self._lock:
+            return self._key(name) in self._names(folder)
+
+    def count(self, folder: Path) -> int:
+        """Entradas de `folder`, contando las ya reservadas."""
+        with self._lock:
+            return len(self._names(folder))
+
+    def mark_taken(self, path: Path) -> None:
+        with self._lock:
+            self._names(path.parent).add(self._key(path.name))
+
+    def release(self, path: Path) -> None:
+        with self._lock:
+            self._names(path.parent).discard(self._key(path.name))
+
+
+def _identity(st: os.stat_result) -> Identity:
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
 
-def _unique_destination(dest_path: Path) -> Path:
+
+def _same_identity(st: os.stat_result, identity: Optional[Identity]) -> bool:
+    if identity is None:
+        return True
+    ino, size, mtime_ns = identity
+    if ino and st.st_ino and ino != st.st_ino:
+        return False
+    return st.st_size == size and st.st_mtime_ns == mtime_ns
+
+
+def _move_unique(
+    src: Path,
+    dst_folder: Path,
+    index: DestinationIndex,
+    name: Optional[str],
+    reserved: bool,
+    same_device: Optional[bool],
+    on_bytes: Optional[Callable[[int], None]],
+    size: int,
+) -> Tuple[Path, Optional[os.stat_result]]:
+    name = name or src.name
+    target = dst_folder / name if reserved else index.reserve(dst_folder, name)
+    while True:
+        try:
+            copied = fileops.transfer(str(src), str(target), same_device=same_device, on_bytes=on_bytes, size=size)
+            return target, copied
+        except FileExistsError:
+            index.mark_taken(target)
+            target = index.reserve(dst_folder, src.name if reserved else name)
+        except BaseException:
+            index.release(target)
+            raise
+
+
+def move_unique(
+    src: Path,
+    dst_folder: Path,
+    index: DestinationIndex,
+    name: Optional[str] = None,
+    reserved: bool = False,
+    same_device: Optional[bool] = None,
+    on_bytes: Optional[Callable[[int], None]] = None,
+    size: int = 0,
+) -> Path:
     """
-    Si dest_path existe, genera un nombre único: "name (1).ext", "name (2).ext", ...
+    Mueve src a dst_folder con el nombre libre que indique el índice. El movimiento nunca
+    reemplaza (rename sin reemplazo o creación exclusiva), así que si un escritor externo
+    se adelanta con ese nombre se marca como ocupado y se prueba el siguiente.
+    reserved=True indica que `name` ya viene resuelto por un plan y se intenta tal cual.
     """
-    if not dest_path.exists():
-        return dest_path
-    stem, suffix = dest_path.stem, dest_path.suffix
-    i = 1
+    return _move_unique(src, dst_folder, index, name, reserved, same_device, on_bytes, size)[0]
+
+
+def _link_unique(move: "PlannedMove", index: DestinationIndex) -> Optional[Path]:
+    """
+    Sustituye el movimiento por un enlace duro a move.link_to (un archivo idéntico ya
+    organizado) y borra el origen. Devuelve None si no se puede enlazar (otra unidad,
+    sistema sin enlaces, original desaparecido) o si el origen cambió desde que se
+    comparó: entonces se mueve como cualquier otro.
+    """
+    folder = Path(move.folder)
+    target = folder / move.name
     while True:
-        candidate = dest_path.with_name(f"{stem} ({i}){suffix}")
-        if not candidate.exists():
-            return candidate
-        i += 1
+        try:
+            os.link(move.link_to, target)
+            break
+        except FileExistsError:
+            index.mark_taken(target)
+            target = index.reserve(folder, os.path.basename(move.source))
+        except OSError:
+            return None
+    try:
+        st = os.lstat(move.source)
+        if _same_identity(st, (move.ino, move.size, move.mtime_ns)):
+            os.unlink(move.source)
+            return target
+    except OSError:
+        pass
+    os.unlink(target)
+    return None
 
 
-def _move_with_collision(src: Path, dst_folder: Path) -> Path:
-    dst_folder.mkdir(parents=True, exist_ok=True)
-    target = _unique_destination(dst_folder / src.name)
-    shutil.move(str(src), str(target))
-    return target
+def _link_view(
+    move: "PlannedMove",
+    index: DestinationIndex,
+    devices: fileops.DeviceCache,
+    link: str,
+    on_bytes: Optional[Callable[[int], None]],
+    stats: Optional[RunStats],
+) -> Tuple[Path, Identity]:
+    folder = Path(move.folder)
+    target = folder / move.name
+    unavailable = devices.link_unavailable(os.path.dirname(move.source), move.folder)
+    while True:
+        try:
+            method = fileops.make_link(move.source, str(target), fileops.LINK_METHODS[link], on_bytes, unavailable)
+            break
+        except FileExistsError:
+            index.mark_taken(target)
+            target = index.reserve(folder, os.path.basename(move.source))
+        except BaseException:
+            index.release(target)
+            raise
+    if method != fileops.COPY and on_bytes and move.size:
+        on_bytes(move.size)
+    if stats is not None:
+        stats.count(run_stats.COPIES if method == fileops.COPY else run_stats.LINKS)
+    # La identidad es la del propio enlace (lstat): deshacer solo borra lo que creó
+    return target, _identity(os.lstat(target))
 
 
-_DEFAULT_MESSAGES: Dict[str, str] = {
-    "no_files": "No files to organize.",
-    "moved": "✅ Moved {name} → {folder}",
-    "moved_others": "📁 Moved {name} → Others",
-}
+class CancelToken:
+    """
+    Permite cancelar o pausar una ejecución desde otro hilo (p. ej. la interfaz).
+    El organizador lo consulta entre archivo y archivo: lo que ya está en marcha termina,
+    así que lo devuelto y el diario reflejan exactamente lo que se movió.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        if not self._running.is_set():
+            self._running.set()  # una ejecución en pausa debe despertar para terminar
+
+    def pause(self) -> None:
+        if not self._cancelled.is_set():
+            self._running.clear()
+
+    def resume(self) -> None:
+        self._running.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    def should_stop(self) -> bool:
+        """Bloquea mientras esté en pausa; True si hay que dejar de procesar."""
+        # is_set() no toma ningún lock: se puede cancelar desde un manejador de señales
+        if not self._running.is_set():
+            self._running.wait()
+        return self._cancelled.is_set()
+
+    def guard(self, items: Iterable) -> Iterator:
+        """Deja pasar elementos hasta que se cancele, esperando durante las pausas."""
+        for item in items:
+            if self.should_stop():
+                return
+            yield item
+
+
+class OrganizeError(Exception):
+    """
+    Fallo a mitad de una ejecución. `moves` (MoveList) son los movimientos que sí se
+    completaron, para poder deshacerlos o reanudar; `error` es la excepción original.
+    """
+
+    def __init__(self, error: BaseException, moves: "MoveList"):
+        super().__init__(str(error))
+        self.error = error
+        self.moves = moves
+
+
+def _scan(folder: str, st: Optional[os.stat_result], state: Optional[SourceState]):
+    return os.scandir(folder) if state is None else state.scandir(folder, st)
+
+
+def _iter_files(source_path: Path, state: Optional[SourceState] = None) -> Iterator[os.DirEntry]:
+    """
+    Recorre source_path con os.scandir y va entregando los archivos según se leen.
+    DirEntry.is_file() usa el tipo que ya devuelve el sistema (sin stat extra) y
+    DirEntry.stat() queda cacheado para las reglas que lo necesiten.
+    Con `state` (modo incremental) se omite lo que ya se vio y no ha cambiado.
+    """
+    folder = os.fspath(source_path)
+    it = _scan(folder, os.stat(folder) if state is not None else None, state)
+    try:
+        for entry in it:
+            try:
+                if entry.is_file() and entry.name != STATE_FILE:
+                    if state is None or state.wants(entry):
+                        yield entry
+            except OSError:
+                # Entrada que desaparece o enlace roto entre readdir y la comprobación
+                continue
+    finally:
+        it.close()
+
+
+@dataclass
+class WalkOptions:
+    """
+    Recorrido recursivo de la carpeta de origen.
+    max_depth=None no tiene límite; 0 equivale a no entrar en subcarpetas.
+    follow_symlinks decide si se entra en enlaces a carpetas (los ciclos se detectan).
+    exclude son patrones glob que se comparan con el nombre y con la ruta relativa
+    ("node_modules", ".git", "fotos/raw/*"); valen para carpetas y archivos.
+    preserve_subpath mantiene la subruta bajo la categoría: a/b/x.jpg → Images/a/b/x.jpg.
+    """
+    max_depth: Optional[int] = None
+    follow_symlinks: bool = False
+    exclude: Sequence[str] = ()
+    preserve_subpath: bool = False
+
+
+def _path_key(path: str) -> str:
+    path = os.path.normcase(os.path.abspath(path))
+    return path.casefold() if _CASE_INSENSITIVE_FS else path
+
+
+def _walk_files(
+    source_path: Path,
+    dest_path: Path,
+    categories: Iterable[str],
+    options: WalkOptions,
+    state: Optional[SourceState] = None,
+) -> Iterator[os.DirEntry]:
+    """
+    Recorre el árbol en profundidad con una pila de iteradores os.scandir: cada archivo
+    se entrega según se lee y la memoria (y los descriptores abiertos) crece con la
+    profundidad, no con el número de archivos. Nunca entra en las carpetas de categoría
+    de dest_path (ni en Duplicates) ni en dest_path si está dentro del origen.
+    Con `state` (modo incremental) las carpetas que no han cambiado no se vuelven a leer.
+    """
+    root = os.path.abspath(source_path)
+    skip = {_path_key(os.path.join(dest_path, c)) for c in [*categories, DUPLICATES]}
+    if _path_key(dest_path) != _path_key(root):
+        skip.add(_path_key(dest_path))
+    exclude = None
+    if options.exclude:
+        exclude = re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in options.exclude))
+    max_depth = options.max_depth
+
+    def excluded(entry: os.DirEntry) -> bool:
+        if exclude is None:
+            return False
+        if exclude.match(entry.name):
+            return True
+        rel = os.path.relpath(entry.path, root).replace(os.sep, "/")
+        return exclude.match(rel) is not None
+
+    # Identidad (dev, inodo) de las carpetas de la rama actual, para cortar ciclos de enlaces
+    st = os.stat(root)
+    branch = [(st.st_dev, st.st_ino)]
+    stack = [(_scan(root, st, state), 0)]
+    try:
+        while stack:
+            it, depth = stack[-1]
+            entry = next(it, None)
+            if entry is None:
+                it.close()
+                stack.pop()
+                branch.pop()
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=options.follow_symlinks):
+                    if max_depth is not None and depth >= max_depth:
+                        continue
+                    if _path_key(entry.path) in skip or excluded(entry):
+                        continue
+                    st = entry.stat(follow_symlinks=options.follow_symlinks)
+                    if (st.st_dev, st.st_ino) in branch:
+                        continue
+                    stack.append((_scan(entry.path, st, state), depth + 1))
+                    branch.append((st.st_dev, st.st_ino))
+                elif entry.is_file() and entry.name != STATE_FILE and not excluded(entry):
+                    if state is None or state.wants(entry):
+                        yield entry
+            except OSError:
+                # Carpeta sin permisos o entrada que desaparece durante el recorrido
+                continue
+    finally:
+        for it, _ in stack:
+            it.close()
+
+
+@dataclass
+class PlannedMove:
+    """
+    Un movimiento decidido pero aún no ejecutado.
+    Con link_to, en vez de mover se crea en el destino un enlace duro a ese archivo
+    idéntico y se borra el origen (ver dedupe).
+    """
+    source: str
+    folder: str
+    name: str
+    category: str
+    size: int = 0
+    ino: int = 0
+    mtime_ns: int = 0
+    link_to: str = ""
+
+    @property
+    def dest(self) -> str:
+        return os.path.join(self.folder, self.name)
+
+
+@dataclass
+class MovePlan:
+    """
+    Plan completo de una organización. Se puede guardar como JSON, revisar
+    (dry run / vista previa) y ejecutar más tarde con execute_plan.
+    """
+    source_folder: str
+    dest_folder: str
+    moves: List[PlannedMove] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def __iter__(self) -> Iterator[PlannedMove]:
+        return iter(self.moves)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MovePlan":
+        return cls(
+            source_folder=data["source_folder"],
+            dest_folder=data["dest_folder"],
+            moves=[PlannedMove(**m) for m in data.get("moves", [])],
+        )
+
+    def save(self, path: Union[str, Path]) -> None:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_dict(), fh, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "MovePlan":
+        with open(path, "r", encoding="utf-8") as fh:
+            return cls.from_dict(json.load(fh))
+
+
+def _already_linked(entry: os.DirEntry, target: Path) -> bool:
+    """
+    True si `target` ya es la vista de `entry` de una pasada anterior en modo enlace:
+    el mismo inodo (enlace duro o simbólico) o una copia con el mismo tamaño y mtime
+    (reflink y copia conservan la fecha).
+    """
+    try:
+        linked = os.stat(target)
+        st = entry.stat()
+    except OSError:
+        return False
+    if (linked.st_dev, linked.st_ino) == (st.st_dev, st.st_ino):
+        return True
+    return linked.st_size == st.st_size and linked.st_mtime_ns == st.st_mtime_ns
+
+
+def _plan_entries(
+    entries: Iterable[os.DirEntry],
+    dest_path: Path,
+    engine: RuleEngine,
+    index: DestinationIndex,
+    subpath_root: Optional[str] = None,
+    stats: Optional[RunStats] = None,
+    state: Optional[SourceState] = None,
+    link: Optional[str] = None,
+    layout: Optional["Layout"] = None,
+    sharding: Optional["Sharding"] = None,
+) -> Iterator[PlannedMove]:
+    """
+    Clasifica cada entrada y le asigna un nombre libre en memoria; no escribe en disco.
+    Con subpath_root la carpeta destino conserva la ruta relativa a esa raíz.
+    Con `layout` la carpeta de cada categoría sale de su plantilla (p. ej. por fecha)
+    y con `sharding` se reparte en subcarpetas de tamaño limitado.
+    Con `state` se apunta qué se queda en su sitio y qué carpetas van a cambiar.
+    Con `link` se omiten los archivos que ya tienen su enlace en el destino.
+    """
+    clock = time.perf_counter
+    classify_time = reserve_time = 0.0
+    last_dir, last_rel = None, ""
+    try:
+        for entry in entries:
+            if stats is not None:
+                start = clock()
+            # El stat solo se pide si alguna regla de tamaño/antigüedad lo necesita
+            try:
+                category = engine.classify(entry.name, entry.stat, entry.path)
+            except OSError:
+                # Desapareció mientras se leía el directorio (p. ej. un .part renombrado)
+                continue
+            finally:
+                if stats is not None:
+                    classify_time += clock() - start
+            if category is None:
+                if state is not None:
+                    state.keep(entry)
+                continue
+            if layout is None:
+                folder = dest_path / category
+            else:
+                try:
+                    folder = dest_path / layout.folder(category, entry)
+                except OSError:
+                    # Desapareció mientras se leía el directorio: no hay nada que mover
+                    continue
+            if subpath_root is not None:
+                # El recorrido entrega seguidos los archivos de cada carpeta
+                entry_dir = os.path.dirname(entry.path)
+                if entry_dir != last_dir:
+                    last_dir = entry_dir
+                    last_rel = os.path.relpath(entry_dir, subpath_root)
+                if last_rel != os.curdir:
+                    folder = folder / last_rel
+            if link is not None and any(
+                index.taken(f, entry.name) and _already_linked(entry, f / entry.name)
+                for f in ([folder] if sharding is None else sharding.shards(folder, entry.name))
+            ):
+                if state is not None:
+                    state.keep(entry)
+                if stats is not None:
+                    stats.count(run_stats.SKIPPED)
+                continue
+            if sharding is not None:
+                # Después de omitir lo ya enlazado: solo ocupa hueco lo que se va a mover
+                folder = sharding.folder(folder, entry.name, index)
+            if state is not None:
+                state.planned(entry)
+            if stats is not None:
+                start = clock()
+            target = index.reserve(folder, entry.name)
+            if stats is not None:
+                reserve_time += clock() - start
+            try:
+                # Identidad del propio archivo (sin seguir enlaces): es lo que deshacer
+                # compara con lstat en el destino
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                yield PlannedMove(entry.path, str(folder), target.name, category)
+                continue
+            yield PlannedMove(entry.path, str(folder), target.name, category, st.st_size, st.st_ino, st.st_mtime_ns)
+    finally:
+        if stats is not None:
+            stats.add(run_stats.CLASSIFY, classify_time)
+            stats.add(run_stats.RESERVE, reserve_time)
+
+
+def _iter_plan(
+    source_path: Path,
+    dest_path: Path,
+    engine: RuleEngine,
+    index: DestinationIndex,
+    walk: Optional[WalkOptions],
+    stats: Optional[RunStats] = None,
+    cancel: Optional[CancelToken] = None,
+    state: Optional[SourceState] = None,
+    link: Optional[str] = None,
+    layout: Optional["Layout"] = None,
+    sharding: Optional["Sharding"] = None,
+) -> Iterator[PlannedMove]:
+    if walk is None:
+        entries = _iter_files(source_path, state)
+        subpath_root = None
+    else:
+        top = engine.categories if layout is None else layout.top_folders(engine.categories)
+        entries = _walk_files(source_path, dest_path, top, walk, state)
+        subpath_root = os.path.abspath(source_path) if walk.preserve_subpath else None
+    if stats is not None:
+        entries = stats.timed_iter(run_stats.ENUMERATE, entries)
+    if cancel is not None:
+        entries = cancel.guard(entries)
+    if layout is not None:
+        entries = layout.prefetch(entries, stats)
+    return _plan_entries(entries, dest_path, engine, index, subpath_root, stats, state, link, layout, sharding)
+
+
+def iter_plan(
+    source_folder: str,
+    dest_folder: Optional[str] = None,
+    rules: Optional[RuleEngine] = None,
+    index: Optional[DestinationIndex] = None,
+    walk: Optional[WalkOptions] = None,
+    stats: Optional[RunStats] = None,
+    cancel: Optional[CancelToken] = None,
+    layout: Optional["Layout"] = None,
+    sharding: Optional["Sharding"] = None,
+) -> Iterator[PlannedMove]:
+    """Como plan_organization, pero entrega los movimientos según se leen, sin ordenar."""
+    source_path = Path(source_folder)
+    dest_path = Path(dest_folder) if dest_folder else source_path
+    index = index if index is not None else DestinationIndex()
+    return _iter_plan(
+        source_path, dest_path, rules or DEFAULT_RULES, index, walk, stats, cancel, layout=layout, sharding=sharding
+    )
+
+
+def plan_organization(
+    source_folder: str,
+    dest_folder: Optional[str] = None,
+    rules: Optional[RuleEngine] = None,
+    index: Optional[DestinationIndex] = None,
+    walk: Optional[WalkOptions] = None,
+    stats: Optional[RunStats] = None,
+    cancel: Optional[CancelToken] = None,
+    state: Optional[SourceState] = None,
+    link: Optional[str] = None,
+    layout: Optional["Layout"] = None,
+    sharding: Optional["Sharding"] = None,
+) -> MovePlan:
+    """
+    Calcula todos los movimientos sin tocar el disco (solo lee origen y destinos).
+    Los movimientos quedan agrupados por carpeta destino para ejecutarlos con localidad.
+    Con `walk` se recorren también las subcarpetas (ver WalkOptions).
+    Con `stats` (stats.RunStats) se mide el tiempo de listar, clasificar y reservar nombres.
+    Si `cancel` se cancela a mitad, el plan queda con lo recorrido hasta entonces.
+    Con `state` (incremental.SourceState) solo se clasifica lo nuevo o cambiado desde la
+    pasada anterior; guardarlo después de ejecutar el plan es cosa de quien llama.
+    Con `link` (modo enlace) se omiten los archivos que ya tienen su enlace en el destino.
+    Con `layout` (layout.Layout) cada categoría se reparte en subcarpetas según su
+    plantilla, p. ej. por año y mes de captura.
+    Con `sharding` (sharding.Sharding) ninguna carpeta de destino pasa de un número de
+    entradas: se reparten en subcarpetas numeradas o por hash del nombre.
+    """
+    source_path = Path(source_folder)
+    dest_path = Path(dest_folder) if dest_folder else source_path
+    engine = rules or DEFAULT_RULES
+    index = index if index is not None else DestinationIndex()
+
+    moves = list(_iter_plan(source_path, dest_path, engine, index, walk, stats, cancel, state, link, layout, sharding))
+    moves.sort(key=lambda m: m.folder)
+    return MovePlan(str(source_path), str(dest_path), moves)
+
+
+class _FileEntry:
+    """Lo mínimo de os.DirEntry que usa _plan_entries, para rutas sueltas ya con lstat."""
+    __slots__ = ("path", "name", "_stat")
+
+    def __init__(self, path: str, st: os.stat_result):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat = st
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        # Solo se planifican archivos normales: con o sin seguir enlaces es el mismo stat
+        return self._stat
+
+
+def plan_files(
+    paths: Iterable[str],
+    dest_folder: str,
+    rules: Optional[RuleEngine] = None,
+    index: Optional[DestinationIndex] = None,
+    layout: Optional["Layout"] = None,
+    sharding: Optional["Sharding"] = None,
+) -> List[PlannedMove]:
+    """
+    Planifica solo los archivos indicados (p. ej. los recién llegados en modo vigilancia)
+    sin volver a listar la carpeta de origen. Se ignora lo que ya no existe o no es un
+    archivo normal.
+    """
+    engine = rules or DEFAULT_RULES
+    index = index if index is not None else DestinationIndex()
+    entries = []
+    for path in paths:
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode):
+            entries.append(_FileEntry(path, st))
+    if layout is not None:
+        entries = layout.prefetch(entries)
+    moves = list(_plan_entries(entries, Path(dest_folder), engine, index, layout=layout, sharding=sharding))
+    moves.sort(key=lambda m: m.folder)
+    return moves
+
+
+def execute_move(
+    move: PlannedMove,
+    index: DestinationIndex,
+    devices: fileops.DeviceCache,
+    on_bytes: Optional[Callable[[int], None]] = None,
+    stats: Optional[RunStats] = None,
+    link: Optional[str] = None,
+) -> Tuple[Path, Optional[Identity]]:
+    """
+    Ejecuta un solo movimiento del plan (la carpeta destino ya debe existir) y devuelve
+    (ruta final, identidad). Es la pieza de execute_plan para quien reparte el trabajo
+    por su cuenta; no escribe en el diario.
+    Con `link` (un modo de fileops.LINK_METHODS) el original no se toca: en el destino
+    se crea un enlace, un reflink o, si nada de eso es posible, una copia.
+    """
+    if link is not None:
+        return _link_view(move, index, devices, link, on_bytes, stats)
+    if move.link_to:
+        linked = _link_unique(move, index)
+        if linked is not None:
+            if stats is not None:
+                stats.count(run_stats.LINKS)
+            # El enlace comparte inodo con el original: su identidad es la de ese archivo
+            return linked, _identity(os.lstat(linked))
+        move = replace(move, link_to="")
+    # Misma unidad (mismo st_dev) → rename atómico; si no, copia zero-copy + fsync
+    same_device = devices.same_device(os.path.dirname(move.source), move.folder)
+    new_path, copied = _move_unique(
+        Path(move.source), Path(move.folder), index, move.name, True, same_device, on_bytes, move.size
+    )
+    if copied is not None:
+        if stats is not None:
+            stats.count(run_stats.COPIES)
+        return new_path, _identity(copied)
+    # Un rename conserva inodo, tamaño y mtime del stat hecho al planificar
+    return new_path, (move.ino, move.size, move.mtime_ns) if move.mtime_ns else None
+
+
+def _run_ordered(fn: Callable, items: Iterable, workers: int) -> Iterator[Tuple[object, object]]:
+    """
+    Aplica fn a cada elemento y entrega (elemento, resultado) en el orden de entrada.
+    Con workers > 1 usa un pool de hilos con una ventana acotada de trabajos en vuelo,
+    así un iterable perezoso no se consume entero de golpe.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, fn(item)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    window = workers * 4
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fileflow-move") as pool:
+        try:
+            for item in items:
+                pending.append((item, pool.submit(fn, item)))
+                if len(pending) >= window:
+                    done_item, future = pending.popleft()
+                    yield done_item, future.result()
+            while pending:
+                done_item, future = pending.popleft()
+                yield done_item, future.result()
+        finally:
+            # Ante un error se descarta lo no iniciado; el pool espera a lo que ya corre
+            for _, future in pending:
+                future.cancel()
+
+
+def execute_plan(
+    plan: Iterable[PlannedMove],
+    progress_callback: Optional[Callable[[float], None]] = None,
+    log_callback: Optional[Callable[[str], None]] = None,
+    messages: Optional[Dict[str, str]] = None,
+    index: Optional[DestinationIndex] = None,
+    count_callback: Optional[Callable[[int], None]] = None,
+    workers: int = 1,
+    bytes_callback: Optional[Callable[[int, int], None]] = None,
+    journal: Optional[Journal] = None,
+    event_callback: Optional[EventCallback] = None,
+    stats: Optional[RunStats] = None,
+    cancel: Optional[CancelToken] = None,
+    link: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Ejecuta un plan (MovePlan o cualquier iterable de PlannedMove, incluso perezoso).
+    Cada carpeta destino se crea una sola vez y los nombres del plan se reclaman en
+    exclusiva; si alguien los ocupó después de planificar, se elige el siguiente libre.
+    Con workers > 1 los movimientos corren en paralelo (útil entre unidades o en SMB/NFS),
+    pero la lista devuelta y los callbacks siguen el orden del plan.
+    bytes_callback(hechos, total) informa en bytes, también a mitad de una copia grande
+    (total es 0 si el plan es perezoso); puede llamarse desde los hilos del pool.
+    Con `journal` cada movimiento queda registrado antes de ejecutarse y al completarse.
+    Devuelve una MoveList, que se comporta como la lista de tuplas de siempre.
+    event_callback recibe un MoveEvent por movimiento; log_callback recibe ese mismo
+    evento ya traducido con `messages`, que solo se formatea si hay log_callback.
+    Con `stats` se mide crear carpetas, mover y atender los callbacks, y se cuentan
+    archivos, bytes, copias y enlaces.
+    Con `cancel` (CancelToken) se deja de repartir trabajo al cancelar y se espera durante
+    las pausas; lo que ya estaba en marcha termina y se devuelve como un plan completo.
+    Si un movimiento falla, o el propio plan al leerlo (un recorrido perezoso, el diario),
+    no se empieza ninguno más y se lanza OrganizeError con los movimientos que sí se hicieron.
+    Con `link` los originales se quedan donde están y en el destino se crean enlaces
+    (ver execute_move); la MoveList devuelta lo recuerda para deshacer.
+    """
+    emit = make_emitter(event_callback, log_callback, messages)
+    index = index if index is not None else DestinationIndex()
+    clock = time.perf_counter
+    total = len(plan) if hasattr(plan, "__len__") else 0
+    devices = fileops.DeviceCache()
+
+    on_bytes = None
+    if bytes_callback:
+        total_bytes = sum(m.size for m in plan) if total else 0
+        done_bytes = [0]
+        bytes_lock = threading.Lock()
+
+        def on_bytes(n: int) -> None:
+            with bytes_lock:
+                done_bytes[0] += n
+                bytes_callback(done_bytes[0], total_bytes)
+
+    created = set()
+    journal_base = journal.next_index if journal is not None else 0
+    planned = journal.wrap_plan(plan) if journal is not None else plan
+
+    failures: List[Exception] = []
+
+    def with_folders() -> Iterator[PlannedMove]:
+        # Las carpetas se crean en el hilo que reparte el trabajo, antes de encolar
+        it = iter(planned)
+        while True:
+            if failures or (cancel is not None and cancel.should_stop()):
+                return
+            try:
+                move = next(it)
+            except StopIteration:
+                return
+            except Exception as e:
+                # El plan perezoso falló (directorio ilegible, diario sin espacio...):
+                # se termina lo que está en vuelo y se informa con lo ya movido
+                failures.append(e)
+                return
+            if move.folder not in created:
+                try:
+                    with maybe_phase(stats, run_stats.MKDIR):
+                        os.makedirs(move.folder, exist_ok=True)
+                except OSError as e:
+                    failures.append(e)
+                    return
+                created.add(move.folder)
+            yield move
+
+    def run(move: PlannedMove) -> Tuple[Optional[Tuple[Path, Optional[Identity]]], Optional[Exception]]:
+        # El error se devuelve en vez de lanzarse: los movimientos en vuelo deben
+        # terminar y registrarse antes de abandonar la ejecución
+        start = clock() if stats is not None else 0.0
+        try:
+            return transfer(move), None
+        except Exception as e:
+            return None, e
+        finally:
+            if stats is not None:
+                stats.add(run_stats.MOVE, clock() - start)
+
+    def transfer(move: PlannedMove) -> Tuple[Path, Optional[Identity]]:
+        return execute_move(move, index, devices, on_bytes, stats, link)
+
+    moves = MoveList()
+    moves.link = link
+    moved_kind = events.MOVED if link is None else events.LINKED
+
+    count = 0
+    moved_bytes = 0
+    callbacks_time = 0.0
+    try:
+        for position, (move, (result, error)) in enumerate(_run_ordered(run, with_folders(), workers)):
+            if error is not None:
+                failures.append(error)
+                continue
+            new_path, identity = result
+            moves.add(str(new_path), move.source, identity)  # (dest_final, origen_inicial)
+            count += 1
+            if journal is not None:
+                journal.done(journal_base + position, move.source, str(new_path), identity)
+            if stats is not None:
+                moved_bytes += move.size
+                start = clock()
+            if emit:
+                emit(MoveEvent(moved_kind, move.source, str(new_path), move.category, move.size, time.time()))
+
+            if count_callback:
+                count_callback(count)
+            if progress_callback and total:
+                progress_callback(count / total)
+            if stats is not None:
+                callbacks_time += clock() - start
+
+        if failures:
+            raise OrganizeError(failures[0], moves) from failures[0]
+        if progress_callback and (count == 0 or not total) and not (cancel is not None and cancel.cancelled):
+            progress_callback(1.0)
+    except OrganizeError:
+        raise
+    except Exception as e:
+        # Un fallo al registrar en el diario o en un callback: lo movido sigue siendo deshacible
+        raise OrganizeError(e, moves) from e
+    finally:
+        if stats is not None:
+            # También ante un error: lo que se movió cuenta
+            stats.add(run_stats.CALLBACKS, callbacks_time)
+            stats.count(run_stats.FILES, len(moves))
+            stats.count(run_stats.BYTES, moved_bytes)
+    return moves
+
+
+def _state_scope(
+    dest_path: Path,
+    walk: Optional[WalkOptions],
+    layout: Optional["Layout"] = None,
+    sharding: Optional["Sharding"] = None,
+) -> str:
+    # Lo que cambia qué se recorre o adónde va: con otro destino, otras opciones de
+    # recorrido, otra plantilla u otro reparto se empieza de cero
+    scope = {"dest": os.path.abspath(dest_path), "walk": asdict(walk) if walk is not None else None}
+    if layout is not None:
+        scope["layout"] = [layout.template, layout.date_source]
+    if sharding is not None:
+        scope["sharding"] = [sharding.mode, sharding.max_entries, sharding.width]
+    return json.dumps(scope, sort_keys=True, default=list)
 
 
 def organize_files(
@@ -46,48 +956,451 @@ def organize_files(
     progress_callback: Optional[Callable[[float], None]] = None,
     log_callback: Optional[Callable[[str], None]] = None,
     messages: Optional[Dict[str, str]] = None,
+    rules: Optional[RuleEngine] = None,
+    streaming: bool = False,
+    count_callback: Optional[Callable[[int], None]] = None,
+    dry_run: bool = False,
+    workers: int = 1,
+    bytes_callback: Optional[Callable[[int, int], None]] = None,
+    journal: Optional[Journal] = None,
+    event_callback: Optional[EventCallback] = None,
+    walk: Optional[WalkOptions] = None,
+    dedupe: Optional["Deduplicator"] = None,
+    stats: Optional[RunStats] = None,
+    cancel: Optional[CancelToken] = None,
+    incremental: bool = False,
+    link: Optional[str] = None,
+    layout: Optional["Layout"] = None,
+    sharding: Optional["Sharding"] = None,
 ) -> List[Tuple[str, str]]:
     """
     Organiza archivos y devuelve una lista de movimientos [(dest_final, origen_inicial), ...]
     para poder deshacerlos después.
+    `rules` permite clasificar con reglas de usuario (ver rules.load_rules).
+    Con streaming=True los archivos se mueven mientras el directorio se sigue leyendo;
+    como no se conoce el total, el avance se notifica con count_callback(n_procesados)
+    y progress_callback solo recibe 1.0 al terminar.
+    Con dry_run=True solo se planifica: devuelve los movimientos previstos sin ejecutarlos.
+    `workers` > 1 ejecuta los movimientos en un pool de hilos y bytes_callback(hechos, total)
+    informa del avance en bytes (ver execute_plan).
+    Con `journal` (Journal.start) la ejecución queda registrada en disco: si se interrumpe
+    puede completarse con resume_run o revertirse con undo_run. Se cierra al terminar bien;
+    ante un error queda abierto como "interrumpido".
+    event_callback recibe eventos estructurados (events.MoveEvent); log_callback, las mismas
+    líneas ya traducidas con `messages`.
+    Con `walk` (WalkOptions) también se organizan las subcarpetas, sin entrar nunca en
+    las carpetas de categoría del destino.
+    Con `dedupe` (dedupe.Deduplicator) los duplicados exactos se omiten, se enlazan o se
+    apartan en Duplicates; necesita el plan completo, así que desactiva el streaming.
+    Con `stats` (stats.RunStats) se mide cada fase y se cuentan archivos, bytes,
+    colisiones y errores; sin él no se mide nada.
+    Con `cancel` (CancelToken) la ejecución puede pausarse o cancelarse desde otro hilo;
+    cancelada, devuelve los movimientos hechos y el diario queda como interrumpido para
+    reanudarla o deshacerla. Si falla a mitad se lanza OrganizeError con esos movimientos.
+    Con incremental=True se guarda en el origen (incremental.STATE_FILE) lo que ya se
+    vio: la siguiente pasada no vuelve a leer las carpetas sin cambios y solo clasifica
+    lo nuevo, lo modificado y lo que afecte un cambio de reglas. El estado solo se
+    actualiza si la pasada termina entera (no en dry_run, ni al cancelar o fallar).
+    Con `link` ("auto", "reflink", "hardlink", "symlink" o "copy"; ver
+    fileops.LINK_METHODS) no se mueve nada: las carpetas de categoría se llenan de
+    enlaces a los originales, que se quedan donde están. Repetirlo solo añade lo nuevo,
+    y deshacerlo borra los enlaces. Con dedupe, los duplicados se omiten o se apartan,
+    pero nunca se enlazan al original ya organizado.
+    Con `layout` (layout.Layout) las carpetas de destino siguen una plantilla como
+    "{category}/{year}/{month}", con la fecha de captura (EXIF, MP4/MOV) o el mtime.
+    Con `sharding` (sharding.Sharding) las carpetas de destino se reparten en
+    subcarpetas (Images/0001, Images/0002... o por hash) para que ninguna crezca sin
+    límite; el llenado de cada una se lleva en memoria.
     """
-    msgs = {**_DEFAULT_MESSAGES, **(messages or {})}
+    if link is not None and link not in fileops.LINK_METHODS:
+        raise ValueError(f"Unknown link mode: {link!r}")
+    emit = make_emitter(event_callback, log_callback, messages)
+    engine = rules or DEFAULT_RULES
 
     source_path = Path(source_folder)
     dest_path = Path(dest_folder) if dest_folder else source_path
+    # El mismo índice sirve al plan y a la ejecución: cada destino se lista una vez
+    index = DestinationIndex()
+    state = SourceState.load(source_path, engine, _state_scope(dest_path, walk, layout, sharding)) if incremental else None
+    started = time.perf_counter()
+    try:
+        if streaming and dedupe is None:
+            plan: Iterable[PlannedMove] = _iter_plan(
+                source_path, dest_path, engine, index, walk, stats, cancel, state, link, layout, sharding
+            )
+        else:
+            plan = plan_organization(
+                source_folder,
+                dest_folder,
+                rules=engine,
+                index=index,
+                walk=walk,
+                stats=stats,
+                cancel=cancel,
+                state=state,
+                link=link,
+                layout=layout,
+                sharding=sharding,
+            )
+            if not plan.moves:
+                if journal is not None:
+                    journal.finish()
+                if state is not None and not dry_run and not (cancel is not None and cancel.cancelled):
+                    state.save()
+                if emit and not (cancel is not None and cancel.cancelled):
+                    emit(MoveEvent(events.NO_FILES, str(source_path), "", "", 0, time.time()))
+                if progress_callback:
+                    progress_callback(1.0)
+                moves = MoveList()
+                moves.link = link
+                return moves
+            if dedupe is not None:
+                with maybe_phase(stats, run_stats.DEDUPE):
+                    plan.moves, skipped = dedupe.apply(plan.moves, index, str(dest_path))
+                if stats is not None:
+                    stats.count(run_stats.SKIPPED, len(skipped))
+                if emit:
+                    for move, original in skipped:
+                        emit(MoveEvent(events.DUPLICATE, move.source, original, move.category, move.size, time.time()))
 
-    files = [f for f in source_path.iterdir() if f.is_file()]
-    total = len(files)
-
-    moves: List[Tuple[str, str]] = []
+        if dry_run:
+            moves = MoveList()
+            moves.link = link
+            for move in plan:
+                moves.append((move.dest, move.source))
+                if emit:
+                    emit(MoveEvent(events.PLANNED, move.source, move.dest, move.category, move.size, time.time()))
+            if stats is not None:
+                stats.count(run_stats.FILES, len(moves))
+                stats.count(run_stats.BYTES, sum(move.size for move in plan))
+            if progress_callback:
+                progress_callback(1.0)
+            return moves
 
-    if total == 0:
-        if log_callback:
-            log_callback(msgs["no_files"])
-        if progress_callback:
-            progress_callback(1.0)
+        try:
+            moves = execute_plan(
+                plan,
+                progress_callback=progress_callback,
+                index=index,
+                count_callback=count_callback,
+                workers=workers,
+                bytes_callback=bytes_callback,
+                journal=journal,
+                event_callback=emit,
+                stats=stats,
+                cancel=cancel,
+                link=link,
+            )
+        except BaseException:
+            if journal is not None:
+                journal.close()
+            raise
+        cancelled = cancel is not None and cancel.cancelled
+        if journal is not None:
+            if cancelled and moves:
+                # Sin marca de fin: la ejecución queda como interrumpida (reanudable)
+                journal.close()
+            else:
+                journal.finish()
+        if state is not None and not cancelled:
+            state.save()
+        if not moves and emit and not cancelled:
+            emit(MoveEvent(events.NO_FILES, str(source_path), "", "", 0, time.time()))
         return moves
+    except Exception:
+        if stats is not None:
+            stats.count(run_stats.ERRORS)
+        raise
+    finally:
+        if stats is not None:
+            stats.count(run_stats.COLLISIONS, index.collisions)
+            if state is not None:
+                stats.count(run_stats.UNCHANGED, state.unchanged)
+                stats.count(run_stats.REUSED, state.reused)
+            stats.add(run_stats.TOTAL, time.perf_counter() - started)
+
+
+# -------- Deshacer y recuperación --------
+
+_UNDO_CHUNK = 4096
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    chunk: List = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _undo_records(
+    records: Iterable[Tuple[str, str, Optional[Identity]]],
+    total: int,
+    progress_callback: Optional[Callable[[float], None]],
+    emit: Optional[EventCallback],
+    workers: int,
+    stats: Optional[RunStats] = None,
+    linked: bool = False,
+) -> int:
+    """
+    Motor de deshacer: recibe (dest_final, origen_inicial, identidad) del último al primero.
+    Trabaja por bloques acotados; dentro de cada bloque agrupa por carpeta original para
+    crearla una sola vez y restaurar con localidad, usando rename si es la misma unidad.
+    Un solo lstat por archivo sirve para ver que existe y que es el mismo (inodo, tamaño, mtime).
+    Con `linked` (ejecución en modo enlace) el original sigue en su sitio y solo se
+    borra el enlace.
+    """
+    index = DestinationIndex()
+    devices = fileops.DeviceCache()
+    created = set()
+    clock = time.perf_counter
+
+    def run(record: Tuple[str, str, Optional[Identity]]) -> Tuple[str, object]:
+        undo = unlink_view if linked else restore
+        if stats is None:
+            return undo(record)
+        start = clock()
+        try:
+            return undo(record)
+        finally:
+            stats.add(run_stats.MOVE, clock() - start)
+
+    def restore(record: Tuple[str, str, Optional[Identity]]) -> Tuple[str, object]:
+        dest_final, origen_inicial, identity = record
+        try:
+            st = os.lstat(dest_final)
+            if not _same_identity(st, identity):
+                return events.SKIPPED_CHANGED, None
+            orig_dir, orig_name = os.path.split(origen_inicial)
+            same_device = devices.same_device(os.path.dirname(dest_final), orig_dir)
+            target = move_unique(
+                Path(dest_final), Path(orig_dir), index, name=orig_name, same_device=same_device, size=st.st_size
+            )
+            if stats is not None:
+                stats.count(run_stats.BYTES, st.st_size)
+            return events.RESTORED, target
+        except FileNotFoundError:
+            return events.SKIPPED_MISSING, None
+        except Exception as ex:
+            return events.ERROR_RESTORING, ex
+
+    def unlink_view(record: Tuple[str, str, Optional[Identity]]) -> Tuple[str, object]:
+        dest_final, origen_inicial, identity = record
+        try:
+            st = os.lstat(dest_final)
+            if not _same_identity(st, identity):
+                # Un enlace duro cambia con su original (mismo inodo): sigue siendo solo un nombre más
+                try:
+                    original = os.lstat(origen_inicial)
+                except OSError:
+                    original = None
+                if original is None or (original.st_dev, original.st_ino) != (st.st_dev, st.st_ino):
+                    return events.SKIPPED_CHANGED, None
+            os.unlink(dest_final)
+            return events.UNLINKED, None
+        except FileNotFoundError:
+            return events.SKIPPED_MISSING, None
+        except Exception as ex:
+            return events.ERROR_RESTORING, ex
+
+    restored = 0
+    done = 0
+    outcomes: Dict[str, int] = {}
+    callbacks_time = 0.0
+    try:
+        for chunk in _chunks(records, _UNDO_CHUNK):
+            # sort estable: dentro de cada carpeta se mantiene el orden inverso
+            chunk.sort(key=lambda r: os.path.dirname(r[1]))
+
+            def with_dirs() -> Iterator[Tuple[str, str, Optional[Identity]]]:
+                for record in chunk:
+                    orig_dir = os.path.dirname(record[1])
+                    if not linked and orig_dir not in created:
+                        try:
+                            with maybe_phase(stats, run_stats.MKDIR):
+                                os.makedirs(orig_dir, exist_ok=True)
+                        except OSError:
+                            pass  # el error se verá al restaurar ese archivo
+                        created.add(orig_dir)
+                    yield record
+
+            for (dest_final, origen_inicial, _), (status, result) in _run_ordered(run, with_dirs(), workers):
+                done += 1
+                if status in (events.RESTORED, events.UNLINKED):
+                    restored += 1
+                if stats is not None:
+                    outcomes[status] = outcomes.get(status, 0) + 1
+                    start = clock()
+                if emit:
+                    restored_to = str(result) if status == events.RESTORED else origen_inicial
+                    detail = str(result) if status == events.ERROR_RESTORING else ""
+                    emit(MoveEvent(status, dest_final, restored_to, "", 0, time.time(), detail))
+                if progress_callback and total:
+                    progress_callback(done / total)
+                if stats is not None:
+                    callbacks_time += clock() - start
+    finally:
+        if stats is not None:
+            stats.add(run_stats.CALLBACKS, callbacks_time)
+            stats.count(run_stats.FILES, restored)
+            stats.count(
+                run_stats.SKIPPED,
+                outcomes.get(events.SKIPPED_MISSING, 0) + outcomes.get(events.SKIPPED_CHANGED, 0),
+            )
+            stats.count(run_stats.ERRORS, outcomes.get(events.ERROR_RESTORING, 0))
+    return restored
+
+
+def undo_moves(
+    moves: Sequence[Tuple[str, str]],
+    progress_callback: Optional[Callable[[float], None]] = None,
+    log_callback: Optional[Callable[[str], None]] = None,
+    messages: Optional[Dict[str, str]] = None,
+    workers: int = 1,
+    event_callback: Optional[EventCallback] = None,
+    stats: Optional[RunStats] = None,
+) -> int:
+    """
+    Deshace una lista devuelta por organize_files, del último movimiento al primero.
+    Si es una MoveList se comprueba además la identidad de cada archivo antes de moverlo,
+    y si se creó en modo enlace solo se borran los enlaces.
+    Devuelve cuántos archivos se restauraron. Con `stats` se mide igual que al organizar.
+    """
+    emit = make_emitter(event_callback, log_callback, messages)
+    linked = False
+    if isinstance(moves, MoveList):
+        records = moves.reversed_records()
+        linked = moves.link is not None
+    else:
+        records = ((dest, src, None) for dest, src in reversed(moves))
+    with maybe_phase(stats, run_stats.TOTAL):
+        return _undo_records(records, len(moves), progress_callback, emit, workers, stats, linked)
+
+
+def _run_info(run: Union[RunInfo, str, Path]) -> RunInfo:
+    info = run if isinstance(run, RunInfo) else read_run(run)
+    if info is None:
+        raise ValueError(f"Not a FileFlow journal: {run}")
+    return info
+
+
+def _reconcile(journal: Journal, linked: bool = False) -> List[PlannedMove]:
+    """
+    Cierra los planes que quedaron abiertos tras un corte mirando el disco: si el origen
+    ya no está y el destino sí, el movimiento se hizo (se registra); si el origen sigue
+    ahí, el plan se anula y se devuelve para volver a ejecutarlo.
+    En modo enlace el origen no desaparece nunca: decide si el enlace llegó a crearse.
+    """
+    leftovers = []
+    for i, src, dst, category in list(iter_pending(journal.path)):
+        if linked:
+            pending = os.path.lexists(src) and not os.path.lexists(dst)
+        else:
+            pending = os.path.lexists(src)
+        if pending:
+            journal.void(i)
+            try:
+                size = os.stat(src).st_size
+            except OSError:
+                size = 0
+            folder, name = os.path.split(dst)
+            leftovers.append(PlannedMove(src, folder, name, category or os.path.basename(folder), size))
+        else:
+            try:
+                journal.done(i, src, dst, _identity(os.lstat(dst)))
+            except FileNotFoundError:
+                pass
+    journal.sync()
+    return leftovers
 
-    for i, file in enumerate(files, start=1):
-        moved = False
-        for folder, extensions in FILE_TYPES.items():
-            if file.suffix.lower() in extensions:
-                target_folder = dest_path / folder
-                new_path = _move_with_collision(file, target_folder)
-                moved = True
-                moves.append((str(new_path), str(file)))  # (dest_final, origen_inicial)
-                if log_callback:
-                    log_callback(msgs["moved"].format(name=Path(new_path).name, folder=folder))
-                break
 
-        if not moved:
-            other_folder = dest_path / "Others"
-            new_path = _move_with_collision(file, other_folder)
-            moves.append((str(new_path), str(file)))
-            if log_callback:
-                log_callback(msgs["moved_others"].format(name=Path(new_path).name))
+def resume_run(
+    run: Union[RunInfo, str, Path],
+    progress_callback: Optional[Callable[[float], None]] = None,
+    log_callback: Optional[Callable[[str], None]] = None,
+    messages: Optional[Dict[str, str]] = None,
+    rules: Optional[RuleEngine] = None,
+    workers: int = 1,
+    event_callback: Optional[EventCallback] = None,
+    walk: Optional[WalkOptions] = None,
+    stats: Optional[RunStats] = None,
+    layout: Optional["Layout"] = None,
+    sharding: Optional["Sharding"] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Completa una ejecución interrumpida: termina los movimientos que quedaron planificados
+    y organiza lo que aún quede en el origen, añadiendo todo al mismo diario.
+    `rules`, `walk`, `layout` y `sharding` deben ser los de la ejecución original.
+    """
+    emit = make_emitter(event_callback, log_callback, messages)
+    info = _run_info(run)
+    link = info.link or None
+    journal = Journal.reopen(info.path)
+    try:
+        with maybe_phase(stats, run_stats.TOTAL):
+            leftovers = _reconcile(journal, linked=link is not None)
+            moves = MoveList()
+            moves.link = link
+            if leftovers:
+                moves += execute_plan(
+                    leftovers, workers=workers, journal=journal, event_callback=emit, stats=stats, link=link
+                )
+    except BaseException:
+        journal.close()
+        raise
+    moves += organize_files(
+        info.source,
+        info.dest,
+        progress_callback=progress_callback,
+        rules=rules,
+        workers=workers,
+        journal=journal,
+        event_callback=emit,
+        walk=walk,
+        stats=stats,
+        link=link,
+        layout=layout,
+        sharding=sharding,
+    )
+    return moves
 
-        if progress_callback:
-            progress_callback(i / total)
 
-    return moves
\ No newline at end of file
+def undo_run(
+    run: Union[RunInfo, str, Path],
+    progress_callback: Optional[Callable[[float], None]] = None,
+    log_callback: Optional[Callable[[str], None]] = None,
+    messages: Optional[Dict[str, str]] = None,
+    workers: int = 1,
+    event_callback: Optional[EventCallback] = None,
+    stats: Optional[RunStats] = None,
+) -> int:
+    """
+    Deshace cualquier ejecución registrada (también una interrumpida, que así se revierte).
+    Lee el diario de atrás hacia delante sin cargarlo en memoria.
+    """
+    emit = make_emitter(event_callback, log_callback, messages)
+    info = _run_info(run)
+    if info.status in (STATUS_UNDONE, STATUS_ROLLED_BACK):
+        return 0
+    if info.status == STATUS_INTERRUPTED:
+        journal = Journal.reopen(info.path)
+        try:
+            _reconcile(journal, linked=bool(info.link))
+        finally:
+            journal.close()
+
+    with maybe_phase(stats, run_stats.TOTAL):
+        restored = _undo_records(
+            iter_done_reversed(info.path),
+            count_done(info.path),
+            progress_callback,
+            emit,
+            workers,
+            stats,
+            linked=bool(info.link),
+        )
+    mark_status(info.path, STATUS_ROLLED_BACK if info.status == STATUS_INTERRUPTED else STATUS_UNDONE)
+    return restored
@@ -0,0 +1,291 @@
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    from sniff import Sniffer
+
+OTHERS = "Others"
+
+StatFn = Callable[[], os.stat_result]
+
+_SIZE_UNITS = {
+    "": 1,
+    "b": 1,
+    "k": 1024,
+    "kb": 1024,
+    "m": 1024 ** 2,
+    "mb": 1024 ** 2,
+    "g": 1024 ** 3,
+    "gb": 1024 ** 3,
+    "t": 1024 ** 4,
+    "tb": 1024 ** 4,
+}
+
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*$")
+
+
+def _parse_size(value: Union[int, float, str, None]) -> Optional[int]:
+    """Acepta bytes como número o cadenas tipo "500MB", "1.5G"."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _SIZE_RE.match(value)
+    if not match or match.group(2).lower() not in _SIZE_UNITS:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()])
+
+
+def _normalize_suffix(ext: str) -> str:
+    ext = ext.strip().lower()
+    return ext if ext.startswith(".") else "." + ext
+
+
+@dataclass
+class Rule:
+    """
+    Regla de usuario. Todas las condiciones presentes deben cumplirse.
+    category=None deja el archivo en su sitio.
+    """
+    category: Optional[str]
+    glob: Optional[str] = None
+    regex: Optional[str] = None
+    extensions: Sequence[str] = ()
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    min_age_days: Optional[float] = None
+    max_age_days: Optional[float] = None
+    case_sensitive: bool = False
+
+    _name_patterns: List[Pattern] = field(default_factory=list, init=False, repr=False)
+    _suffixes: Tuple[str, ...] = field(default=(), init=False, repr=False)
+
+    def __post_init__(self):
+        flags = 0 if self.case_sensitive else re.IGNORECASE
+        self._name_patterns = []
+        if self.glob:
+            self._name_patterns.append(re.compile(fnmatch.translate(self.glob), flags))
+        if self.regex:
+            self._name_patterns.append(re.compile(self.regex, flags))
+        self._suffixes = tuple(_normalize_suffix(e) for e in self.extensions)
+
+    @property
+    def needs_stat(self) -> bool:
+        return any(v is not None for v in (self.min_size, self.max_size, self.min_age_days, self.max_age_days))
+
+    @property
+    def needs_clock(self) -> bool:
+        return self.min_age_days is not None or self.max_age_days is not None
+
+    def matches_name(self, name: str, lower: str) -> bool:
+        if self._suffixes and not lower.endswith(self._suffixes):
+            return False
+        for pattern in self._name_patterns:
+            if pattern.match(name) is None:
+                return False
+        return True
+
+    def matches_stat(self, st: os.stat_result, now: float) -> bool:
+        if self.min_size is not None and st.st_size < self.min_size:
+            return False
+        if self.max_size is not None and st.st_size > self.max_size:
+            return False
+        if self.min_age_days is not None or self.max_age_days is not None:
+            age_days = (now - st.st_mtime) / 86400.0
+            if self.min_age_days is not None and age_days < self.min_age_days:
+                return False
+            if self.max_age_days is not None and age_days > self.max_age_days:
+                return False
+        return True
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Rule":
+        if "category" not in data:
+            raise ValueError(f"Rule without 'category': {data!r}")
+        extensions = data.get("extensions", ())
+        if isinstance(extensions, str):
+            extensions = [extensions]
+        return cls(
+            category=data["category"],
+            glob=data.get("glob"),
+            regex=data.get("regex"),
+            extensions=tuple(extensions),
+            min_size=_parse_size(data.get("min_size")),
+            max_size=_parse_size(data.get("max_size")),
+            min_age_days=data.get("min_age_days"),
+            max_age_days=data.get("max_age_days"),
+            case_sensitive=bool(data.get("case_sensitive", False)),
+        )
+
+
+class RuleEngine:
+    """
+    Clasificador compilado una sola vez:
+      1. reglas de usuario que solo miran el nombre (glob, regex, extensión),
+      2. reglas de usuario que necesitan stat (tamaño, antigüedad); solo se
+         evalúan si ninguna regla de nombre decidió y su parte de nombre casa,
+      3. índice de sufijos construido a partir de FILE_TYPES,
+      4. con `sniffer`, detección por contenido solo si el sufijo es desconocido o ambiguo.
+    El stat se pide como mucho una vez por archivo y solo si hace falta.
+    """
+
+    def __init__(
+        self,
+        file_types: Dict[str, Iterable[str]],
+        rules: Sequence[Rule] = (),
+        sniffer: Optional["Sniffer"] = None,
+    ):
+        self.file_types: Dict[str, List[str]] = {k: list(v) for k, v in file_types.items()}
+        self.rules: List[Rule] = list(rules)
+        self.sniffer = sniffer
+        self._ambiguous = tuple(sniffer.ambiguous_suffixes) if sniffer is not None else ()
+        self._name_rules = [r for r in self.rules if not r.needs_stat]
+        self._stat_rules = [r for r in self.rules if r.needs_stat]
+        self._age_rules = [r for r in self._stat_rules if r.needs_clock]
+        self._fingerprint: Optional[str] = None
+
+        self._suffix_index: Dict[str, str] = {}
+        self._max_parts = 1
+        for category, extensions in self.file_types.items():
+            for ext in extensions:
+                suffix = _normalize_suffix(ext)
+                # La primera categoría que declara un sufijo gana, como en el recorrido original
+                self._suffix_index.setdefault(suffix, category)
+                self._max_parts = max(self._max_parts, suffix.count("."))
+
+    @property
+    def categories(self) -> List[str]:
+        names = list(self.file_types)
+        for rule in self.rules:
+            if rule.category and rule.category not in names:
+                names.append(rule.category)
+        if OTHERS not in names:
+            names.append(OTHERS)
+        return names
+
+    @property
+    def uses_stat(self) -> bool:
+        """True si la categoría puede depender del tamaño, la fecha o el contenido, no solo del nombre."""
+        return bool(self._stat_rules) or self.sniffer is not None
+
+    def depends_on_time(self, name: str) -> bool:
+        """True si alguna regla de antigüedad casa con el nombre: su decisión cambia con los días."""
+        if not self._age_rules:
+            return False
+        lower = name.lower()
+        return any(rule.matches_name(name, lower) for rule in self._age_rules)
+
+    @property
+    def fingerprint(self) -> str:
+        """Huella de los tipos, las reglas y la detección por contenido; cambia si cambia cualquiera."""
+        if self._fingerprint is None:
+            data = {
+                "file_types": self.file_types,
+                "rules": [{f.name: getattr(r, f.name) for f in fields(r) if f.init} for r in self.rules],
+                "sniff": self.sniffer is not None,
+            }
+            text = json.dumps(data, sort_keys=True, ensure_ascii=False)
+            self._fingerprint = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+    def category_for_suffix(self, name: str) -> Optional[str]:
+        """Busca en el índice de sufijos, probando primero el más largo (".tar.gz" antes que ".gz")."""
+        lower = name.lower()
+        return self._lookup_suffix(lower)
+
+    def _lookup_suffix(self, lower: str) -> Optional[str]:
+        index = self._suffix_index
+        if self._max_parts == 1:
+            pos = lower.rfind(".")
+            return index.get(lower[pos:]) if pos > 0 else None
+        dots = []
+        pos = len(lower)
+        while len(dots) < self._max_parts:
+            pos = lower.rfind(".", 0, pos)
+            if pos <= 0:
+                break
+            dots.append(pos)
+        for pos in reversed(dots):
+            category = index.get(lower[pos:])
+            if category is not None:
+                return category
+        return None
+
+    def with_sniffer(self, sniffer: Optional["Sniffer"]) -> "RuleEngine":
+        """El mismo motor con (o sin) detección por contenido."""
+        return RuleEngine(self.file_types, self.rules, sniffer)
+
+    def classify(self, name: str, stat_fn: Optional[StatFn] = None, path: Optional[str] = None) -> Optional[str]:
+        """
+        Devuelve la carpeta destino del archivo, OTHERS si nada coincide,
+        o None si una regla pide dejarlo donde está.
+        `path` solo hace falta para la detección por contenido.
+        """
+        lower = name.lower()
+        for rule in self._name_rules:
+            if rule.matches_name(name, lower):
+                return rule.category
+
+        if self._stat_rules and stat_fn is not None:
+            st = None
+            now = 0.0
+            for rule in self._stat_rules:
+                if not rule.matches_name(name, lower):
+                    continue
+                if st is None:
+                    st = stat_fn()
+                    now = time.time()
+                if rule.matches_stat(st, now):
+                    return rule.category
+
+        category = self._lookup_suffix(lower)
+        if self.sniffer is not None and path is not None and stat_fn is not None:
+            if category is None or lower.endswith(self._ambiguous):
+                sniffed = self._category_for_content(path, stat_fn)
+                if sniffed is not None:
+                    return sniffed
+        return category if category is not None else OTHERS
+
+    def _category_for_content(self, path: str, stat_fn: StatFn) -> Optional[str]:
+        try:
+            st = stat_fn()
+        except OSError:
+            return None
+        for suffix in self.sniffer.sniff(path, st):
+            category = self._suffix_index.get(suffix)
+            if category is not None:
+                return category
+        return None
+
+    @classmethod
+    def from_config(cls, config: Dict, file_types: Dict[str, Iterable[str]]) -> "RuleEngine":
+        """
+        Formato:
+            {
+              "file_types": {"Ebooks": [".epub", ".mobi"]},
+              "replace_file_types": false,
+              "rules": [{"category": "Screenshots", "glob": "Screenshot*"}, ...]
+            }
+        """
+        merged: Dict[str, List[str]] = {}
+        if not config.get("replace_file_types", False):
+            merged.update({k: list(v) for k, v in file_types.items()})
+        for category, extensions in config.get("file_types", {}).items():
+            merged.setdefault(category, [])
+            merged[category].extend(extensions)
+        rules = [Rule.from_dict(r) for r in config.get("rules", [])]
+        return cls(merged, rules)
+
+
+def load_rules(path: Union[str, Path], file_types: Dict[str, Iterable[str]]) -> RuleEngine:
+    """Carga un archivo JSON de reglas y lo compila sobre los tipos por defecto."""
+    with open(path, "r", encoding="utf-8") as fh:
+        config = json.load(fh)
+    return RuleEngine.from_config(config, file_types)
@@ -0,0 +1,116 @@
+"""
+Reparto de carpetas de destino muy grandes en subcarpetas ("shards").
+
+Una carpeta con cientos de miles de entradas hace lentas las búsquedas por nombre del
+sistema de archivos y cuelga a cualquier explorador que la abra. Con Sharding cada
+carpeta de destino se divide:
+  - COUNT: en subcarpetas numeradas (Images/0001, Images/0002...) de como mucho
+    `max_entries` entradas; se llena la última y, cuando está completa, se abre otra;
+  - HASH: por el prefijo hexadecimal del hash del nombre (Images/3f/...): reparto
+    uniforme y fijo, sin límite estricto por carpeta (`width` cifras = 16**width shards).
+El llenado de cada shard se toma una vez de DestinationIndex (que ya tiene en memoria
+los nombres de cada carpeta) y a partir de ahí lo lleva Sharding: elegir shard no
+vuelve a listar nada, y varias ejecuciones a la vez (un lote con un destino común)
+comparten la cuenta. Los movimientos guardan su ruta completa, así que deshacer no
+necesita saber nada de los shards.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from organizer import DestinationIndex
+
+# Modos de reparto
+COUNT = "count"
+HASH = "hash"
+SHARD_MODES = (COUNT, HASH)
+
+DEFAULT_MAX_ENTRIES = 10_000
+_DEFAULT_WIDTH = {COUNT: 4, HASH: 2}
+
+
+class Sharding:
+    """
+    Política de reparto para organize_files(sharding=...). Guarda en memoria el shard
+    abierto de cada carpeta base y cuántos archivos se han asignado a cada shard. Es
+    segura entre hilos: la misma instancia puede servir a todos los trabajos de un
+    lote, y entonces el límite vale para el conjunto. Cuenta lo planificado, no lo
+    movido: un archivo omitido después (duplicado, fallo) deja su hueco sin usar.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, mode: str = COUNT, width: Optional[int] = None):
+        if mode not in SHARD_MODES:
+            raise ValueError(f"Unknown sharding mode: {mode!r}")
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        width = width if width is not None else _DEFAULT_WIDTH[mode]
+        if not 1 <= width <= 8:
+            raise ValueError("width must be between 1 and 8")
+        self.max_entries = max_entries
+        self.mode = mode
+        self.width = width
+        # Carpeta base → número del shard que se está llenando
+        self._current: Dict[str, int] = {}
+        # Shard → entradas que tiene (lo que había en disco más lo asignado)
+        self._fill: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _name(self, number: int) -> str:
+        return f"{number:0{self.width}d}"
+
+    def _hash(self, name: str) -> str:
+        # blake2b, como dedupe: md5 no está disponible en compilaciones con FIPS
+        digest = hashlib.blake2b(name.encode("utf-8", "surrogateescape"), digest_size=4)
+        return digest.hexdigest()[: self.width]
+
+    def _last(self, base: Path) -> int:
+        """Número del último shard numerado que ya existe en `base` (1 si no hay ninguno)."""
+        last = 1
+        try:
+            with os.scandir(base) as it:
+                for entry in it:
+                    # Pasado 10**width - 1 los nombres son más anchos (0999 → 1000...)
+                    if len(entry.name) >= self.width and entry.name.isdigit() and entry.is_dir():
+                        last = max(last, int(entry.name))
+        except OSError:
+            pass
+        return last
+
+    def folder(self, base: Path, name: str, index: "DestinationIndex") -> Path:
+        """Shard de `base` donde va el archivo `name`."""
+        if self.mode == HASH:
+            return base / self._hash(name)
+        key = str(base)
+        with self._lock:
+            number = self._current.get(key)
+            if number is None:
+                # Se sigue llenando el último shard de una ejecución anterior
+                number = self._last(base)
+            while True:
+                shard = base / self._name(number)
+                shard_key = str(shard)
+                fill = self._fill.get(shard_key)
+                if fill is None:
+                    # Primera vez que se ve: lo que ya tiene en disco
+                    fill = index.count(shard)
+                if fill < self.max_entries:
+                    break
+                self._fill[shard_key] = fill
+                number += 1
+            self._fill[shard_key] = fill + 1
+            self._current[key] = number
+        return shard
+
+    def shards(self, base: Path, name: str) -> List[Path]:
+        """Shards de `base` en los que podría estar ya un archivo llamado `name`."""
+        if self.mode == HASH:
+            return [base / self._hash(name)]
+        key = str(base)
+        with self._lock:
+            last = self._current.get(key)
+            if last is None:
+                last = self._current[key] = self._last(base)
+        return [base / self._name(n) for n in range(1, last + 1)]
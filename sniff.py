@@ -0,0 +1,156 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from cache import MetadataCache, file_key
+
+# Bytes que se leen de cada archivo: una página basta para todas las firmas
+HEAD_SIZE = 4096
+
+# Cambia cuando cambia la detección: los resultados guardados con la anterior dejan de valer
+_CACHE_KIND = "sniff-2"
+
+# Extensiones que no dicen nada del contenido: aunque alguna regla las conozca, se mira dentro
+AMBIGUOUS_SUFFIXES = (".bin", ".dat", ".data", ".tmp", ".download")
+
+# Firma → extensiones candidatas, de la más exacta a la más genérica de la misma familia.
+# RuleEngine usa la primera que tenga categoría, así que respeta los FILE_TYPES del usuario.
+_PREFIX_SIGNATURES: List[Tuple[bytes, Tuple[str, ...]]] = [
+    (b"\xff\xd8\xff", (".jpg", ".jpeg")),
+    (b"\x89PNG\r\n\x1a\n", (".png",)),
+    (b"GIF87a", (".gif",)),
+    (b"GIF89a", (".gif",)),
+    (b"%PDF-", (".pdf",)),
+    (b"\x1a\x45\xdf\xa3", (".mkv", ".webm", ".mp4")),
+    (b"ID3", (".mp3",)),
+    (b"fLaC", (".flac", ".wav", ".mp3")),
+    (b"OggS", (".ogg", ".mp3")),
+    (b"Rar!\x1a\x07", (".rar", ".zip")),
+    (b"7z\xbc\xaf\x27\x1c", (".7z", ".zip")),
+    (b"\x1f\x8b", (".gz", ".tar.gz", ".zip")),
+    (b"BZh", (".bz2", ".tar.bz2", ".zip")),
+    (b"\xfd7zXZ\x00", (".xz", ".tar.xz", ".zip")),
+]
+
+_RIFF_TYPES = {
+    b"WAVE": (".wav", ".mp3"),
+    b"AVI ": (".avi", ".mp4"),
+    b"WEBP": (".webp", ".png", ".jpg"),
+}
+
+_MOV_BRANDS = {b"qt  "}
+_AUDIO_BRANDS = {b"M4A ", b"M4B ", b"M4P ", b"F4A "}
+_HEIF_BRANDS = {b"heic", b"heix", b"mif1", b"msf1", b"avif"}
+
+# Carpeta raíz de cada tipo de Office Open XML, tal como aparece en el ZIP
+_OOXML_PARTS = ((b"word/", (".docx",)), (b"ppt/", (".pptx",)), (b"xl/", (".xlsx",)))
+
+_BMP_HEADER_SIZES = {12, 40, 52, 56, 64, 108, 124}
+
+Candidates = Tuple[str, ...]
+
+
+def _compile(signatures: List[Tuple[bytes, Candidates]]) -> Dict[int, List[Tuple[bytes, Candidates]]]:
+    """Agrupa las firmas por su primer byte: cada archivo solo compara las de su grupo."""
+    table: Dict[int, List[Tuple[bytes, Candidates]]] = {}
+    for magic, candidates in signatures:
+        table.setdefault(magic[0], []).append((magic, candidates))
+    for group in table.values():
+        group.sort(key=lambda s: -len(s[0]))
+    return table
+
+
+_TABLE = _compile(_PREFIX_SIGNATURES)
+
+
+def _sniff_special(head: bytes) -> Optional[Candidates]:
+    """Formatos cuya firma no es un simple prefijo."""
+    if head[:4] == b"RIFF" and len(head) >= 12:
+        return _RIFF_TYPES.get(head[8:12])
+    if head[4:8] == b"ftyp" and len(head) >= 12:
+        brand = head[8:12]
+        if brand in _MOV_BRANDS:
+            return (".mov", ".mp4")
+        if brand in _AUDIO_BRANDS:
+            return (".m4a", ".aac", ".mp3")
+        if brand in _HEIF_BRANDS:
+            return (".heic", ".jpg")
+        return (".mp4",)
+    if head[:4] in (b"PK\x03\x04", b"PK\x05\x06"):
+        for marker, candidates in _OOXML_PARTS:
+            if marker in head:
+                return candidates
+        return (".zip",)
+    if head[:2] == b"BM" and len(head) >= 18:
+        if int.from_bytes(head[14:18], "little") in _BMP_HEADER_SIZES:
+            return (".bmp",)
+        return None
+    if len(head) >= 3 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        return _sniff_mpeg_frame(head)
+    return None
+
+
+def _sniff_mpeg_frame(head: bytes) -> Optional[Candidates]:
+    """
+    Cabecera de trama MPEG (11 bits de sincronía). Once bits a 1 también aparecen en
+    otras cosas, como la BOM de UTF-16LE (FF FE), así que se validan los campos.
+    """
+    if head[1] == 0xFE:
+        # FF FE es la BOM de UTF-16LE (texto), aunque parezca MPEG-1 capa I
+        return None
+    if head[1] in (0xF1, 0xF9):
+        # ADTS (AAC): MPEG-4/MPEG-2, capa 00, sin CRC
+        return (".aac", ".mp3")
+    version = (head[1] >> 3) & 0x03
+    layer = (head[1] >> 1) & 0x03
+    bitrate = head[2] >> 4
+    sample_rate = (head[2] >> 2) & 0x03
+    # 01 = versión reservada, 00 = capa reservada, 1111 y 11 = índices no válidos
+    if version == 0b01 or layer == 0b00 or bitrate == 0b1111 or sample_rate == 0b11:
+        return None
+    return (".mp3",)
+
+
+def detect(head: bytes) -> Optional[Candidates]:
+    """Extensiones candidatas para el contenido que empieza por `head`, o None."""
+    if not head:
+        return None
+    for magic, candidates in _TABLE.get(head[0], ()):
+        if head.startswith(magic):
+            return candidates
+    return _sniff_special(head)
+
+
+def read_head(path: str, size: int = HEAD_SIZE) -> bytes:
+    # os.open/os.read: sin objeto archivo ni búfer de Python para leer una página
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        return os.read(fd, size)
+    finally:
+        os.close(fd)
+
+
+class Sniffer:
+    """
+    Detecta el tipo real de un archivo por sus primeros bytes. El resultado se guarda en
+    `cache` por (dispositivo, inodo, tamaño, mtime), así que un archivo sin cambios solo
+    se lee la primera vez. Se usa a través de RuleEngine.with_sniffer.
+    """
+
+    def __init__(self, cache: Optional[MetadataCache] = None, ambiguous_suffixes: Tuple[str, ...] = AMBIGUOUS_SUFFIXES):
+        self.cache = cache if cache is not None else MetadataCache()
+        self.ambiguous_suffixes = ambiguous_suffixes
+        self.reads = 0
+
+    def sniff(self, path: str, st: os.stat_result) -> Candidates:
+        key = file_key(st)
+        cached = self.cache.get(_CACHE_KIND, key)
+        if cached is not None:
+            return tuple(cached.split(",")) if cached else ()
+        try:
+            head = read_head(path)
+        except OSError:
+            return ()
+        self.reads += 1
+        candidates = detect(head) or ()
+        self.cache.put(_CACHE_KIND, key, ",".join(candidates))
+        return candidates
@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+# Fases que mide el organizador (tiempo en segundos)
+ENUMERATE = "enumerate"  # leer el directorio de origen
+CLASSIFY = "classify"  # reglas, sufijos y detección por contenido
+METADATA = "metadata"  # esperar a las fechas de captura (layout.Layout)
+RESERVE = "reserve"  # elegir nombre libre en destino (colisiones)
+DEDUPE = "dedupe"
+MKDIR = "mkdir"
+MOVE = "move"  # rename o copia; con workers > 1 es la suma de todos los hilos
+CALLBACKS = "callbacks"  # log, eventos y progreso (la interfaz)
+TOTAL = "total"
+
+# Contadores
+FILES = "files"
+BYTES = "bytes"
+COLLISIONS = "collisions"
+COPIES = "copies"  # movimientos entre unidades (copia + borrado)
+LINKS = "links"
+ERRORS = "errors"
+SKIPPED = "skipped"
+UNCHANGED = "unchanged_dirs"  # modo incremental: carpetas que no se volvieron a leer
+REUSED = "reused"  # modo incremental: archivos ya vistos que no se volvieron a clasificar
+
+
+class RunStats:
+    """
+    Tiempos por fase y contadores de una ejecución (organizar o deshacer).
+    Las funciones del organizador solo miden si reciben un RunStats: sin él el coste es
+    una comprobación `is None` por archivo. Seguro entre hilos (los movimientos en
+    paralelo suman desde el pool).
+    """
+
+    def __init__(self, operation: str = "organize"):
+        self.operation = operation
+        self.started = time.time()
+        self.timers: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other: "RunStats") -> None:
+        """
+        Suma los tiempos y contadores de otra ejecución (p. ej. los trabajos de un lote).
+        El total no se suma: es tiempo de reloj y cada ejecución lleva el suyo.
+        """
+        data = other.to_dict()
+        with self._lock:
+            for phase, seconds in data["timers"].items():
+                if phase != TOTAL:
+                    self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+            for name, value in data["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed_iter(self, phase: str, items: Iterable) -> Iterator:
+        """Atribuye a `phase` solo el tiempo que pasa dentro de next(), p. ej. leyendo un directorio."""
+        it = iter(items)
+        clock = time.perf_counter
+        spent = 0.0
+        try:
+            while True:
+                start = clock()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                finally:
+                    spent += clock() - start
+                yield item
+        finally:
+            self.add(phase, spent)
+
+    # --------- Salida ---------
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "operation": self.operation,
+                "started": self.started,
+                "timers": {k: round(v, 6) for k, v in self.timers.items()},
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix: str = "fileflow_run") -> str:
+        """Formato de texto de Prometheus (node_exporter --collector.textfile)."""
+        data = self.to_dict()
+        op = data["operation"]
+        lines = [
+            f"# HELP {prefix}_phase_seconds Time spent in each phase of the last run.",
+            f"# TYPE {prefix}_phase_seconds gauge",
+        ]
+        for phase, seconds in sorted(data["timers"].items()):
+            lines.append(f'{prefix}_phase_seconds{{operation="{op}",phase="{phase}"}} {seconds}')
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f'{prefix}_{name}{{operation="{op}"}} {value}')
+        lines.append(f"# TYPE {prefix}_started_timestamp_seconds gauge")
+        lines.append(f'{prefix}_started_timestamp_seconds{{operation="{op}"}} {data["started"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: Union[str, Path]) -> None:
+        _write_atomic(path, self.to_json() + "\n")
+
+    def write_prometheus(self, path: Union[str, Path]) -> None:
+        _write_atomic(path, self.to_prometheus())
+
+    def summary_values(self) -> Dict:
+        """Valores para la línea de resumen traducida (msg["stats_summary"])."""
+        with self._lock:
+            phases = sorted(
+                ((k, v) for k, v in self.timers.items() if k != TOTAL and v >= 0.0005),
+                key=lambda kv: kv[1],
+                reverse=True,
+            )
+            return {
+                "files": self.counters.get(FILES, 0),
+                "size": format_bytes(self.counters.get(BYTES, 0)),
+                "seconds": f"{self.timers.get(TOTAL, 0.0):.2f}",
+                "phases": ", ".join(f"{k} {v:.2f} s" for k, v in phases[:3]),
+            }
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def _write_atomic(path: Union[str, Path], text: str) -> None:
+    # El recolector de Prometheus no debe leer nunca un archivo a medias
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    os.replace(tmp, path)
+
+
+_NOT_MEASURED = nullcontext()
+
+
+def maybe_phase(stats: Optional[RunStats], name: str):
+    """stats.phase(name) o un contexto vacío si no se mide."""
+    return stats.phase(name) if stats is not None else _NOT_MEASURED
@@ -8,25 +8,42 @@ TRANSLATIONS = {
             "destination": "Destination Folder (optional):",
             "organize": "🧹 Organize Files",
             "undo": "↩️ Undo last",
+            "preview": "🔎 Preview",
+            "pause": "⏸️ Pause",
+            "resume": "▶️ Resume",
+            "cancel": "⏹️ Cancel",
         },
         "msg": {
             "error_title": "Error",
             "please_select_source": "Please select a source folder.",
             "done_title": "Done",
             "done_body": "All files have been organized successfully.",
+            "preview_done_body": "Preview complete. No files were moved.",
             "nothing_to_undo_title": "Nothing to undo",
             "nothing_to_undo_body": "No recent organization to undo.",
             "undo_start": "Starting undo...",
             "undo_complete_title": "Undo complete",
             "undo_complete_body": "Changes have been reverted.",
             "restored": "↩️ Restored {name} → {folder}",
+            "unlinked": "🧹 Removed link {name}",
             "skipped_missing": "⚠️ Skipped missing file: {name}",
             "error_restoring": "❌ Error restoring {name}: {error}",
+            "skipped_changed": "⚠️ Skipped {name}: it changed after organizing",
+            "interrupted_title": "Interrupted organization found",
+            "interrupted_body": "A previous organization did not finish:\n{source} → {dest}\n\nYes: finish it\nNo: roll it back\nCancel: decide later",
+            "resume_complete_body": "The interrupted organization has been completed.",
+            "rollback_complete_body": "The interrupted organization has been rolled back.",
+            "cancelled_title": "Cancelled",
+            "cancelled_body": "Organization cancelled. {count} files had already been moved and can be undone.",
+            "stats_summary": "⏱️ {files} files · {size} · {seconds} s ({phases})",
         },
         "organizer": {
             "no_files": "No files to organize.",
             "moved": "✅ Moved {name} → {folder}",
             "moved_others": "📁 Moved {name} → Others",
+            "planned": "🔎 {name} → {folder}",
+            "duplicate": "♻️ Skipped {name}: duplicate of {folder}",
+            "linked": "🔗 Linked {name} → {folder}",
         },
     },
     "es": {
@@ -38,25 +55,42 @@ TRANSLATIONS = {
             "destination": "Carpeta de destino (opcional):",
             "organize": "🧹 Organizar archivos",
             "undo": "↩️ Deshacer último",
+            "preview": "🔎 Vista previa",
+            "pause": "⏸️ Pausar",
+            "resume": "▶️ Continuar",
+            "cancel": "⏹️ Cancelar",
         },
         "msg": {
             "error_title": "Error",
             "please_select_source": "Selecciona una carpeta de origen.",
             "done_title": "Listo",
             "done_body": "Los archivos se han organizado correctamente.",
+            "preview_done_body": "Vista previa completada. No se ha movido ningún archivo.",
             "nothing_to_undo_title": "Nada que deshacer",
             "nothing_to_undo_body": "No hay una organización reciente que deshacer.",
             "undo_start": "Iniciando deshacer...",
             "undo_complete_title": "Deshacer completado",
             "undo_complete_body": "Se han revertido los cambios.",
             "restored": "↩️ Restaurado {name} → {folder}",
+            "unlinked": "🧹 Enlace eliminado: {name}",
             "skipped_missing": "⚠️ Omitido (no existe): {name}",
             "error_restoring": "❌ Error restaurando {name}: {error}",
+            "skipped_changed": "⚠️ Omitido {name}: cambió después de organizar",
+            "interrupted_title": "Organización interrumpida",
+            "interrupted_body": "Una organización anterior no terminó:\n{source} → {dest}\n\nSí: terminarla\nNo: revertirla\nCancelar: decidir más tarde",
+            "resume_complete_body": "Se ha completado la organización interrumpida.",
+            "rollback_complete_body": "Se ha revertido la organización interrumpida.",
+            "cancelled_title": "Cancelado",
+            "cancelled_body": "Organización cancelada. {count} archivos ya se habían movido y se pueden deshacer.",
+            "stats_summary": "⏱️ {files} archivos · {size} · {seconds} s ({phases})",
         },
         "organizer": {
             "no_files": "No hay archivos para organizar.",
             "moved": "✅ Movido {name} → {folder}",
             "moved_others": "📁 Movido {name} → Others",
+            "planned": "🔎 {name} → {folder}",
+            "duplicate": "♻️ Omitido {name}: duplicado de {folder}",
+            "linked": "🔗 Enlazado {name} → {folder}",
         },
     },
     "fr": {
@@ -68,25 +102,42 @@ TRANSLATIONS = {
             "destination": "Dossier de destination (optionnel) :",
             "organize": "🧹 Organiser les fichiers",
             "undo": "↩️ Annuler le dernier",
+            "preview": "🔎 Aperçu",
+            "pause": "⏸️ Pause",
+            "resume": "▶️ Reprendre",
+            "cancel": "⏹️ Arrêter",
         },
         "msg": {
             "error_title": "Erreur",
             "please_select_source": "Veuillez sélectionner un dossier source.",
             "done_title": "Terminé",
             "done_body": "Tous les fichiers ont été organisés avec succès.",
+            "preview_done_body": "Aperçu terminé. Aucun fichier n'a été déplacé.",
             "nothing_to_undo_title": "Rien à annuler",
             "nothing_to_undo_body": "Aucune organisation récente à annuler.",
             "undo_start": "Démarrage de l'annulation...",
             "undo_complete_title": "Annulation terminée",
             "undo_complete_body": "Les changements ont été rétablis.",
             "restored": "↩️ Restauré {name} → {folder}",
+            "unlinked": "🧹 Lien supprimé : {name}",
             "skipped_missing": "⚠️ Ignoré (inexistant) : {name}",
             "error_restoring": "❌ Erreur lors de la restauration de {name} : {error}",
+            "skipped_changed": "⚠️ Ignoré {name} : modifié après l'organisation",
+            "interrupted_title": "Organisation interrompue",
+            "interrupted_body": "Une organisation précédente ne s'est pas terminée :\n{source} → {dest}\n\nOui : la terminer\nNon : l'annuler\nAnnuler : décider plus tard",
+            "resume_complete_body": "L'organisation interrompue a été terminée.",
+            "rollback_complete_body": "L'organisation interrompue a été annulée.",
+            "cancelled_title": "Annulé",
+            "cancelled_body": "Organisation annulée. {count} fichiers avaient déjà été déplacés et peuvent être restaurés.",
+            "stats_summary": "⏱️ {files} fichiers · {size} · {seconds} s ({phases})",
         },
         "organizer": {
             "no_files": "Aucun fichier à organiser.",
             "moved": "✅ Déplacé {name} → {folder}",
             "moved_others": "📁 Déplacé {name} → Others",
+            "planned": "🔎 {name} → {folder}",
+            "duplicate": "♻️ Ignoré {name} : doublon de {folder}",
+            "linked": "🔗 Lié {name} → {folder}",
         },
     },
     "de": {
@@ -98,25 +149,42 @@ TRANSLATIONS = {
             "destination": "Zielordner (optional):",
             "organize": "🧹 Dateien organisieren",
             "undo": "↩️ Letzten rückgängig",
+            "preview": "🔎 Vorschau",
+            "pause": "⏸️ Pause",
+            "resume": "▶️ Fortsetzen",
+            "cancel": "⏹️ Abbrechen",
         },
         "msg": {
             "error_title": "Fehler",
             "please_select_source": "Bitte einen Quellordner auswählen.",
             "done_title": "Fertig",
             "done_body": "Alle Dateien wurden erfolgreich organisiert.",
+            "preview_done_body": "Vorschau abgeschlossen. Es wurden keine Dateien verschoben.",
             "nothing_to_undo_title": "Nichts zum Rückgängig machen",
             "nothing_to_undo_body": "Keine kürzliche Organisation zum Rückgängig machen.",
             "undo_start": "Rückgängig machen wird gestartet...",
             "undo_complete_title": "Rückgängig abgeschlossen",
             "undo_complete_body": "Änderungen wurden zurückgesetzt.",
             "restored": "↩️ Wiederhergestellt {name} → {folder}",
+            "unlinked": "🧹 Verknüpfung entfernt: {name}",
             "skipped_missing": "⚠️ Übersprungen (nicht vorhanden): {name}",
             "error_restoring": "❌ Fehler beim Wiederherstellen von {name}: {error}",
+            "skipped_changed": "⚠️ Übersprungen {name}: nach dem Organisieren geändert",
+            "interrupted_title": "Unterbrochene Organisation",
+            "interrupted_body": "Eine frühere Organisation wurde nicht abgeschlossen:\n{source} → {dest}\n\nJa: abschließen\nNein: rückgängig machen\nAbbrechen: später entscheiden",
+            "resume_complete_body": "Die unterbrochene Organisation wurde abgeschlossen.",
+            "rollback_complete_body": "Die unterbrochene Organisation wurde rückgängig gemacht.",
+            "cancelled_title": "Abgebrochen",
+            "cancelled_body": "Organisation abgebrochen. {count} Dateien wurden bereits verschoben und können rückgängig gemacht werden.",
+            "stats_summary": "⏱️ {files} Dateien · {size} · {seconds} s ({phases})",
         },
         "organizer": {
             "no_files": "Keine Dateien zum Organisieren.",
             "moved": "✅ Verschoben {name} → {folder}",
             "moved_others": "📁 Verschoben {name} → Others",
+            "planned": "🔎 {name} → {folder}",
+            "duplicate": "♻️ Übersprungen {name}: Duplikat von {folder}",
+            "linked": "🔗 Verknüpft {name} → {folder}",
         },
     },
     "it": {
@@ -128,25 +196,42 @@ TRANSLATIONS = {
             "destination": "Cartella di destinazione (opzionale):",
             "organize": "🧹 Organizza file",
             "undo": "↩️ Annulla ultimo",
+            "preview": "🔎 Anteprima",
+            "pause": "⏸️ Pausa",
+            "resume": "▶️ Riprendi",
+            "cancel": "⏹️ Interrompi",
         },
         "msg": {
             "error_title": "Errore",
             "please_select_source": "Seleziona una cartella di origine.",
             "done_title": "Fatto",
             "done_body": "Tutti i file sono stati organizzati con successo.",
+            "preview_done_body": "Anteprima completata. Nessun file è stato spostato.",
             "nothing_to_undo_title": "Niente da annullare",
             "nothing_to_undo_body": "Nessuna organizzazione recente da annullare.",
             "undo_start": "Avvio annullamento...",
             "undo_complete_title": "Annullamento completato",
             "undo_complete_body": "Le modifiche sono state ripristinate.",
             "restored": "↩️ Ripristinato {name} → {folder}",
+            "unlinked": "🧹 Collegamento rimosso: {name}",
             "skipped_missing": "⚠️ Saltato (mancante): {name}",
             "error_restoring": "❌ Errore nel ripristino di {name}: {error}",
+            "skipped_changed": "⚠️ Saltato {name}: modificato dopo l'organizzazione",
+            "interrupted_title": "Organizzazione interrotta",
+            "interrupted_body": "Un'organizzazione precedente non è terminata:\n{source} → {dest}\n\nSì: completarla\nNo: annullarla\nAnnulla: decidere più tardi",
+            "resume_complete_body": "L'organizzazione interrotta è stata completata.",
+            "rollback_complete_body": "L'organizzazione interrotta è stata annullata.",
+            "cancelled_title": "Annullato",
+            "cancelled_body": "Organizzazione annullata. {count} file erano già stati spostati e si possono ripristinare.",
+            "stats_summary": "⏱️ {files} file · {size} · {seconds} s ({phases})",
         },
         "organizer": {
             "no_files": "Nessun file da organizzare.",
             "moved": "✅ Spostato {name} → {folder}",
             "moved_others": "📁 Spostato {name} → Others",
+            "planned": "🔎 {name} → {folder}",
+            "duplicate": "♻️ Saltato {name}: duplicato di {folder}",
+            "linked": "🔗 Collegato {name} → {folder}",
         },
     },
     "pt": {
@@ -158,25 +243,42 @@ TRANSLATIONS = {
             "destination": "Pasta de destino (opcional):",
             "organize": "🧹 Organizar ficheiros",
             "undo": "↩️ Desfazer último",
+            "preview": "🔎 Pré-visualizar",
+            "pause": "⏸️ Pausar",
+            "resume": "▶️ Continuar",
+            "cancel": "⏹️ Cancelar",
         },
         "msg": {
             "error_title": "Erro",
             "please_select_source": "Selecione uma pasta de origem.",
             "done_title": "Concluído",
             "done_body": "Todos os ficheiros foram organizados com sucesso.",
+            "preview_done_body": "Pré-visualização concluída. Nenhum ficheiro foi movido.",
             "nothing_to_undo_title": "Nada para desfazer",
             "nothing_to_undo_body": "Nenhuma organização recente para desfazer.",
             "undo_start": "A iniciar desfazer...",
             "undo_complete_title": "Desfazer concluído",
             "undo_complete_body": "As alterações foram revertidas.",
             "restored": "↩️ Restaurado {name} → {folder}",
+            "unlinked": "🧹 Vínculo removido: {name}",
             "skipped_missing": "⚠️ Ignorado (em falta): {name}",
             "error_restoring": "❌ Erro ao restaurar {name}: {error}",
+            "skipped_changed": "⚠️ Ignorado {name}: foi alterado depois de organizar",
+            "interrupted_title": "Organização interrompida",
+            "interrupted_body": "Uma organização anterior não terminou:\n{source} → {dest}\n\nSim: concluí-la\nNão: revertê-la\nCancelar: decidir mais tarde",
+            "resume_complete_body": "A organização interrompida foi concluída.",
+            "rollback_complete_body": "A organização interrompida foi revertida.",
+            "cancelled_title": "Cancelado",
+            "cancelled_body": "Organização cancelada. {count} ficheiros já tinham sido movidos e podem ser desfeitos.",
+            "stats_summary": "⏱️ {files} ficheiros · {size} · {seconds} s ({phases})",
         },
         "organizer": {
             "no_files": "Não há ficheiros para organizar.",
             "moved": "✅ Movido {name} → {folder}",
             "moved_others": "📁 Movido {name} → Others",
+            "planned": "🔎 {name} → {folder}",
+            "duplicate": "♻️ Ignorado {name}: duplicado de {folder}",
+            "linked": "🔗 Vinculado {name} → {folder}",
         },
     },
 }
\ No newline at end of file
@@ -0,0 +1,331 @@
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from events import EventCallback
+from journal import Journal
+from organizer import CancelToken, DestinationIndex, OrganizeError, execute_plan, plan_files
+from rules import RuleEngine
+
+if TYPE_CHECKING:
+    from layout import Layout
+    from sharding import Sharding
+
+# Tipos de cambio que entregan los backends
+CLOSED = "closed"  # escritura terminada o archivo que llega ya completo (rename)
+CHANGED = "changed"  # el archivo sigue creciendo o apareció sin cierre conocido
+GONE = "gone"
+RESCAN = "rescan"  # se perdieron eventos: hay que revisar toda la carpeta
+
+# Nombres que usan los navegadores y gestores de descargas mientras descargan
+PARTIAL_SUFFIXES = (".part", ".partial", ".crdownload", ".download", ".opdownload", ".tmp", "~")
+
+ErrorCallback = Callable[[Exception], None]
+
+
+# --------- inotify (Linux) ---------
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE
+    | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _InotifyBackend:
+    """Vigila una carpeta (sin subcarpetas) con inotify; duerme en select sin gastar CPU."""
+
+    def __init__(self, folder: str):
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(folder), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, os.strerror(err), folder)
+        # Tubería para despertar el select desde stop()
+        self._wake_r, self._wake_w = os.pipe()
+
+    def wait(self, timeout: Optional[float]) -> List[Tuple[str, str]]:
+        ready, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+        if self._wake_r in ready:
+            os.read(self._wake_r, 512)
+        if self._fd not in ready:
+            return []
+        changes = []
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            changes.extend(self._parse(data))
+        return changes
+
+    @staticmethod
+    def _parse(data: bytes) -> Iterable[Tuple[str, str]]:
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                yield "", RESCAN
+            elif mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+                raise FileNotFoundError("The watched folder was removed or moved")
+            elif mask & _IN_ISDIR or not name:
+                continue
+            elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                yield name, CLOSED
+            elif mask & (_IN_MOVED_FROM | _IN_DELETE):
+                yield name, GONE
+            else:
+                yield name, CHANGED
+
+    def wake(self) -> None:
+        os.write(self._wake_w, b"\0")
+
+    def close(self) -> None:
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            os.close(fd)
+
+
+# --------- Sondeo (resto de sistemas) ---------
+
+class _PollingBackend:
+    """
+    Alternativa portable: lista la carpeta cada `interval` segundos y compara
+    (tamaño, mtime) con la pasada anterior. La memoria es proporcional a lo que
+    hay en la carpeta vigilada, que normalmente se vacía al organizar.
+    """
+
+    def __init__(self, folder: str, interval: float):
+        self._folder = folder
+        self._interval = interval
+        self._wake = threading.Event()
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        # Lo que ya existe no es un cambio; Watcher.run decide si lo organiza
+        self._poll()
+
+    def wait(self, timeout: Optional[float]) -> List[Tuple[str, str]]:
+        self._wake.wait(self._interval if timeout is None else min(timeout, self._interval))
+        self._wake.clear()
+        return self._poll()
+
+    def _poll(self) -> List[Tuple[str, str]]:
+        seen: Dict[str, Tuple[int, int]] = {}
+        changes = []
+        with os.scandir(self._folder) as it:
+            for entry in it:
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                seen[entry.name] = (st.st_size, st.st_mtime_ns)
+                if self._seen.get(entry.name) != seen[entry.name]:
+                    changes.append((entry.name, CHANGED))
+        changes.extend((name, GONE) for name in self._seen.keys() - seen.keys())
+        self._seen = seen
+        return changes
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def close(self) -> None:
+        pass
+
+
+def _inotify_available() -> bool:
+    return sys.platform.startswith("linux")
+
+
+# --------- Vigilante ---------
+
+class Watcher:
+    """
+    Organiza una carpeta de forma continua a medida que llegan archivos.
+
+    Un archivo solo se mueve cuando su escritura ha terminado: tras un cierre de escritura
+    o un rename de llegada espera `settle` segundos sin más cambios; si solo se ven
+    modificaciones (o se usa el sondeo) espera `quiet` segundos sin que cambie.
+    Los archivos listos en la misma vuelta se planifican y ejecutan juntos con
+    plan_files/execute_plan. Sin actividad el hilo queda bloqueado en select.
+    Se ignoran los archivos ocultos y los de descarga parcial (`ignore_suffixes`).
+    Con `layout` (layout.Layout) las carpetas de destino siguen su plantilla y con
+    `sharding` (sharding.Sharding) se reparten en subcarpetas de tamaño limitado.
+    """
+
+    def __init__(
+        self,
+        source_folder: str,
+        dest_folder: Optional[str] = None,
+        rules: Optional[RuleEngine] = None,
+        workers: int = 1,
+        journal: Optional[Journal] = None,
+        event_callback: Optional[EventCallback] = None,
+        error_callback: Optional[ErrorCallback] = None,
+        settle: float = 0.2,
+        quiet: float = 2.0,
+        poll_interval: float = 1.0,
+        use_inotify: Optional[bool] = None,
+        ignore_suffixes: Iterable[str] = PARTIAL_SUFFIXES,
+        layout: Optional["Layout"] = None,
+        sharding: Optional["Sharding"] = None,
+    ):
+        self.source_folder = os.path.abspath(source_folder)
+        self.dest_folder = os.path.abspath(dest_folder) if dest_folder else self.source_folder
+        self.rules = rules
+        self.layout = layout
+        self.sharding = sharding
+        self.workers = workers
+        self.journal = journal
+        self.event_callback = event_callback
+        self.error_callback = error_callback
+        self.settle = settle
+        self.quiet = quiet
+        self.ignore_suffixes = tuple(s.lower() for s in ignore_suffixes)
+
+        if use_inotify is None:
+            use_inotify = _inotify_available()
+        self._backend = None
+        if use_inotify:
+            try:
+                self._backend = _InotifyBackend(self.source_folder)
+            except (OSError, AttributeError):
+                # Sin inotify (límite de vigilancias, libc sin el símbolo...): se sondea
+                self._backend = None
+        if self._backend is None:
+            self._backend = _PollingBackend(self.source_folder, poll_interval)
+            # Con sondeo un cambio solo se detecta en la siguiente pasada
+            self.quiet = max(quiet, poll_interval * 2)
+
+        self._pending: Dict[str, float] = {}  # nombre → instante a partir del cual está listo
+        self._stopped = threading.Event()
+        # Al parar no se empieza ningún movimiento más del lote en curso
+        self._cancel = CancelToken()
+        self.moved = 0
+
+    @property
+    def uses_inotify(self) -> bool:
+        return isinstance(self._backend, _InotifyBackend)
+
+    def stop(self) -> None:
+        """Se puede llamar desde otro hilo o desde un manejador de señales."""
+        self._stopped.set()
+        self._cancel.cancel()
+        self._backend.wake()
+
+    def _ignored(self, name: str) -> bool:
+        return name.startswith(".") or name.lower().endswith(self.ignore_suffixes)
+
+    def _arm(self, name: str, delay: float, now: float) -> None:
+        if not self._ignored(name):
+            self._pending[name] = now + delay
+
+    def _scan(self, now: float) -> None:
+        """
+        Toma como pendiente todo lo que ya hay. No se sabe si alguien lo está escribiendo,
+        así que se trata como un cambio: espera `quiet` segundos sin modificaciones.
+        """
+        with os.scandir(self.source_folder) as it:
+            for entry in it:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        self._arm(entry.name, self.quiet, now)
+                except OSError:
+                    continue
+
+    def _apply(self, changes: List[Tuple[str, str]], now: float) -> None:
+        for name, kind in changes:
+            if kind == CLOSED:
+                self._arm(name, self.settle, now)
+            elif kind == CHANGED:
+                self._arm(name, self.quiet, now)
+            elif kind == GONE:
+                self._pending.pop(name, None)
+            elif kind == RESCAN:
+                self._scan(now)
+
+    def _take_ready(self, now: float) -> List[str]:
+        ready = [name for name, deadline in self._pending.items() if deadline <= now]
+        for name in ready:
+            del self._pending[name]
+        return ready
+
+    def _organize(self, names: List[str]) -> None:
+        paths = [os.path.join(self.source_folder, name) for name in names]
+        # Índice nuevo en cada lote: refleja lo que otros hayan borrado o añadido en destino
+        index = DestinationIndex()
+        plan = plan_files(
+            paths, self.dest_folder, rules=self.rules, index=index, layout=self.layout, sharding=self.sharding
+        )
+        if not plan:
+            return
+        try:
+            moves = execute_plan(
+                plan,
+                index=index,
+                workers=self.workers,
+                journal=self.journal,
+                event_callback=self.event_callback,
+                cancel=self._cancel,
+            )
+            self.moved += len(moves)
+        except OrganizeError as e:
+            self.moved += len(e.moves)
+            # Lo que no llegó a moverse se reintenta en la siguiente vuelta
+            now = time.monotonic()
+            for move in plan:
+                if os.path.lexists(move.source):
+                    self._arm(os.path.basename(move.source), self.quiet, now)
+            if self.error_callback is None:
+                raise
+            self.error_callback(e.error)
+        finally:
+            if self.journal is not None:
+                # Sin más actividad nadie forzaría el volcado de los últimos "done"
+                self.journal.sync()
+
+    def run(self, initial_scan: bool = True) -> None:
+        """Bloquea hasta stop(). Con initial_scan=True organiza también lo que ya estaba."""
+        try:
+            if initial_scan:
+                self._scan(time.monotonic())
+            while not self._stopped.is_set():
+                timeout = None
+                if self._pending:
+                    timeout = max(0.0, min(self._pending.values()) - time.monotonic())
+                changes = self._backend.wait(timeout)
+                now = time.monotonic()
+                self._apply(changes, now)
+                ready = self._take_ready(now)
+                if ready and not self._stopped.is_set():
+                    self._organize(ready)
+        finally:
+            self._backend.close()